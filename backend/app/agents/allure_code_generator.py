@@ -1,6 +1,33 @@
-from typing import List
+import re
+import zipfile
+from typing import Dict, Iterable, Iterator, List, Optional
+from app.metrics import stage_timer
 from app.models import TestSuite, TestCase
 
+SHARD_MODES = ("none", "feature", "tag")
+
+
+class _ZipStreamBuffer:
+    """
+    Приёмник для zipfile без seek/tell: записанные байты забираются drain()
+    после каждой порции, поэтому архив не накапливается в памяти целиком.
+    """
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
 
 class AllureCodeGenerator:
     """
@@ -11,9 +38,99 @@ class AllureCodeGenerator:
         """
         Преобразует TestSuite в Python код с Allure декораторами.
         """
-        class_name = self._generate_class_name(test_suite.name)
+        # Без завершающего перевода строки, как и раньше
+        with stage_timer("code_render"):
+            return "".join(self.iter_module(test_suite.name, test_suite.cases, owner))[:-1]
+
+    def iter_module(
+            self,
+            suite_name: str,
+            cases: Iterable[TestCase],
+            owner: str = "qa_team",
+            feature: Optional[str] = None,
+    ) -> Iterator[str]:
+        """
+        Код модуля по частям: заголовок, затем по одному тест-методу.
+        Модуль целиком в памяти не собирается.
+        """
+        yield self.generate_header(suite_name, owner, feature)
+        for case in cases:
+            yield self.generate_test_method_code(case)
+
+    def shard_cases(self, cases: Iterable[TestCase], shard_by: str) -> Dict[str, List[TestCase]]:
+        """
+        Делит кейсы на модули. feature — по тегу "feature:<имя>", tag — по первому
+        тегу кейса; кейс без подходящего тега попадает в "general".
+        """
+        if shard_by not in SHARD_MODES:
+            raise ValueError(f"Unknown shard_by: {shard_by}. Use one of: {', '.join(SHARD_MODES)}")
+
+        shards: Dict[str, List[TestCase]] = {}
+        for case in cases:
+            if shard_by == "none":
+                key = ""
+            elif shard_by == "feature":
+                key = next(
+                    (tag.split(":", 1)[1].strip() for tag in case.tags if tag.lower().startswith("feature:")),
+                    case.tags[0] if case.tags else "general",
+                )
+            else:
+                key = case.tags[0] if case.tags else "general"
+            shards.setdefault(key, []).append(case)
+        return shards
+
+    def iter_zip(self, test_suite: TestSuite, shard_by: str = "feature", owner: str = "qa_team") -> Iterator[bytes]:
+        """
+        ZIP-архив с модулями тестов по частям: каждый тест-метод сжимается и
+        отдаётся сразу, пиковая память не зависит от размера сьюта.
+        """
+        shards = self.shard_cases(test_suite.cases, shard_by)
+        buffer = _ZipStreamBuffer()
+        used_names = set()
+
+        with zipfile.ZipFile(buffer, mode="w", compression=zipfile.ZIP_DEFLATED) as archive:
+            for key, cases in shards.items():
+                file_name = self._module_file_name(test_suite.name, key, used_names)
+                # При шардировании по фиче модуль помечается своей фичей
+                feature = key if shard_by == "feature" else None
+                suite_name = f"{test_suite.name} {key}" if key else test_suite.name
+                with archive.open(file_name, mode="w") as module:
+                    for chunk in self.iter_module(suite_name, cases, owner, feature):
+                        module.write(chunk.encode("utf-8"))
+                        data = buffer.drain()
+                        if data:
+                            yield data
+        # Хвосты сжатых потоков и центральный каталог пишутся при закрытии
+        data = buffer.drain()
+        if data:
+            yield data
+
+    def _module_file_name(self, suite_name: str, key: str, used_names: set) -> str:
+        slug = re.sub(r"[^a-z0-9]+", "_", (key or suite_name).lower()).strip("_") or "suite"
+        name = f"test_{slug}.py"
+        counter = 2
+        while name in used_names:
+            name = f"test_{slug}_{counter}.py"
+            counter += 1
+        used_names.add(name)
+        return name
+
+    def generate_header(self, suite_name: str, owner: str = "qa_team", feature: Optional[str] = None) -> str:
+        """
+        Возвращает импорты и объявление класса — начало модуля для потоковой генерации.
+        """
+        return "\n".join(self._generate_header_lines(suite_name, owner, feature)) + "\n"
 
-        code_lines = [
+    def generate_test_method_code(self, case: TestCase) -> str:
+        """
+        Возвращает код одного тест-метода (для потоковой генерации по кейсам).
+        """
+        return "\n".join(self._generate_test_method(case)) + "\n\n"
+
+    def _generate_header_lines(self, suite_name: str, owner: str, feature: Optional[str] = None) -> List[str]:
+        class_name = self._generate_class_name(suite_name)
+
+        return [
             "import allure",
             "from allure_commons._allure import step as allure_step",
             "from pytest import mark",
@@ -21,25 +138,17 @@ class AllureCodeGenerator:
             "",
             f"@allure.manual",
             f"@allure.label('owner', '{owner}')",
-            f"@allure.feature('{test_suite.name}')",
+            f"@allure.feature('{self._escape_string(feature or suite_name)}')",
             f"@allure.suite('manual')",
             f"@mark.manual",
             f"class {class_name}:",
             ""
         ]
 
-        # Генерируем методы для каждого тест-кейса
-        for case in test_suite.cases:
-            test_method = self._generate_test_method(case)
-            code_lines.extend(test_method)
-            code_lines.append("")
-
-        return "\n".join(code_lines)
-
     def _generate_class_name(self, suite_name: str) -> str:
         """Генерирует имя класса из названия сьюта."""
         # Убираем спецсимволы и делаем CamelCase
-        words = suite_name.replace("-", " ").replace("_", " ").split()
+        words = re.findall(r"[^\W_]+", suite_name)
         class_name = "".join(word.capitalize() for word in words)
         if not class_name.endswith("Tests"):
             class_name += "Tests"
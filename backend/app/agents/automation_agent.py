@@ -1,7 +1,7 @@
 import json
 from typing import List
 from app.models import TestSuite, TestCase
-from app.llm_client import get_llm_client
+from app.llm_client import chat_completion
 
 
 class AutomationAgent:
@@ -56,24 +56,15 @@ CRITICAL: Generate tests for ALL endpoints in the specification, not just exampl
 
 Return ONLY Python code, no markdown blocks, no explanations."""
 
-        with get_llm_client() as client:
-            resp = client.post(
-                "/chat/completions",
-                json={
-                    "model": "openai/gpt-oss-120b",
-                    "messages": [
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": user_prompt}
-                    ],
-                    "temperature": 0.2,  # Низкая температура для точности
-                    "max_tokens": 16000,  # Больше токенов для всех эндпоинтов
-                }
-            )
-
-        if resp.status_code != 200:
-            raise Exception(f"LLM API error: {resp.status_code} - {resp.text}")
-
-        data = resp.json()
+        data = await chat_completion({
+            "model": "openai/gpt-oss-120b",
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            "temperature": 0.2,  # Низкая температура для точности
+            "max_tokens": 16000,  # Больше токенов для всех эндпоинтов
+        })
         pytest_code = data["choices"][0]["message"]["content"]
 
         # Убираем markdown если есть
@@ -126,24 +117,15 @@ Generate complete pytest code with:
 Return ONLY Python code, no markdown, no explanations."""
 
         # Вызов LLM
-        with get_llm_client() as client:
-            resp = client.post(
-                "/chat/completions",
-                json={
-                    "model": "openai/gpt-oss-120b",
-                    "messages": [
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": user_prompt}
-                    ],
-                    "temperature": 0.3,
-                    "max_tokens": 8000,
-                }
-            )
-
-        if resp.status_code != 200:
-            raise Exception(f"LLM API error: {resp.status_code} - {resp.text}")
-
-        data = resp.json()
+        data = await chat_completion({
+            "model": "openai/gpt-oss-120b",
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            "temperature": 0.3,
+            "max_tokens": 8000,
+        })
         pytest_code = data["choices"][0]["message"]["content"]
 
         if pytest_code.startswith("```"):
@@ -191,24 +173,15 @@ Generate complete pytest code with:
 
 Return ONLY Python code, no markdown, no explanations."""
 
-        with get_llm_client() as client:
-            resp = client.post(
-                "/chat/completions",
-                json={
-                    "model": "openai/gpt-oss-120b",
-                    "messages": [
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": user_prompt}
-                    ],
-                    "temperature": 0.3,
-                    "max_tokens": 8000,
-                }
-            )
-
-        if resp.status_code != 200:
-            raise Exception(f"LLM API error: {resp.status_code} - {resp.text}")
-
-        data = resp.json()
+        data = await chat_completion({
+            "model": "openai/gpt-oss-120b",
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            "temperature": 0.3,
+            "max_tokens": 8000,
+        })
         pytest_code = data["choices"][0]["message"]["content"]
 
         if pytest_code.startswith("```"):
@@ -1,8 +1,13 @@
+import logging
+
 from app.agents.html_agent import HtmlAnalysisAgent
 from app.agents.requirements_agent import RequirementsAgent
 from app.agents.automation_agent import AutomationAgent
 from app.agents.coverage_agent import CoverageAgent
-from app.models import CoverageReport, TestSuite
+from app.models import CoverageReport, TestSuite, UiModel
+from app.pipeline import StageGraph
+
+logger = logging.getLogger(__name__)
 
 
 class CoordinatorAgent:
@@ -19,18 +24,53 @@ class CoordinatorAgent:
         html: str | None,
         requirements_text: str | None,
     ) -> CoverageReport:
+        """
+        Пайплайн как DAG этапов: e2e и анализ покрытия зависят только от
+        сьюта и идут параллельно, время ответа — критический путь.
+
+            ui_model → suite → e2e ──────┐
+                            └→ coverage ─┴→ report
+        """
+        graph = StageGraph()
+
         # 1. Источник требований
         if requirements_text:
-            suite: TestSuite = await self.req_agent.generate_from_requirements_text(
-                requirements_text
-            )
+            async def suite_stage() -> TestSuite:
+                return await self.req_agent.generate_from_requirements_text(requirements_text)
+
+            graph.add("suite", suite_stage)
         else:
-            ui_model = await self.html_agent.analyze(url=url, html=html)
-            suite = await self.req_agent.generate_from_ui_model(ui_model)
+            async def ui_model_stage() -> UiModel:
+                return await self.html_agent.analyze(url=url, html=html)
+
+            async def suite_from_ui_stage(ui_model: UiModel) -> TestSuite:
+                return await self.req_agent.generate_from_ui_model(ui_model)
+
+            graph.add("ui_model", ui_model_stage)
+            graph.add("suite", suite_from_ui_stage, deps=["ui_model"])
 
         # 2. Генерация e2e
-        auto_tests = await self.auto_agent.generate_e2e_tests(suite, url or "http://localhost")
+        async def e2e_stage(suite: TestSuite) -> str:
+            return await self.auto_agent.generate_e2e_tests(suite, url or "http://localhost")
 
         # 3. Покрытие
-        report = await self.cov_agent.analyze(suite, auto_tests)
+        async def coverage_stage(suite: TestSuite) -> CoverageReport:
+            return await self.cov_agent.analyze(suite)
+
+        async def report_stage(e2e_code: str, report: CoverageReport) -> CoverageReport:
+            return self.cov_agent.attach_automated_tests(report, e2e_code)
+
+        graph.add("e2e", e2e_stage, deps=["suite"])
+        graph.add("coverage", coverage_stage, deps=["suite"])
+        graph.add("report", report_stage, deps=["e2e", "coverage"])
+
+        results = await graph.run()
+
+        report: CoverageReport = results["report"]
+        report.stage_timings = {name: round(seconds, 3) for name, seconds in graph.timings.items()}
+        logger.info(
+            "Stage timings: %s; critical path: %s",
+            ", ".join(f"{name}={seconds:.2f}s" for name, seconds in report.stage_timings.items()),
+            " → ".join(graph.critical_path()),
+        )
         return report
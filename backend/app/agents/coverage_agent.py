@@ -1,6 +1,17 @@
-from app.models import TestSuite, AutomatedTest, CoverageReport
-from app.llm_client import get_llm_client
+from app.models import TestSuite, AutomatedTest, CoverageReport, CoverageMatrix, DuplicatePair
+from app.llm_client import chat_completion
+from app.json_stream import parse_llm_json_async
+from app.dedup import MinHashDeduplicator
+from app.endpoint_index import EndpointIndex, build_coverage_matrix
+from app.config import settings
 import json
+import logging
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+# Строка сводки с числом автотестов: заполняется, когда e2e готовы
+AUTOMATED_TESTS_LINE = "- Automated Tests: {count}"
 
 
 class CoverageAgent:
@@ -15,34 +26,42 @@ class CoverageAgent:
     ) -> CoverageReport:
         """
         Анализирует тест-кейсы на дубликаты, пробелы и предлагает улучшения.
+        Дубликаты ищутся локально (MinHash/LSH), LLM решает только пограничные пары.
         """
 
-        # Формируем описание тест-кейсов для LLM
-        test_descriptions = []
-        for case in suite.cases:
-            test_descriptions.append({
-                "title": case.title,
-                "description": case.description,
-                "tags": case.tags,
-                "priority": case.priority
-            })
+        duplicate_pairs, borderline_pairs = self._find_duplicates(suite)
+        logger.info(
+            "Local dedup: %s duplicates, %s borderline pairs for LLM", len(duplicate_pairs), len(borderline_pairs)
+        )
+
+        # Пограничные пары по похожести — на решение LLM
+        candidate_pairs = [
+            {"pair": i, "test1": pair.test1, "test2": pair.test2}
+            for i, pair in enumerate(borderline_pairs, 1)
+        ]
+        duplicates_task = (
+            f"""1. **Duplicates**: For each candidate pair below decide whether both tests check the same functionality.
+Candidate pairs:
+{json.dumps(candidate_pairs, indent=2, ensure_ascii=False)}
+"""
+            if candidate_pairs else
+            "1. **Duplicates**: Already checked, return an empty list\n"
+        )
 
         prompt = f"""Analyze the following test suite and provide:
 
-1. **Duplicates**: Test cases that test the same functionality (similar titles/descriptions)
-2. **Missing Coverage**: Important scenarios that are NOT covered by existing tests
+{duplicates_task}2. **Missing Coverage**: Important scenarios that are NOT covered by existing tests
 3. **Suggestions**: Recommendations to improve the test suite
 
 Test Suite: {suite.name}
 Total Tests: {len(suite.cases)}
 
-Test Cases:
-{json.dumps(test_descriptions, indent=2, ensure_ascii=False)}
+{self._suite_overview(suite)}
 
 Return your analysis in this JSON format:
 {{
   "duplicates": [
-    {{"test1": "title1", "test2": "title2", "reason": "why they are duplicates"}}
+    {{"pair": 1, "duplicate": true, "reason": "why they are (not) duplicates"}}
   ],
   "missing_features": [
     {{"feature": "feature name", "reason": "why it should be tested"}}
@@ -55,45 +74,32 @@ Return your analysis in this JSON format:
 
         try:
             # Вызов LLM
-            with get_llm_client() as client:
-                resp = client.post(
-                    "/chat/completions",
-                    json={
-                        "model": "openai/gpt-oss-120b",
-                        "messages": [
-                            {"role": "system", "content": "You are a QA expert analyzing test coverage."},
-                            {"role": "user", "content": prompt}
-                        ],
-                        "temperature": 0.3,
-                        "max_tokens": 2000,
-                    }
-                )
-
-            if resp.status_code != 200:
-                raise Exception(f"LLM API error: {resp.status_code}")
-
-            data = resp.json()
+            data = await chat_completion({
+                "model": "openai/gpt-oss-120b",
+                "messages": [
+                    {"role": "system", "content": "You are a QA expert analyzing test coverage."},
+                    {"role": "user", "content": prompt}
+                ],
+                "temperature": 0.3,
+                "max_tokens": 2000,
+            })
             content = data["choices"][0]["message"]["content"]
 
-            # Парсим JSON из ответа
-            # Убираем markdown блоки если есть
-            if "```":
-                content = content.split("```json").split("```")
-            elif "```" in content:
-                content = content.split("``````")[0]
-
-            analysis = json.loads(content.strip())
+            # Парсим JSON из ответа (markdown и обрезка по max_tokens обрабатываются парсером)
+            analysis = await parse_llm_json_async(content, array_key="duplicates")
 
             covered_features = [c.title for c in suite.cases]
             missing_features = [f"{item['feature']}: {item['reason']}"
                                 for item in analysis.get("missing_features", [])]
-            duplicates = [f"{item['test1']} ↔ {item['test2']}: {item['reason']}"
-                            for item in analysis.get("duplicates", [])]
+            duplicate_pairs = duplicate_pairs + self._confirmed_pairs(
+                borderline_pairs, analysis.get("duplicates", [])
+            )
+            duplicates = self._format_duplicates(duplicate_pairs)
             suggestions = analysis.get("suggestions", [])
 
             summary = f"""Test Suite Analysis for '{suite.name}':
 - Total Tests: {len(suite.cases)}
-- Automated Tests: {len(auto_tests) if auto_tests else 0}
+{AUTOMATED_TESTS_LINE.format(count=len(auto_tests) if auto_tests else 0)}
 - Duplicates Found: {len(duplicates)}
 - Missing Coverage: {len(missing_features)}
 - Suggestions: {len(suggestions)}
@@ -104,18 +110,197 @@ Return your analysis in this JSON format:
                 missing_features=missing_features,
                 duplicates=duplicates,
                 summary=summary,
+                duplicate_pairs=duplicate_pairs,
                 test_suite=suite,
                 automated_tests=auto_tests or [],
             )
 
         except Exception as e:
-            print(f"[CoverageAgent] Error during analysis: {e}")
+            logger.warning("Error during analysis: %s", e)
             # Fallback - возвращаем базовый отчет
             return CoverageReport(
                 covered_features=[c.title for c in suite.cases],
                 missing_features=["Unable to analyze missing features due to error"],
-                duplicates=[],
+                duplicates=self._format_duplicates(duplicate_pairs),
                 summary=f"Generated {len(suite.cases)} test cases. Analysis failed: {str(e)}",
+                duplicate_pairs=duplicate_pairs,
                 test_suite=suite,
                 automated_tests=auto_tests or [],
             )
+
+    def attach_automated_tests(self, report: CoverageReport, e2e_code: str) -> CoverageReport:
+        """
+        Дописывает в отчёт, посчитанный без автотестов, число тестов в
+        сгенерированном e2e коде (функций test_*): анализ покрытия от e2e
+        кода не зависит и идёт параллельно с его генерацией.
+        """
+        report.summary = report.summary.replace(
+            AUTOMATED_TESTS_LINE.format(count=0),
+            AUTOMATED_TESTS_LINE.format(count=e2e_code.count("def test_")),
+            1,
+        )
+        return report
+
+    async def analyze_api(
+            self,
+            suite: TestSuite,
+            endpoints: list,
+            auto_tests: list[AutomatedTest] | None = None,
+    ) -> CoverageReport:
+        """
+        Покрытие API сьюта по спецификации (endpoints — _extract_endpoints_summary).
+        Матрица эндпоинт × кейс и пропуски считаются локально и детерминированно,
+        LLM вызывается только для пограничных пар дубликатов.
+        """
+        matrix = build_coverage_matrix(EndpointIndex(endpoints), suite.cases)
+        covered_features, missing_features = self._matrix_features(matrix)
+        logger.info(
+            "Endpoint coverage: %s/%s endpoints, %s/%s responses",
+            matrix.covered_endpoints, matrix.total_endpoints, matrix.covered_responses, matrix.total_responses,
+        )
+
+        duplicate_pairs, borderline_pairs = self._find_duplicates(suite)
+        if borderline_pairs:
+            try:
+                duplicate_pairs = duplicate_pairs + await self._judge_borderline_pairs(borderline_pairs)
+            except Exception as e:
+                logger.warning("Failed to judge borderline duplicates: %s", e)
+
+        summary = f"""API Coverage Analysis for '{suite.name}':
+- Total Tests: {len(suite.cases)}
+{AUTOMATED_TESTS_LINE.format(count=len(auto_tests) if auto_tests else 0)}
+- Endpoints Covered: {matrix.covered_endpoints}/{matrix.total_endpoints}
+- Responses Covered: {matrix.covered_responses}/{matrix.total_responses}
+- Tests Without Endpoint: {len(matrix.unmatched_cases)}
+- Duplicates Found: {len(duplicate_pairs)}
+"""
+
+        return CoverageReport(
+            covered_features=covered_features,
+            missing_features=missing_features,
+            duplicates=self._format_duplicates(duplicate_pairs),
+            summary=summary,
+            duplicate_pairs=duplicate_pairs,
+            coverage_matrix=matrix,
+        )
+
+    def _matrix_features(self, matrix: CoverageMatrix) -> tuple[list[str], list[str]]:
+        covered, missing = [], []
+        for endpoint in matrix.endpoints:
+            key = f"{endpoint.method} {endpoint.path}"
+            if not endpoint.cases:
+                missing.append(f"{key}: no test cases")
+                continue
+            covered_codes = [code for code, refs in endpoint.responses.items() if refs]
+            covered.append(f"{key} → {', '.join(covered_codes)}" if covered_codes else key)
+            missing.extend(
+                f"{key} → {code}: response is not checked"
+                for code, refs in endpoint.responses.items() if not refs
+            )
+        return covered, missing
+
+    async def _judge_borderline_pairs(self, pairs: list[DuplicatePair]) -> list[DuplicatePair]:
+        candidate_pairs = [
+            {"pair": i, "test1": pair.test1, "test2": pair.test2}
+            for i, pair in enumerate(pairs, 1)
+        ]
+        prompt = f"""For each candidate pair decide whether both tests check the same functionality.
+
+Candidate pairs:
+{json.dumps(candidate_pairs, indent=2, ensure_ascii=False)}
+
+Return JSON:
+{{
+  "duplicates": [
+    {{"pair": 1, "duplicate": true, "reason": "why they are (not) duplicates"}}
+  ]
+}}
+"""
+        data = await chat_completion({
+            "model": "openai/gpt-oss-120b",
+            "messages": [
+                {"role": "system", "content": "You are a QA expert analyzing test coverage."},
+                {"role": "user", "content": prompt}
+            ],
+            "temperature": 0.3,
+            "max_tokens": 1000,
+        })
+        content = data["choices"][0]["message"]["content"]
+        analysis = await parse_llm_json_async(content, array_key="duplicates")
+        verdicts = analysis.get("duplicates", []) if isinstance(analysis, dict) else analysis
+        return self._confirmed_pairs(pairs, verdicts)
+
+    def _suite_overview(self, suite: TestSuite) -> str:
+        """
+        Описание сьюта для поиска пробелов. Небольшой сьют уходит целиком, большой —
+        сводкой: распределение приоритетов и тегов и ограниченный список заголовков,
+        чтобы промпт не рос вместе со сьютом.
+        """
+        if len(suite.cases) <= settings.coverage_prompt_max_cases:
+            test_descriptions = [
+                {
+                    "title": case.title,
+                    "description": case.description,
+                    "tags": case.tags,
+                    "priority": case.priority,
+                }
+                for case in suite.cases
+            ]
+            return f"Test Cases:\n{json.dumps(test_descriptions, indent=2, ensure_ascii=False)}"
+
+        priorities = Counter(case.priority for case in suite.cases)
+        tags = Counter(tag for case in suite.cases for tag in case.tags)
+        titles = [case.title[:100] for case in suite.cases[:settings.coverage_prompt_max_titles]]
+        omitted = len(suite.cases) - len(titles)
+
+        lines = [
+            "Test Cases (summary of a large suite):",
+            "Priorities: " + ", ".join(f"{name} {count}" for name, count in priorities.most_common()),
+            "Tags: " + ", ".join(f"{name} {count}" for name, count in tags.most_common(50)),
+            "Titles:",
+            *(f"- {title}" for title in titles),
+        ]
+        if omitted:
+            lines.append(f"- ... {omitted} more test cases omitted")
+        return "\n".join(lines)
+
+    def _find_duplicates(self, suite: TestSuite) -> tuple[list[DuplicatePair], list[DuplicatePair]]:
+        """
+        Локальный поиск почти-дубликатов. Возвращает уверенные дубликаты
+        (похожесть >= dedup_threshold) и пограничные пары для LLM.
+        """
+        deduplicator = MinHashDeduplicator(num_bins=settings.dedup_num_bins, bands=settings.dedup_bands)
+        candidates = deduplicator.find_duplicates(suite.cases, settings.dedup_borderline_threshold)
+
+        duplicates, borderline = [], []
+        for candidate in candidates:
+            pair = DuplicatePair(
+                test1=suite.cases[candidate.left].title,
+                test2=suite.cases[candidate.right].title,
+                similarity=candidate.similarity,
+            )
+            if candidate.similarity >= settings.dedup_threshold:
+                duplicates.append(pair)
+            else:
+                borderline.append(pair)
+
+        # Пары отсортированы по убыванию похожести — LLM получает самые вероятные
+        return duplicates, borderline[:settings.dedup_llm_max_pairs]
+
+    def _confirmed_pairs(self, borderline: list[DuplicatePair], verdicts: list) -> list[DuplicatePair]:
+        confirmed = []
+        for verdict in verdicts:
+            if not isinstance(verdict, dict) or not verdict.get("duplicate"):
+                continue
+            index = verdict.get("pair")
+            if not isinstance(index, int) or not 1 <= index <= len(borderline):
+                continue
+            pair = borderline[index - 1].model_copy(update={"source": "llm", "reason": verdict.get("reason")})
+            confirmed.append(pair)
+        return confirmed
+
+    def _format_duplicates(self, pairs: list[DuplicatePair]) -> list[str]:
+        return [
+            f"{pair.test1} ↔ {pair.test2}: {pair.reason or 'near-duplicate'} (similarity {pair.similarity:.2f})"
+            for pair in pairs
+        ]
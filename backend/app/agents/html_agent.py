@@ -1,16 +1,185 @@
-from bs4 import BeautifulSoup
+import re
+from html.parser import HTMLParser
+
 import httpx
+from app.config import settings
+from app.agents.locators import LocatorIndex
+from app.crawler import CrawlResult, SiteCrawler
+from app.executor import cpu_executor
+from app.http_client import get_http_client
+from app.metrics import stage_timer
 from app.models import UiModel, UiPage, UiElement
 
+try:
+    from lxml import etree
+except ImportError:
+    etree = None
+
+HTML_PARSER = "lxml" if etree is not None else "html.parser"
+
+INTERACTIVE_TAGS = ['input', 'button', 'select', 'textarea', 'a']
+_INTERACTIVE = frozenset(INTERACTIVE_TAGS)
+
+# Скрипты, стили, SVG и комментарии вырезаются до парсинга:
+# на SPA-страницах это большая часть документа
+_NOISE_RE = re.compile(
+    r"<!--.*?-->|<(script|style|svg)\b[^>]*>.*?</\1\s*>",
+    re.IGNORECASE | re.DOTALL,
+)
+
+
+def strip_noise(html: str) -> str:
+    return _NOISE_RE.sub("", html)
+
+
+class _Element:
+    """
+    Лёгкая замена bs4.Tag для интерактивного элемента: имя, атрибуты и текст.
+    class хранится списком, как в BeautifulSoup.
+    """
+
+    __slots__ = ("name", "attrs", "chunks")
+
+    def __init__(self, name: str, attrs: dict):
+        self.name = name
+        self.attrs = attrs
+        self.chunks: list[str] = []
+
+    def get(self, key, default=None):
+        return self.attrs.get(key, default)
+
+    def __getitem__(self, key):
+        return self.attrs[key]
+
+    def get_text(self, strip: bool = False) -> str:
+        if strip:
+            return "".join(filter(None, map(str.strip, self.chunks)))
+        return "".join(self.chunks)
+
+
+class _InteractiveCollector:
+    """
+    Потоковый сборщик: из событий токенизатора (start/end/data) запоминает
+    только интерактивные элементы и <title>, дерево документа не строится.
+    Интерфейс совпадает с target-парсером lxml.
+    """
+
+    def __init__(self):
+        self.elements: list[_Element] = []
+        # id всех тегов документа: уникальность локатора id=... проверяется по ним
+        self.id_counts: dict[str, int] = {}
+        self.title_chunks: list[str] | None = None
+        self._open: list[_Element] = []
+        self._in_title = False
+        # Токенизатор может резать одну строку на части (lxml — вокруг сущностей),
+        # соседние куски склеиваются, как в одну NavigableString
+        self._after_data = False
+
+    def start(self, tag: str, attrs: dict):
+        self._after_data = False
+        tag = tag.lower()
+        element_id = attrs.get('id')
+        if element_id:
+            self.id_counts[element_id] = self.id_counts.get(element_id, 0) + 1
+        if tag in _INTERACTIVE:
+            attrs = {k.lower(): ("" if v is None else v) for k, v in attrs.items()}
+            if "class" in attrs:
+                attrs["class"] = attrs["class"].split()
+            element = _Element(tag, attrs)
+            self.elements.append(element)
+            # input — пустой элемент, текста у него нет
+            if tag != 'input':
+                self._open.append(element)
+        elif tag == 'title' and self.title_chunks is None:
+            self.title_chunks = []
+            self._in_title = True
+
+    def end(self, tag: str):
+        self._after_data = False
+        tag = tag.lower()
+        if tag == 'title':
+            self._in_title = False
+            return
+        for i in range(len(self._open) - 1, -1, -1):
+            if self._open[i].name == tag:
+                del self._open[i:]
+                return
+
+    def data(self, text: str):
+        if self._after_data:
+            for element in self._open:
+                element.chunks[-1] += text
+            if self._in_title:
+                self.title_chunks[-1] += text
+            return
+        self._after_data = True
+        for element in self._open:
+            element.chunks.append(text)
+        if self._in_title:
+            self.title_chunks.append(text)
+
+    def close(self):
+        return self
+
+    @property
+    def title(self) -> str | None:
+        # Как soup.title.string: только если внутри ровно одна строка
+        if self.title_chunks and len(self.title_chunks) == 1:
+            return self.title_chunks[0]
+        return None
+
+
+class _StdlibTokenizer(HTMLParser):
+    def __init__(self, collector: _InteractiveCollector):
+        super().__init__(convert_charrefs=True)
+        self._collector = collector
+
+    def handle_starttag(self, tag, attrs):
+        self._collector.start(tag, dict(attrs))
+
+    def handle_startendtag(self, tag, attrs):
+        self._collector.start(tag, dict(attrs))
+        self._collector.end(tag)
+
+    def handle_endtag(self, tag):
+        self._collector.end(tag)
+
+    def handle_data(self, data):
+        self._collector.data(data)
+
+
+def collect_interactive(html: str) -> _InteractiveCollector:
+    """
+    Один потоковый проход по HTML: lxml (C) при наличии, иначе html.parser.
+    """
+    collector = _InteractiveCollector()
+    html = strip_noise(html)
+    if etree is not None:
+        parser = etree.HTMLParser(target=collector)
+        parser.feed(html)
+        parser.close()
+    else:
+        tokenizer = _StdlibTokenizer(collector)
+        tokenizer.feed(html)
+        tokenizer.close()
+    return collector
+
+
+def _extract_page_json(html: str, url: str | None) -> tuple[str, list[str]]:
+    # Выполняется в пуле процессов. UiPage возвращается JSON-строкой:
+    # pydantic-core сериализует и валидирует её быстрее, чем pickle модели
+    page, links = HtmlAnalysisAgent().extract_page(html, url)
+    return page.model_dump_json(), links
+
 
 class HtmlAnalysisAgent:
     async def analyze(self, *, url: str | None, html: str | None) -> UiModel:
         if html is None and url:
             try:
-                async with httpx.AsyncClient() as client:
-                    response = await client.get(url, timeout=30.0)
-                    response.raise_for_status()  # Проверка 200 OK
-                    html = response.text
+                with stage_timer("html_fetch"):
+                    response = await get_http_client().get(url, timeout=30.0)
+                response.raise_for_status()  # Проверка 200 OK
+                html = response.text
             except httpx.HTTPStatusError as e:
                 raise ValueError(f"Failed to fetch URL: {e.response.status_code}")
             except httpx.TimeoutException:
@@ -19,14 +188,60 @@ class HtmlAnalysisAgent:
         if not html or len(html) < 50:
             raise ValueError("HTML is empty or too short")
 
-        soup = BeautifulSoup(html, 'html.parser')
+        page, _ = await self.parse(html, url)
+        return UiModel(pages=[page])
+
+    async def crawl(
+            self,
+            url: str,
+            *,
+            max_depth: int | None = None,
+            max_pages: int | None = None,
+    ) -> CrawlResult:
+        """
+        Обходит сайт от url по ссылкам того же origin: каждая страница — UiPage.
+        """
+        crawler = SiteCrawler(
+            self.parse,
+            max_depth=settings.crawl_max_depth if max_depth is None else max_depth,
+            max_pages=settings.crawl_max_pages if max_pages is None else max_pages,
+            concurrency=settings.crawl_concurrency,
+            user_agent=settings.crawl_user_agent,
+        )
+        return await crawler.crawl(url)
+
+    async def parse(self, html: str, url: str | None) -> tuple[UiPage, list[str]]:
+        """
+        extract_page вне event loop (для больших страниц — в пуле процессов).
+        """
+        with stage_timer("html_parse"):
+            page_json, links = await cpu_executor.run(_extract_page_json, html, url, size=len(html))
+        return UiPage.model_validate_json(page_json), links
+
+    def parse_page(self, html: str, url: str | None) -> UiPage:
+        """
+        Разбор HTML в UiPage без сети: синхронный и CPU-bound.
+        """
+        return self.extract_page(html, url)[0]
+
+    def extract_page(self, html: str, url: str | None) -> tuple[UiPage, list[str]]:
+        """
+        UiPage и href всех ссылок страницы (для обхода сайта).
+        """
+        collector = collect_interactive(html)
+        locators = LocatorIndex(collector.elements, collector.id_counts).locators()
         elements = []
 
-        for tag in soup.find_all(['input', 'button', 'select', 'textarea', 'a']):
+        for tag, locator in zip(collector.elements, locators):
+            # Текст элемента собирается один раз и передаётся в хелперы
+            text = tag.get_text(strip=True)
             element_type = self._get_element_type(tag)
-            name = self._get_element_name(tag)
-            locator = self._generate_locator(tag)
-            role = self._determine_role(tag)
+            name = self._get_element_name(tag, text)
+            role = self._determine_role(tag, text)
+
+            # Скрытые поля (csrf, состояние формы) не интерактивны
+            if tag.name == 'input' and tag.get('type', '').lower() == 'hidden':
+                continue
 
             if name and locator:
                 elements.append(UiElement(
@@ -38,12 +253,12 @@ class HtmlAnalysisAgent:
 
         page = UiPage(
             url=url or "about:blank",
-            name=soup.title.string if soup.title else "Page",
+            name=collector.title or "Page",
             elements=elements,
             main_flows=["Main user flow"]
         )
-
-        return UiModel(pages=[page])
+        links = [tag.get('href') for tag in collector.elements if tag.name == 'a' and tag.get('href')]
+        return page, links
 
     def _get_element_type(self, tag) -> str:
         """Определяем тип элемента"""
@@ -63,46 +278,20 @@ class HtmlAnalysisAgent:
             return tag.name
         return 'other'
 
-    def _get_element_name(self, tag) -> str:
+    def _get_element_name(self, tag, text: str) -> str:
         return (
                 tag.get('aria-label') or
                 tag.get('placeholder') or
                 tag.get('value') or
-                tag.get_text(strip=True) or
+                text or
                 tag.get('id') or
                 tag.get('name') or
                 f"{tag.name}_element"
         )
 
-    def _generate_locator(self, tag) -> str:
-        """Генерируем XPath локатор"""
-        # По ID (самый надёжный)
-        if tag.get('id'):
-            return f"id='{tag['id']}'"
-
-        # По name
-        if tag.get('name'):
-            return f"//{tag.name}[@name='{tag['name']}']"
-
-        # По тексту (для button/a)
-        text = tag.get_text(strip=True)
-        if text and tag.name in ['button', 'a']:
-            return f"//{tag.name}[contains(text(), '{text[:30]}')]"
-
-        # По placeholder
-        if tag.get('placeholder'):
-            return f"//{tag.name}[@placeholder='{tag['placeholder']}']"
-
-        # По классу
-        if tag.get('class'):
-            class_name = ' '.join(tag['class'])
-            return f"//{tag.name}[@class='{class_name}']"
-
-        return f"//{tag.name}"
-
-    def _determine_role(self, tag) -> str:
+    def _determine_role(self, tag, text: str) -> str:
         """Определяем роль элемента"""
-        text = tag.get_text(strip=True).lower() if tag.get_text(strip=True) else ""
+        text = text.lower()
         tag_type = tag.get('type', '').lower()
 
         if tag.name == 'button' or tag_type == 'submit':
@@ -0,0 +1,121 @@
+from collections import Counter
+from itertools import combinations
+from typing import Dict, List, Sequence
+
+# Атрибуты-кандидаты в порядке предпочтения (устойчивость к правкам вёрстки)
+_ATTRIBUTES = ("data-testid", "name", "aria-label", "placeholder")
+# Слабые атрибуты: обычно уточняют другой признак (радиокнопки с общим name)
+_WEAK_ATTRIBUTES = ("type", "value")
+
+# Длиннее — текст сравнивается по префиксу через starts-with()
+TEXT_PREFIX = 60
+
+
+def xpath_literal(value: str) -> str:
+    """
+    Строковый литерал XPath 1.0: кавычки экранировать нельзя, поэтому
+    значение с обоими видами кавычек собирается через concat().
+    """
+    if "'" not in value:
+        return f"'{value}'"
+    if '"' not in value:
+        return f'"{value}"'
+    parts = value.split("'")
+    return "concat(" + ", \"'\", ".join(f"'{p}'" for p in parts) + ")"
+
+
+def normalized_text(element) -> str:
+    # Как XPath normalize-space(): пробелы схлопываются, а не удаляются
+    return " ".join("".join(element.chunks).split())
+
+
+def _predicates(element, text: str) -> List[str]:
+    predicates = [
+        f"@{attr}={xpath_literal(element.get(attr))}"
+        for attr in _ATTRIBUTES
+        if element.get(attr)
+    ]
+    if text:
+        if len(text) <= TEXT_PREFIX:
+            predicates.append(f"normalize-space()={xpath_literal(text)}")
+        else:
+            predicates.append(f"starts-with(normalize-space(), {xpath_literal(text[:TEXT_PREFIX])})")
+    if element.get("class"):
+        predicates.append(f"normalize-space(@class)={xpath_literal(' '.join(element.get('class')))}")
+    predicates.extend(
+        f"@{attr}={xpath_literal(element.get(attr))}"
+        for attr in _WEAK_ATTRIBUTES
+        if element.get(attr)
+    )
+    return predicates
+
+
+def _match_keys(predicates: List[str], text: str) -> List[str]:
+    # Текст ровно TEXT_PREFIX символов совпадает и с чужим starts-with()
+    if len(text) == TEXT_PREFIX:
+        return predicates + [f"starts-with(normalize-space(), {xpath_literal(text)})"]
+    return predicates
+
+
+class LocatorIndex:
+    """
+    Индекс атрибутов документа для уникальных локаторов.
+
+    За один проход по интерактивным элементам считается, сколько элементов
+    каждого тега совпадает с каждым предикатом (id — по всем тегам документа).
+    Локатор элемента — первый уникальный по индексу вариант: id, один
+    предикат, пара предикатов, иначе позиция (//tag)[n]. Число предикатов
+    на элемент ограничено, поэтому построение линейно по размеру страницы.
+    """
+
+    def __init__(self, elements: Sequence, id_counts: Dict[str, int]):
+        self._elements = elements
+        self._id_counts = id_counts
+        self._texts = [normalized_text(element) for element in elements]
+        self._predicates = [_predicates(e, t) for e, t in zip(elements, self._texts)]
+
+        self._single: Counter = Counter()
+        self._positions: List[int] = []
+        per_tag: Counter = Counter()
+        for element, text, predicates in zip(elements, self._texts, self._predicates):
+            per_tag[element.name] += 1
+            self._positions.append(per_tag[element.name])
+            for key in _match_keys(predicates, text):
+                self._single[element.name, key] += 1
+
+        # Пары считаются только если понадобятся
+        self._pairs: Counter | None = None
+
+    def locators(self) -> List[str]:
+        return [self.locator(i) for i in range(len(self._elements))]
+
+    def locator(self, index: int) -> str:
+        element = self._elements[index]
+        tag = element.name
+
+        element_id = element.get("id")
+        if element_id and self._id_counts.get(element_id) == 1:
+            return f"id={xpath_literal(element_id)}"
+
+        predicates = self._predicates[index]
+        for predicate in predicates:
+            if self._single[tag, predicate] == 1:
+                return f"//{tag}[{predicate}]"
+
+        if len(predicates) > 1:
+            pairs = self._pair_counts()
+            for first, second in combinations(predicates, 2):
+                if pairs[tag, first, second] == 1:
+                    return f"//{tag}[{first}][{second}]"
+
+        return f"(//{tag})[{self._positions[index]}]"
+
+    def _pair_counts(self) -> Counter:
+        if self._pairs is None:
+            self._pairs = Counter()
+            for element, text, predicates in zip(self._elements, self._texts, self._predicates):
+                keys = _match_keys(predicates, text)
+                for first, second in combinations(keys, 2):
+                    self._pairs[element.name, first, second] += 1
+                    self._pairs[element.name, second, first] += 1
+        return self._pairs
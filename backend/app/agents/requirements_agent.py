@@ -1,12 +1,21 @@
+import asyncio
 import json
-from typing import List, Optional
+import logging
+from typing import AsyncIterator, Dict, List, Optional
 import httpx
-import yaml
 import re
 from app.models import TestSuite, TestCase
-from app.llm_client import get_llm_client
+from app.llm_client import chat_completion, stream_chat_completion
+from app.json_stream import parse_llm_json_async, iter_json_array
+from app.jobs import report_progress
+from app.spec_store import spec_store
+from app.spec_diff import HTTP_METHODS, SpecDiff, diff_fingerprints, spec_fingerprint, split_cases_by_diff
+from app.endpoint_index import endpoint_key
 from app.config import settings
 from app.models import UiModel
+from app.ui_compaction import compact_page, estimate_tokens
+
+logger = logging.getLogger(__name__)
 
 
 class RequirementsAgent:
@@ -17,7 +26,8 @@ class RequirementsAgent:
     def __init__(self):
         self._model_name = "openai/gpt-oss-120b"
 
-    async def generate_from_requirements_text(self, requirements: str) -> TestSuite:
+    def _requirements_text_payload(self, requirements: str) -> dict:
+        """Собирает запрос к LLM для генерации UI тест-кейсов из требований."""
         system_prompt = """You are an expert in UI web application testing and Allure TestOps.
 
         **IMPORTANT: Write ALL content ONLY in ENGLISH. Do NOT use Russian or any other language.**
@@ -80,93 +90,34 @@ class RequirementsAgent:
 
         Generate at least 15 test cases for manual testing of this functionality."""
 
-        print(f"[RequirementsAgent] Calling LLM with model: {self._model_name}")
-
-        # Вызов LLM
-        with get_llm_client() as client:
-            resp = client.post(
-                "/chat/completions",
-                json={
-                    "model": self._model_name,
-                    "messages": [
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": user_prompt}
-                    ],
-                    "temperature": 0.8,
-                    "max_tokens": 20000,
-                }
-            )
+        return {
+            "model": self._model_name,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            "temperature": 0.8,
+            "max_tokens": 20000,
+        }
 
-        if resp.status_code != 200:
-            print(f"[RequirementsAgent] LLM API error: {resp.status_code}")
-            raise Exception(f"LLM API error: {resp.status_code} - {resp.text}")
+    async def generate_from_requirements_text(self, requirements: str) -> TestSuite:
+        logger.info("Calling LLM with model: %s", self._model_name)
 
-        data = resp.json()
+        # Вызов LLM
+        data = await chat_completion(self._requirements_text_payload(requirements))
 
         content = data["choices"][0]["message"]["content"]
 
-        print(f"[RequirementsAgent] API response length: {len(content)} characters")
-
-        # Если JSON обрезан - пытаемся восстановить
-        if not content.strip().endswith('}') and not content.strip().endswith(']'):
-            print(f"[RequirementsAgent] Warning: Response appears truncated, attempting to fix")
-            # Добавляем закрывающие скобки если их нет
-            if '[' in content and ']' not in content:
-                content = content + ']'
+        logger.info("API response length: %s characters", len(content))
 
-        # Парсинг JSON
-        try:
-            backticks = "```"
-            if backticks + "json" in content:
-                content = content.split(backticks + "json").split(backticks).strip()[1]
-            elif backticks in content:
-                parts = content.split(backticks)
-                if len(parts) >= 2:
-                    content = parts.strip()[1]
-
-            suite_data = json.loads(content)
-
-            # Если LLM вернул массив напрямую
-            if isinstance(suite_data, list):
-                for case in suite_data:
-                    if isinstance(case, dict):
-                        priority = str(case.get("priority", "NORMAL")).upper().strip()
-                        if priority not in ["CRITICAL", "HIGH", "MEDIUM", "NORMAL", "LOW"]:
-                            priority = "NORMAL"
-                        case["priority"] = priority
-                print(f"[RequirementsAgent] Parsed {len(suite_data)} UI cases from JSON (array format)")
-                cases = [TestCase(**case) for case in suite_data]
-                return TestSuite(
-                    name="Test Suite for UI Calculator",
-                    description="Manual test cases for UI testing",
-                    cases=cases
-                )
-            # Если вернул объект с полем cases
-            elif isinstance(suite_data, dict):
-                for case in suite_data.get("cases", []):
-                    if isinstance(case, dict):
-                        priority = str(case.get("priority", "NORMAL")).upper().strip()
-                        if priority not in ["CRITICAL", "HIGH", "MEDIUM", "NORMAL", "LOW"]:
-                            priority = "NORMAL"
-                        case["priority"] = priority
-                print(f"[RequirementsAgent] Parsed {len(suite_data.get('cases', []))} UI cases from JSON (dict format)")
-                cases = [TestCase(**case) for case in suite_data.get("cases", [])]
-                return TestSuite(
-                    name=suite_data.get("name", "Generated Test Suite"),
-                    description=suite_data.get("description", ""),
-                    cases=cases
-                )
-            else:
-                raise ValueError(f"Unexpected response format: {type(suite_data)}")
+        return await self._parse_suite_response(
+            content,
+            default_name="Generated Test Suite",
+            default_description="Manual test cases for UI testing",
+        )
 
-
-        except (json.JSONDecodeError, KeyError, ValueError) as e:
-            print(f"[RequirementsAgent] Failed to parse LLM response: {e}")
-            print(f"[RequirementsAgent] Full content:\n{content}")
-            raise Exception(f"Failed to parse LLM response: {e}\nContent: {content[:1000]}")
-
-    async def generate_api_test_cases(self, api_spec: str, requirements_text: Optional[str] = None) -> TestSuite:
-        """Генерирует тест-кейсы для API на основе текстовой спецификации."""
+    def _api_test_cases_payload(self, api_spec: str, requirements_text: Optional[str] = None) -> dict:
+        """Собирает запрос к LLM для генерации API тест-кейсов из текстовой спецификации."""
 
         system_prompt = """You are a QA automation expert specializing in REST API testing.
 
@@ -218,94 +169,45 @@ Additional requirements:
 
 Minimum 15-20 test cases required."""
 
-        print(f"[RequirementsAgent] Generating API test cases with model: {self._model_name}")
+        return {
+            "model": self._model_name,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            "temperature": 0.7,
+            "max_tokens": 50000,
+        }
 
-        # Вызов LLM
-        with get_llm_client() as client:
-            resp = client.post(
-                "/chat/completions",
-                json={
-                    "model": self._model_name,
-                    "messages": [
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": user_prompt}
-                    ],
-                    "temperature": 0.7,
-                    "max_tokens": 50000,
-                }
-            )
+    async def generate_api_test_cases(self, api_spec: str, requirements_text: Optional[str] = None) -> TestSuite:
+        """Генерирует тест-кейсы для API на основе текстовой спецификации."""
+        logger.info("Generating API test cases with model: %s", self._model_name)
 
-        if resp.status_code != 200:
-            print(f"[RequirementsAgent] LLM API error: {resp.status_code}")
-            raise Exception(f"LLM API error: {resp.status_code} - {resp.text}")
+        # Вызов LLM
+        data = await chat_completion(self._api_test_cases_payload(api_spec, requirements_text))
 
-        data = resp.json()
         content = data["choices"][0]["message"]["content"]
 
-        print(f"[RequirementsAgent] API response length: {len(content)} characters")
-
-        # Парсинг JSON
-        try:
-            backticks = "```"
-            if backticks + "json" in content:
-                content = content.split(backticks + "json")[1].split(backticks)[0].strip()
-            elif backticks in content:
-                parts = content.split(backticks)
-                if len(parts) >= 2:
-                    content = parts[1].strip()
-
-            suite_data = json.loads(content)
-
-            print(f"[RequirementsAgent] Parsed API response type: {type(suite_data)}")
-
-            # Если LLM вернул массив напрямую
-            if isinstance(suite_data, list):
-                for case in suite_data:
-                    if isinstance(case, dict):
-                        priority = str(case.get("priority", "NORMAL")).upper().strip()
-                        if priority not in ["CRITICAL", "HIGH", "MEDIUM", "NORMAL", "LOW"]:
-                            priority = "NORMAL"
-                        case["priority"] = priority
-                cases = [TestCase(**case) for case in suite_data]
-                return TestSuite(
-                    name="Evolution Compute API Test Suite",
-                    description="Manual test cases for VMs, Disks, and Flavors API",
-                    cases=cases
-                )
-            # Если вернул объект с полем cases
-            elif isinstance(suite_data, dict):
-                for case in suite_data.get("cases", []):
-                    if isinstance(case, dict):
-                        priority = str(case.get("priority", "NORMAL")).upper().strip()
-                        if priority not in ["CRITICAL", "HIGH", "MEDIUM", "NORMAL", "LOW"]:
-                            priority = "NORMAL"
-                        case["priority"] = priority
-                cases = [TestCase(**case) for case in suite_data.get("cases", [])]
-                return TestSuite(
-                    name=suite_data.get("name", "Evolution Compute API Test Suite"),
-                    description=suite_data.get("description", "Manual test cases for VMs, Disks, and Flavors API"),
-                    cases=cases
-                )
-            else:
-                raise ValueError(f"Unexpected response format: {type(suite_data)}")
+        logger.info("API response length: %s characters", len(content))
 
-        except (json.JSONDecodeError, KeyError, ValueError) as e:
-            print(f"[RequirementsAgent] Failed to parse API response: {e}")
-            print(f"[RequirementsAgent] Full content:\n{content}")
-            raise Exception(f"Failed to parse LLM response: {e}\nContent: {content[:1000]}")
+        return await self._parse_suite_response(
+            content,
+            default_name="Evolution Compute API Test Suite",
+            default_description="Manual test cases for VMs, Disks, and Flavors API",
+        )
 
-    async def generate_from_api_spec(
+    async def load_api_spec(
             self,
             swagger_url: Optional[str] = None,
             swagger_text: Optional[str] = None,
-            requirements_text: Optional[str] = None
-    ) -> TestSuite:
+    ) -> dict:
         """
-        Генерирует тест-кейсы из OpenAPI/Swagger спецификации.
+        Загружает и разбирает OpenAPI/Swagger спецификацию.
         Принимает либо URL на swagger.json/yaml, либо текст спецификации.
+        Возвращает название, версию, base_url и краткое описание эндпоинтов.
         """
-        print(f"[RequirementsAgent] generate_from_api_spec called")
-        print(f"[RequirementsAgent] Raw swagger_url={repr(swagger_url)}, has_text={bool(swagger_text)}")
+        logger.debug("load_api_spec called")
+        logger.debug("Raw swagger_url=%r, has_text=%s", swagger_url, bool(swagger_text))
 
         # ✅ Извлекаем и очищаем URL
         if swagger_url:
@@ -321,48 +223,36 @@ Minimum 15-20 test cases required."""
             matches = re.findall(url_pattern, swagger_url)
             if matches:
                 swagger_url = matches[0].strip()
-                print(f"[RequirementsAgent] Extracted URL from text: {swagger_url}")
+                logger.debug("Extracted URL from text: %s", swagger_url)
 
             # Убираем непечатаемые символы и пробелы
             swagger_url = ''.join(char for char in swagger_url if char.isprintable() and not char.isspace())
-            print(f"[RequirementsAgent] Final cleaned URL: {swagger_url}")
-
-        # 1. Получаем спецификацию
-        spec_content = ""
+            logger.debug("Final cleaned URL: %s", swagger_url)
 
+        # 1. Получаем спецификацию (кэш по URL с условной ревалидацией и по хэшу текста)
         if swagger_url:
-            print(f"[RequirementsAgent] Fetching spec from URL: {swagger_url}")
-            async with httpx.AsyncClient(timeout=30.0, follow_redirects=True) as client:
-                try:
-                    response = await client.get(swagger_url)
-                    response.raise_for_status()
-                    spec_content = response.text
-                    print(f"[RequirementsAgent] Fetched {len(spec_content)} bytes")
-                except httpx.InvalidURL as e:
-                    print(f"[RequirementsAgent] Invalid URL error: {e}")
-                    print(f"[RequirementsAgent] URL bytes: {swagger_url.encode('utf-8')}")
-                    raise Exception(
-                        f"Invalid Swagger URL format. Please provide a clean URL like: https://petstore3.swagger.io/api/v3/openapi.json")
-                except httpx.HTTPStatusError as e:
-                    raise Exception(f"Failed to fetch Swagger from URL: {e.response.status_code} - {e.response.text}")
-                except Exception as e:
-                    raise Exception(f"Failed to fetch Swagger from URL: {str(e)}")
+            logger.info("Fetching spec from URL: %s", swagger_url)
+            try:
+                entry = await spec_store.fetch(swagger_url)
+            except httpx.InvalidURL as e:
+                logger.warning("Invalid URL error: %s", e)
+                logger.debug("URL bytes: %s", swagger_url.encode('utf-8'))
+                raise Exception(
+                    f"Invalid Swagger URL format. Please provide a clean URL like: https://petstore3.swagger.io/api/v3/openapi.json")
+            except httpx.HTTPStatusError as e:
+                raise Exception(f"Failed to fetch Swagger from URL: {e.response.status_code} - {e.response.text}")
+            except ValueError:
+                raise
+            except Exception as e:
+                raise Exception(f"Failed to fetch Swagger from URL: {str(e)}")
         elif swagger_text:
-            spec_content = swagger_text
-            print(f"[RequirementsAgent] Using provided spec text: {len(spec_content)} bytes")
+            logger.info("Using provided spec text: %s bytes", len(swagger_text))
+            # 2. Парсим спецификацию (JSON или YAML)
+            entry = await spec_store.load_text(swagger_text)
         else:
             raise ValueError("Either swagger_url or swagger_text must be provided")
 
-        # 2. Парсим спецификацию (JSON или YAML)
-        try:
-            spec_dict = json.loads(spec_content)
-            print("[RequirementsAgent] Parsed as JSON")
-        except json.JSONDecodeError:
-            try:
-                spec_dict = yaml.safe_load(spec_content)
-                print("[RequirementsAgent] Parsed as YAML")
-            except yaml.YAMLError as e:
-                raise ValueError(f"Invalid OpenAPI spec format: {e}")
+        spec_dict = entry.spec
 
         # 3. Извлекаем базовую информацию
         api_title = spec_dict.get("info", {}).get("title", "API")
@@ -371,13 +261,184 @@ Minimum 15-20 test cases required."""
         if "servers" in spec_dict and spec_dict["servers"]:
             base_url = spec_dict["servers"][0].get("url", "")
 
-        print(f"[RequirementsAgent] API: {api_title} v{api_version}, base_url={base_url}")
+        logger.info("API: %s v%s, base_url=%s", api_title, api_version, base_url)
+
+        # 4. Извлекаем эндпоинты (один раз на одинаковую спецификацию)
+        if entry.endpoints is None:
+            entry.endpoints = self._extract_endpoints_summary(spec_dict)
+        endpoints_summary = entry.endpoints
+        logger.info("Extracted %s endpoints", len(endpoints_summary))
+
+        # Отпечаток для diff — по полной спецификации, а не по урезанному summary для промпта
+        if entry.fingerprint is None:
+            entry.fingerprint = spec_fingerprint(spec_dict)
+
+        return {
+            "title": api_title,
+            "version": api_version,
+            "base_url": base_url,
+            "endpoints": endpoints_summary,
+            "fingerprint": entry.fingerprint,
+        }
+
+    async def generate_from_api_spec(
+            self,
+            swagger_url: Optional[str] = None,
+            swagger_text: Optional[str] = None,
+            requirements_text: Optional[str] = None
+    ) -> TestSuite:
+        """
+        Генерирует тест-кейсы из OpenAPI/Swagger спецификации.
+        Эндпоинты делятся на шарды, которые генерируются параллельно.
+        """
+        spec = await self.load_api_spec(swagger_url=swagger_url, swagger_text=swagger_text)
+        shard_cases, errors = await self._generate_endpoint_shards(spec["endpoints"], spec, requirements_text)
+
+        if not shard_cases:
+            raise Exception(f"Failed to generate test cases: {errors[0] if errors else 'no endpoints in spec'}")
+
+        # 7. Склеиваем результаты: убираем дубликаты между шардами и перенумеровываем
+        cases = self._merge_shard_cases(shard_cases)
+        logger.info("Merged %s cases from %s shards (%s failed)", len(cases), len(shard_cases), len(errors))
+
+        return TestSuite(
+            name=f"{spec['title']} API Test Suite",
+            description=f"Manual test cases for {spec['title']} v{spec['version']}",
+            cases=cases
+        )
+
+    async def regenerate_from_api_spec_diff(
+            self,
+            previous_suite: TestSuite,
+            previous_fingerprint: Dict[str, str],
+            swagger_url: Optional[str] = None,
+            swagger_text: Optional[str] = None,
+            requirements_text: Optional[str] = None
+    ) -> tuple[TestSuite, SpecDiff, Dict[str, str]]:
+        """
+        Инкрементальная перегенерация после обновления спецификации.
+        В LLM уходят только добавленные и изменённые эндпоинты, кейсы
+        неизменённых эндпоинтов переносятся из прошлого сьюта как есть.
+        Возвращает сьют, diff и отпечаток новой спецификации.
+        """
+        spec = await self.load_api_spec(swagger_url=swagger_url, swagger_text=swagger_text)
+        fingerprint = spec["fingerprint"]
+        diff = diff_fingerprints(previous_fingerprint, fingerprint)
+        logger.info(
+            "Spec diff: %s added, %s changed, %s removed, %s unchanged",
+            len(diff.added), len(diff.changed), len(diff.removed), len(diff.unchanged),
+        )
+
+        carried, stale = split_cases_by_diff(previous_suite.cases, diff)
+        logger.info("Carrying over %s cases, dropping %s stale cases", len(carried), len(stale))
+
+        to_generate = set(diff.added) | set(diff.changed)
+        endpoints = [e for e in spec["endpoints"] if endpoint_key(e) in to_generate]
+
+        shard_cases: List[List[TestCase]] = []
+        if endpoints:
+            shard_cases, errors = await self._generate_endpoint_shards(endpoints, spec, requirements_text)
+            if not shard_cases:
+                raise Exception(f"Failed to generate test cases: {errors[0]}")
+            logger.info("Generated cases for %s endpoints (%s shards failed)", len(endpoints), len(errors))
+
+        # ID удалённых кейсов не переиспользуем
+        cases = self._append_new_cases(carried, shard_cases, previous_suite.cases)
+
+        suite = TestSuite(
+            name=f"{spec['title']} API Test Suite",
+            description=f"Manual test cases for {spec['title']} v{spec['version']}",
+            cases=cases
+        )
+        return suite, diff, fingerprint
+
+    def _append_new_cases(
+            self,
+            carried: List[TestCase],
+            shard_cases: List[List[TestCase]],
+            previous_cases: List[TestCase],
+    ) -> List[TestCase]:
+        """
+        Добавляет новые кейсы к перенесённым: перенесённые сохраняют свои ID,
+        новые нумеруются после последнего ID прошлого сьюта, дубликаты отбрасываются.
+        """
+        cases = list(carried)
+        seen = {self._case_key(case) for case in carried}
+        numbers = [int(m.group(1)) for m in (re.fullmatch(r"TC-(\d+)", c.id or "") for c in previous_cases) if m]
+        next_number = max(numbers, default=0) + 1
+
+        for new_cases in shard_cases:
+            for case in new_cases:
+                key = self._case_key(case)
+                if key in seen:
+                    continue
+                seen.add(key)
+                case.id = f"TC-{next_number:03d}"
+                next_number += 1
+                cases.append(case)
+
+        return cases
+
+    async def _generate_endpoint_shards(
+            self,
+            endpoints: list,
+            spec: dict,
+            requirements_text: Optional[str],
+    ) -> tuple[List[List[TestCase]], List[Exception]]:
+        """
+        Делит эндпоинты на шарды и генерирует их параллельно.
+        Возвращает кейсы успешных шардов и ошибки упавших.
+        """
+        # 5. Делим эндпоинты на шарды по тегу/префиксу пути с бюджетом токенов
+        shards = self._shard_endpoints(endpoints, settings.spec_shard_token_budget)
+        logger.info("Split endpoints into %s shards (concurrency=%s)", len(shards), settings.spec_shard_concurrency)
 
-        # 4. Извлекаем эндпоинты
-        endpoints_summary = self._extract_endpoints_summary(spec_dict)
-        print(f"[RequirementsAgent] Extracted {len(endpoints_summary)} endpoints")
+        # 6. Генерируем шарды параллельно с ограничением конкурентности
+        semaphore = asyncio.Semaphore(max(1, settings.spec_shard_concurrency))
+
+        completed_shards = 0
+
+        async def run_shard(index: int, shard: list) -> List[TestCase]:
+            nonlocal completed_shards
+            async with semaphore:
+                logger.info("Generating shard %s/%s (%s endpoints)", index + 1, len(shards), len(shard))
+                try:
+                    return await self._generate_spec_shard(shard, spec, requirements_text)
+                finally:
+                    completed_shards += 1
+                    report_progress(
+                        0.1 + 0.8 * completed_shards / len(shards),
+                        f"Generated {completed_shards}/{len(shards)} shards"
+                    )
+
+        results = await asyncio.gather(
+            *(run_shard(i, shard) for i, shard in enumerate(shards)),
+            return_exceptions=True,
+        )
+
+        shard_cases = []
+        errors = []
+        for i, result in enumerate(results):
+            if isinstance(result, Exception):
+                logger.warning("Shard %s failed: %s", i + 1, result)
+                errors.append(result)
+            else:
+                shard_cases.append(result)
+
+        return shard_cases, errors
+
+    def _spec_shard_payload(self, endpoints: list, spec: dict, requirements_text: Optional[str]) -> dict:
+        """
+        Собирает запрос к LLM для одного шарда эндпоинтов.
+        """
+        api_title = spec["title"]
+        api_version = spec["version"]
+        base_url = spec["base_url"]
+
+        # Чем меньше шард, тем меньше кейсов просим
+        min_cases = min(15, max(3, len(endpoints)))
+        max_cases = min(25, max(5, len(endpoints) * 3))
 
-        # 5. Формируем промпт для LLM
         system_prompt = f"""You are a QA automation expert specializing in REST API testing.
 
 **IMPORTANT: Write ALL content ONLY in ENGLISH.**
@@ -385,7 +446,7 @@ Minimum 15-20 test cases required."""
 Generate comprehensive manual test cases for REST API based on OpenAPI specification.
 
 Requirements:
-- Generate 15-25 test cases covering all major endpoints
+- Generate {min_cases}-{max_cases} test cases covering the listed endpoints
 - Include positive scenarios (happy path)
 - Include negative scenarios (invalid data, missing auth, not found, conflicts)
 - Test authentication and authorization
@@ -395,7 +456,7 @@ Requirements:
 - Each test case must have:
   * title: Clear descriptive name
   * description: What is being tested and why (max 50 words)
-  * steps: Detailed API call steps (max 3 steps, each under 20 words)
+  * steps: Detailed API call steps (max 3 steps, each under 20 words); the Act step must name the HTTP method and path, e.g. "Act: GET /pets/{{petId}}"
   * expected_result: Expected HTTP status code and response format (max 30 words)
   * priority: CRITICAL (auth, core CRUD), HIGH (important flows), NORMAL (standard), LOW (edge cases)
   * tags: ["api", endpoint category, scenario type]
@@ -425,105 +486,176 @@ API: {api_title} v{api_version}
 Base URL: {base_url}
 
 Endpoints:
-{json.dumps(endpoints_summary[:20], indent=2)}
+{json.dumps(endpoints, indent=2)}
 
 Additional Requirements:
 {requirements_text or 'Generate comprehensive test cases covering all endpoints with CRUD operations, authentication, positive/negative scenarios, and edge cases.'}
 
-Generate 15-25 API test cases.
+Generate {min_cases}-{max_cases} API test cases.
 """
 
-        print("[RequirementsAgent] Calling LLM for API spec generation...")
-
-        # 6. Вызываем LLM
-        with get_llm_client() as client:
-            resp = client.post(
-                "/chat/completions",
-                json={
-                    "model": self._model_name,
-                    "messages": [
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": user_prompt}
-                    ],
-                    "temperature": 0.7,
-                    "max_tokens": 50000,
-                }
-            )
-
-        if resp.status_code != 200:
-            print(f"[RequirementsAgent] LLM API error: {resp.status_code}")
-            raise Exception(f"LLM API error: {resp.status_code} - {resp.text}")
+        return {
+            "model": self._model_name,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            "temperature": 0.7,
+            "max_tokens": settings.spec_shard_max_tokens,
+        }
 
-        try:
-            data = resp.json()
-        except json.JSONDecodeError as e:
-            print(f"[RequirementsAgent] Failed to parse JSON response: {e}")
-            print(f"[RequirementsAgent] Response text (first 500 chars): {resp.text[:500]}")
-            print(f"[RequirementsAgent] Response status: {resp.status_code}")
-            raise Exception(f"LLM returned invalid JSON: {e}")
+    async def _generate_spec_shard(self, endpoints: list, spec: dict, requirements_text: Optional[str]) -> List[TestCase]:
+        """
+        Генерирует тест-кейсы для одного шарда эндпоинтов.
+        """
+        data = await chat_completion(self._spec_shard_payload(endpoints, spec, requirements_text))
 
         content = data["choices"][0]["message"]["content"]
 
-        print(f"[RequirementsAgent] LLM response length: {len(content)} characters")
+        logger.info("Shard response length: %s characters", len(content))
 
-        try:
-            backticks = "```"
-            if backticks + "json" in content:
-                content = content.split(backticks + "json")[1].split(backticks).strip()
-            elif backticks in content:
-                parts = content.split(backticks)
-                if len(parts) >= 2:
-                    content = parts[1].strip()
+        suite = await self._parse_suite_response(
+            content,
+            default_name=f"{spec['title']} API Test Suite",
+            default_description=f"Manual test cases for {spec['title']} v{spec['version']}",
+        )
+        return suite.cases
 
-            suite_data = json.loads(content.strip())
-            print(f"[RequirementsAgent] Parsed response type: {type(suite_data)}")
+    async def _parse_suite_response(self, content: str, default_name: str, default_description: str) -> TestSuite:
+        """
+        Разбирает ответ LLM с тест-кейсами (объект с полем "cases" или массив).
+        Если ответ обрезан по max_tokens, сохраняются все полностью сгенерированные кейсы.
+        """
+        try:
+            suite_data = await parse_llm_json_async(content, array_key="cases")
 
             # Если LLM вернул массив напрямую
             if isinstance(suite_data, list):
-                for case in suite_data:
-                    if isinstance(case, dict):
-                        priority = str(case.get("priority", "NORMAL")).upper().strip()
-                        if priority not in ["CRITICAL", "HIGH", "MEDIUM", "NORMAL", "LOW"]:
-                            priority = "NORMAL"
-                        case["priority"] = priority
-                cases = [TestCase(**case) for case in suite_data]
-                return TestSuite(
-                    name=f"{api_title} API Test Suite",
-                    description=f"Manual test cases for {api_title} v{api_version}",
-                    cases=cases
-                )
+                raw_cases = suite_data
+                name = default_name
+                description = default_description
             # Если вернул объект с полем cases
             elif isinstance(suite_data, dict):
-                for case in suite_data.get("cases", []):
-                    if isinstance(case, dict):
-                        priority = str(case.get("priority", "NORMAL")).upper().strip()
-                        if priority not in ["CRITICAL", "HIGH", "MEDIUM", "NORMAL", "LOW"]:
-                            priority = "NORMAL"
-                        case["priority"] = priority
-                cases = [TestCase(**case) for case in suite_data.get("cases", [])]
-                return TestSuite(
-                    name=suite_data.get("name", f"{api_title} API Test Suite"),
-                    description=suite_data.get("description", f"Manual test cases for {api_title} v{api_version}"),
-                    cases=cases
-                )
+                raw_cases = suite_data.get("cases", [])
+                name = suite_data.get("name", default_name)
+                description = suite_data.get("description", default_description)
             else:
                 raise ValueError(f"Unexpected response format: {type(suite_data)}")
 
         except (json.JSONDecodeError, KeyError, ValueError) as e:
-            print(f"[RequirementsAgent] Failed to parse LLM response: {e}")
-            print(f"[RequirementsAgent] Full content:\n{content[:500]}")
-            raise Exception(f"Failed to parse LLM response: {e}")
+            logger.warning("Failed to parse LLM response: %s", e)
+            logger.debug("Full content:\n%s", content[:500])
+            raise Exception(f"Failed to parse LLM response: {e}\nContent: {content[:1000]}")
+
+        cases = self._normalize_cases(raw_cases)
+        logger.info("Parsed %s cases from JSON", len(cases))
+
+        return TestSuite(
+            name=name,
+            description=description,
+            cases=cases
+        )
+
+    def _normalize_cases(self, raw_cases: list) -> List[TestCase]:
+        """
+        Приводит приоритеты к допустимым значениям и строит TestCase.
+        """
+        cases = []
+        for case in raw_cases:
+            if not isinstance(case, dict):
+                continue
+            priority = str(case.get("priority", "NORMAL")).upper().strip()
+            if priority not in ["CRITICAL", "HIGH", "MEDIUM", "NORMAL", "LOW"]:
+                priority = "NORMAL"
+            case["priority"] = priority
+            try:
+                cases.append(TestCase(**case))
+            except ValueError as e:
+                logger.warning("Skipping invalid test case: %s", e)
+        return cases
+
+    def _shard_endpoints(self, endpoints: list, token_budget: int) -> List[list]:
+        """
+        Группирует эндпоинты по тегу (или первому сегменту пути) и
+        упаковывает группы в шарды, не превышающие бюджет токенов.
+        """
+        groups: dict[str, list] = {}
+        for endpoint in endpoints:
+            groups.setdefault(self._endpoint_group_key(endpoint), []).append(endpoint)
+
+        shards: List[list] = []
+        current: list = []
+        current_tokens = 0
+
+        for group in groups.values():
+            group_tokens = sum(self._estimate_tokens(ep) for ep in group)
+            # Группа целиком не влезает в текущий шард — начинаем новый
+            if current and current_tokens + group_tokens > token_budget:
+                shards.append(current)
+                current, current_tokens = [], 0
+
+            for endpoint in group:
+                endpoint_tokens = self._estimate_tokens(endpoint)
+                # Слишком большая группа режется на несколько шардов
+                if current and current_tokens + endpoint_tokens > token_budget:
+                    shards.append(current)
+                    current, current_tokens = [], 0
+                current.append(endpoint)
+                current_tokens += endpoint_tokens
+
+        if current:
+            shards.append(current)
+
+        return shards
+
+    def _endpoint_group_key(self, endpoint: dict) -> str:
+        tags = endpoint.get("tags") or []
+        if tags:
+            return f"tag:{tags[0]}"
+        segments = [s for s in endpoint["path"].split("/") if s and not s.startswith("{")]
+        return f"path:{segments[0] if segments else '/'}"
+
+    def _estimate_tokens(self, endpoint: dict) -> int:
+        # Грубая оценка: ~4 символа JSON на токен
+        return len(json.dumps(endpoint)) // 4 + 1
+
+    def _merge_shard_cases(self, shard_cases: List[List[TestCase]]) -> List[TestCase]:
+        """
+        Объединяет кейсы шардов: убирает дубликаты по нормализованному
+        заголовку и шагам, проставляет сквозные ID.
+        """
+        merged = []
+        seen = set()
+        for cases in shard_cases:
+            for case in cases:
+                key = self._case_key(case)
+                if key in seen:
+                    continue
+                seen.add(key)
+                merged.append(case)
+
+        for i, case in enumerate(merged, 1):
+            case.id = f"TC-{i:03d}"
+
+        return merged
+
+    def _case_key(self, case: TestCase) -> tuple:
+        return (
+            re.sub(r"\W+", " ", case.title.lower()).strip(),
+            tuple(re.sub(r"\W+", " ", step.lower()).strip() for step in case.steps),
+        )
 
     def _extract_endpoints_summary(self, spec_dict: dict) -> list:
         """
         Извлекает краткую информацию об эндпоинтах из OpenAPI спецификации.
+        Списки урезаны под промпт — для сравнения версий есть spec_fingerprint.
         """
         endpoints = []
         paths = spec_dict.get("paths", {})
 
         for path, methods in paths.items():
             for method, details in methods.items():
-                if method.upper() in ["GET", "POST", "PUT", "PATCH", "DELETE"]:
+                if method.lower() in HTTP_METHODS:
                     endpoint_info = {
                         "method": method.upper(),
                         "path": path,
@@ -531,6 +663,10 @@ Generate 15-25 API test cases.
                         "description": (details.get("description", "") or "")[:150],  # Limit description
                     }
 
+                    # Теги нужны для группировки эндпоинтов в шарды
+                    if details.get("tags"):
+                        endpoint_info["tags"] = details["tags"][:3]
+
                     # Добавляем информацию о параметрах если есть
                     if "parameters" in details:
                         params = [f"{p.get('name')} ({p.get('in')})" for p in details["parameters"][:5]]
@@ -550,16 +686,128 @@ Generate 15-25 API test cases.
 
         return endpoints
 
-    async def generate_from_ui_model(self, ui_model: UiModel) -> TestSuite:
-        # Формируем текст требований из UI модели
+    def _ui_model_to_requirements(self, ui_model: UiModel) -> str:
+        """
+        Текст требований из UI модели. Элементы страниц сжимаются: повторы
+        группируются, шум отбрасывается, страница укладывается в бюджет токенов.
+        """
         requirements_text = "Generate test cases for the following UI:\n\n"
+        # Размер прежнего промпта (все элементы построчно) — для сравнения
+        raw_size = len(requirements_text)
+        raw_elements = patterns = 0
 
         for page in ui_model.pages:
-            requirements_text += f"Page: {page.name}\nURL: {page.url}\n\n"
-            requirements_text += "Elements:\n"
-            for element in page.elements:
-                requirements_text += f"- {element.type} '{element.name}' (locator: {element.locator}, role: {element.role})\n"
-            requirements_text += f"\nMain flows: {', '.join(page.main_flows)}\n\n"
+            compact = compact_page(
+                page,
+                token_budget=settings.ui_prompt_page_token_budget,
+                min_group_size=settings.ui_group_min_size,
+                examples=settings.ui_group_examples,
+            )
+            raw_elements += compact.elements
+            patterns += compact.patterns
 
+            page_header = f"Page: {page.name}\nURL: {page.url}\n\nElements:\n"
+            page_footer = f"\nMain flows: {', '.join(page.main_flows)}\n\n"
+            raw_size += len(page_header) + len(page_footer) + sum(
+                len(f"- {e.type} '{e.name}' (locator: {e.locator}, role: {e.role})\n") for e in page.elements
+            )
+
+            requirements_text += page_header
+            for line in compact.lines:
+                requirements_text += line + "\n"
+            if compact.omitted:
+                requirements_text += f"- ... {compact.omitted} more element patterns omitted\n"
+            requirements_text += page_footer
+
+        logger.info(
+            "UI prompt: %s elements → %s patterns, %s → %s chars (~%s → ~%s tokens)",
+            raw_elements, patterns, raw_size, len(requirements_text),
+            raw_size // 4 + 1, estimate_tokens(requirements_text),
+        )
+        return requirements_text
+
+    async def generate_from_ui_model(self, ui_model: UiModel) -> TestSuite:
         # Используем существующий метод генерации
-        return await self.generate_from_requirements_text(requirements_text)
+        return await self.generate_from_requirements_text(self._ui_model_to_requirements(ui_model))
+
+    async def stream_from_ui_model(self, ui_model: UiModel) -> AsyncIterator[TestCase]:
+        """
+        Стримит UI тест-кейсы по мере того, как LLM их генерирует.
+        """
+        payload = self._requirements_text_payload(self._ui_model_to_requirements(ui_model))
+        async for case in self._stream_cases(payload):
+            yield case
+
+    async def stream_api_test_cases(
+            self,
+            api_spec: str,
+            requirements_text: Optional[str] = None
+    ) -> AsyncIterator[TestCase]:
+        """
+        Стримит API тест-кейсы по текстовой спецификации.
+        """
+        payload = self._api_test_cases_payload(api_spec, requirements_text)
+        async for case in self._stream_cases(payload):
+            yield case
+
+    async def stream_from_api_spec(self, spec: dict, requirements_text: Optional[str] = None) -> AsyncIterator[TestCase]:
+        """
+        Стримит тест-кейсы по OpenAPI спецификации (spec — результат load_api_spec).
+        Шарды генерируются параллельно, кейсы отдаются в порядке готовности,
+        дубликаты между шардами отбрасываются.
+        """
+        shards = self._shard_endpoints(spec["endpoints"], settings.spec_shard_token_budget)
+        semaphore = asyncio.Semaphore(max(1, settings.spec_shard_concurrency))
+        queue: asyncio.Queue = asyncio.Queue()
+        shard_done = object()
+
+        async def run_shard(shard: list) -> None:
+            try:
+                async with semaphore:
+                    payload = self._spec_shard_payload(shard, spec, requirements_text)
+                    async for case in self._stream_cases(payload):
+                        await queue.put(case)
+            except Exception as e:
+                logger.warning("Shard stream failed: %s", e)
+                await queue.put(e)
+            finally:
+                await queue.put(shard_done)
+
+        tasks = [asyncio.create_task(run_shard(shard)) for shard in shards]
+        seen = set()
+        errors = []
+        finished = 0
+        emitted = 0
+
+        try:
+            while finished < len(tasks):
+                item = await queue.get()
+                if item is shard_done:
+                    finished += 1
+                    continue
+                if isinstance(item, Exception):
+                    errors.append(item)
+                    continue
+                key = self._case_key(item)
+                if key in seen:
+                    continue
+                seen.add(key)
+                emitted += 1
+                item.id = f"TC-{emitted:03d}"
+                yield item
+        finally:
+            # Клиент отключился или генерация завершена — останавливаем шарды
+            for task in tasks:
+                task.cancel()
+
+        if not emitted and errors:
+            raise Exception(f"Failed to generate test cases: {errors[0]}")
+
+    async def _stream_cases(self, payload: dict) -> AsyncIterator[TestCase]:
+        """
+        Вызывает LLM в режиме stream и отдаёт каждый TestCase,
+        как только его JSON-объект закрылся в потоке.
+        """
+        async for raw_case in iter_json_array(stream_chat_completion(payload), array_key="cases"):
+            for case in self._normalize_cases([raw_case]):
+                yield case
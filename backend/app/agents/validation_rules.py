@@ -0,0 +1,215 @@
+import re
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from app.models import TestCase, TestSuite, ValidationIssue
+
+# (severity, issue, recommendation)
+RuleResult = Tuple[str, str, str]
+CaseRule = Callable[[TestCase], Iterable[RuleResult]]
+
+ALLOWED_PRIORITIES = {"CRITICAL", "HIGH", "MEDIUM", "NORMAL", "LOW"}
+
+# Маркеры шагов AAA (в т.ч. русские и Given/When/Then)
+_AAA_MARKERS = {
+    "arrange": re.compile(r"^\s*(arrange|given|подготовка|предусловие)\b", re.IGNORECASE),
+    "act": re.compile(r"^\s*(act|when|действие)\b", re.IGNORECASE),
+    "assert": re.compile(r"^\s*(assert|then|проверка)\b", re.IGNORECASE),
+}
+
+_DECORATOR_RE = re.compile(r"^\s*@allure\.(\w+)(?:\(\s*['\"]([^'\"]*)['\"])?")
+_DEF_RE = re.compile(r"^\s*def\s+(test_\w*)")
+_CLASS_RE = re.compile(r"^\s*class\s+\w+")
+
+
+def _rule_required_fields(case: TestCase) -> Iterable[RuleResult]:
+    if not case.title.strip():
+        yield "critical", "Отсутствует title", "Добавьте короткое название, описывающее проверку"
+    if not case.description.strip():
+        yield "warning", "Отсутствует description", "Опишите, что и зачем проверяет кейс"
+    if not case.expected_result.strip():
+        yield "critical", "Отсутствует expected_result", "Укажите проверяемый ожидаемый результат"
+
+
+def _rule_steps(case: TestCase) -> Iterable[RuleResult]:
+    if not any(step.strip() for step in case.steps):
+        yield "critical", "Нет ни одного шага", "Добавьте шаги в формате Arrange / Act / Assert"
+    elif any(not step.strip() for step in case.steps):
+        yield "warning", "Есть пустые шаги", "Удалите пустые шаги или заполните их"
+
+
+def _rule_priority(case: TestCase) -> Iterable[RuleResult]:
+    if case.priority not in ALLOWED_PRIORITIES:
+        yield (
+            "critical",
+            f"Недопустимый priority: {case.priority}",
+            f"Используйте одно из значений: {', '.join(sorted(ALLOWED_PRIORITIES))}",
+        )
+
+
+def _rule_aaa(case: TestCase) -> Iterable[RuleResult]:
+    steps = [step for step in case.steps if step.strip()]
+    if not steps:
+        return
+
+    positions = {}
+    for i, step in enumerate(steps):
+        for phase, marker in _AAA_MARKERS.items():
+            if phase not in positions and marker.match(step):
+                positions[phase] = i
+
+    if not positions:
+        yield (
+            "warning",
+            "Структура AAA не прослеживается",
+            "Начинайте шаги с Arrange:, Act: и Assert:",
+        )
+        return
+
+    missing = [phase for phase in ("arrange", "act", "assert") if phase not in positions]
+    if missing:
+        yield (
+            "warning",
+            f"В шагах нет фаз AAA: {', '.join(missing)}",
+            "Добавьте недостающие шаги подготовки, действия или проверки",
+        )
+    elif not positions["arrange"] <= positions["act"] <= positions["assert"]:
+        yield "info", "Фазы AAA идут не по порядку", "Расположите шаги в порядке Arrange → Act → Assert"
+
+
+def _rule_tags(case: TestCase) -> Iterable[RuleResult]:
+    if not case.tags:
+        yield "warning", "Нет тегов", "Добавьте теги (тип теста, область, сценарий)"
+
+
+DEFAULT_CASE_RULES: List[CaseRule] = [
+    _rule_required_fields,
+    _rule_steps,
+    _rule_priority,
+    _rule_aaa,
+    _rule_tags,
+]
+
+
+def case_ref(case: TestCase, index: int) -> str:
+    """
+    Стабильный идентификатор кейса для issues: id, а без него — номер в сьюте.
+    """
+    return case.id or f"#{index + 1}"
+
+
+class ValidationRuleEngine:
+    """
+    Детерминированная проверка стандартов тест-кейсов без LLM: обязательные
+    поля, шаги, priority, структура AAA, теги; полнота Allure-декораторов в готовом коде.
+    Каждый кейс проверяется за один проход по списку правил.
+    """
+
+    # Декораторы, обязательные для каждого тест-метода (на методе)
+    METHOD_DECORATORS = {
+        "title": ("critical", "Нет @allure.title"),
+        "label:priority": ("warning", "Нет @allure.label('priority', ...)"),
+        "tag": ("warning", "Нет @allure.tag"),
+    }
+    # Декораторы, которые могут стоять на классе или на методе
+    SHARED_DECORATORS = {
+        "feature": ("critical", "Нет @allure.feature"),
+        "story": ("info", "Нет @allure.story"),
+        "label:owner": ("info", "Нет @allure.label('owner', ...)"),
+    }
+
+    def __init__(self, rules: Optional[List[CaseRule]] = None):
+        self._rules = rules if rules is not None else DEFAULT_CASE_RULES
+
+    def check_case(self, case: TestCase, ref: str) -> List[ValidationIssue]:
+        return [
+            ValidationIssue(
+                test_case_id=ref,
+                test_case_title=case.title,
+                severity=severity,
+                issue=issue,
+                recommendation=recommendation,
+            )
+            for rule in self._rules
+            for severity, issue, recommendation in rule(case)
+        ]
+
+    def check_suite(self, suite: TestSuite) -> List[ValidationIssue]:
+        issues = []
+        seen_ids = set()
+        for index, case in enumerate(suite.cases):
+            ref = case_ref(case, index)
+            issues.extend(self.check_case(case, ref))
+            if case.id:
+                if case.id in seen_ids:
+                    issues.append(ValidationIssue(
+                        test_case_id=ref,
+                        test_case_title=case.title,
+                        severity="warning",
+                        issue=f"Повторяющийся id: {case.id}",
+                        recommendation="Сделайте id кейсов уникальными",
+                    ))
+                seen_ids.add(case.id)
+        return issues
+
+    def check_allure_code(
+            self,
+            code: str,
+            refs: Optional[List[str]] = None,
+            titles: Optional[List[str]] = None,
+    ) -> List[ValidationIssue]:
+        """
+        Проверяет полноту Allure-декораторов в сгенерированном коде.
+        refs/titles — идентификаторы кейсов в порядке тест-методов; без них
+        используется имя метода. Недостающий общий декоратор (feature, story,
+        owner) сообщается один раз на весь модуль, а не на каждый метод.
+        """
+        class_decorators: set = set()
+        methods: List[Tuple[str, set]] = []
+        pending: set = set()
+
+        for line in code.splitlines():
+            m = _DECORATOR_RE.match(line)
+            if m:
+                name, first_arg = m.group(1), m.group(2)
+                pending.add(f"label:{first_arg}" if name == "label" and first_arg else name)
+                # @allure.severity — равноценная замена метке priority
+                if name == "severity":
+                    pending.add("label:priority")
+                continue
+            if _CLASS_RE.match(line):
+                class_decorators |= pending
+                pending = set()
+                continue
+            m = _DEF_RE.match(line)
+            if m:
+                methods.append((m.group(1), pending))
+                pending = set()
+            elif line.strip() and not line.strip().startswith("#"):
+                pending = set()
+
+        issues = []
+        for i, (method_name, decorators) in enumerate(methods):
+            ref = refs[i] if refs and i < len(refs) else method_name
+            title = titles[i] if titles and i < len(titles) else method_name
+            for decorator, (severity, issue) in self.METHOD_DECORATORS.items():
+                if decorator not in decorators:
+                    issues.append(ValidationIssue(
+                        test_case_id=ref,
+                        test_case_title=title,
+                        severity=severity,
+                        issue=issue,
+                        recommendation=f"Добавьте {issue.split(' ', 1)[1]} к методу {method_name}",
+                    ))
+
+        for decorator, (severity, issue) in self.SHARED_DECORATORS.items():
+            missing = [name for name, decorators in methods if decorator not in decorators]
+            if decorator not in class_decorators and missing:
+                issues.append(ValidationIssue(
+                    test_case_id="suite",
+                    test_case_title=f"{len(missing)} из {len(methods)} тест-методов",
+                    severity=severity,
+                    issue=issue,
+                    recommendation=f"Добавьте {issue.split(' ', 1)[1]} на класс или на каждый тест-метод",
+                ))
+
+        return issues
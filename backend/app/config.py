@@ -5,11 +5,83 @@ class Settings(BaseSettings):
     cloudru_api_url: str = "https://llm.api.cloud.ru"
     cloudru_api_token: str
 
+    llm_timeout: float = 120.0
+    llm_stream_timeout: float = 300.0
+    llm_max_connections: int = 100
+    llm_max_keepalive_connections: int = 20
+    llm_keepalive_expiry: float = 30.0
+    llm_http2: bool = False
+
+    llm_concurrency_initial: int = 8
+    llm_concurrency_min: int = 1
+    llm_concurrency_max: int = 64
+    llm_concurrency_decrease_factor: float = 0.5
+    llm_retry_max_attempts: int = 5
+    llm_retry_base_delay: float = 1.0
+    llm_retry_max_delay: float = 30.0
+    llm_request_deadline: float = 300.0
+
+    llm_hedge_enabled: bool = False
+    llm_hedge_max_tokens: int = 2500  # хеджируются вызовы с max_tokens не больше
+    llm_hedge_percentile: float = 95.0
+    llm_hedge_initial_delay: float = 10.0  # пока мало замеров
+    llm_hedge_min_delay: float = 0.5
+    llm_hedge_budget: float = 0.05  # доля хеджированных вызовов
+    llm_hedge_window: int = 200
+    llm_hedge_min_samples: int = 20
+
+    http_timeout: float = 30.0
+    http_max_connections: int = 50
+    http_max_keepalive_connections: int = 10
+
+    llm_cache_enabled: bool = True
+    llm_cache_max_entries: int = 256
+    llm_cache_ttl_seconds: int = 7 * 24 * 3600
+    llm_cache_path: str = ".cache/llm_cache.sqlite3"
+
+    spec_shard_token_budget: int = 3000
+    spec_shard_concurrency: int = 4
+    spec_shard_max_tokens: int = 16000
+
+    spec_store_max_bytes: int = 64 * 1024 * 1024
+    spec_store_revalidate_seconds: int = 300
+
+    dedup_num_bins: int = 64
+    dedup_bands: int = 16
+    dedup_threshold: float = 0.8
+    dedup_borderline_threshold: float = 0.5
+    dedup_llm_max_pairs: int = 20
+
+    coverage_prompt_max_cases: int = 50
+    coverage_prompt_max_titles: int = 200
+
+    validation_batch_size: int = 50
+    validation_concurrency: int = 4
+    validation_batch_retries: int = 1
+
+    ui_prompt_page_token_budget: int = 1500
+    ui_group_min_size: int = 5
+    ui_group_examples: int = 5
+
+    cpu_executor_workers: int = 2  # 0 — без пула, всё в event loop
+    cpu_executor_min_bytes: int = 64 * 1024
+    cpu_executor_start_method: str = "spawn"
+
+    crawl_max_depth: int = 2
+    crawl_max_pages: int = 50
+    crawl_concurrency: int = 16
+    crawl_user_agent: str = "TestOpsCopilotBot"
+
+    jobs_db_path: str = ".cache/jobs.sqlite3"
+    jobs_workers: int = 2
+    jobs_max_queue: int = 100
+
     gitlab_url: str | None = None
     gitlab_token: str | None = None
 
     app_env: str = "dev"
     log_level: str = "INFO"
+    trace_path: str = ""  # JSONL со span'ами этапов (Chrome Trace Event Format)
 
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8")
 
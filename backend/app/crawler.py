@@ -0,0 +1,227 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+from urllib.robotparser import RobotFileParser
+
+import httpx
+
+from app.http_client import get_http_client
+from app.jobs import report_progress
+from app.metrics import stage_timer
+from app.models import UiPage
+
+logger = logging.getLogger(__name__)
+
+# (html, url) → UiPage и href ссылок страницы
+PageParser = Callable[[str, str], Awaitable[Tuple[UiPage, List[str]]]]
+
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+_HTML_TYPES = ("text/html", "application/xhtml+xml")
+
+
+def normalize_url(url: str, base: Optional[str] = None) -> Optional[str]:
+    """
+    Каноническая форма URL для дедупликации: абсолютный, без фрагмента,
+    схема и хост в нижнем регистре, без порта по умолчанию, пустой путь → "/",
+    параметры запроса отсортированы. Не-HTTP ссылки (mailto:, javascript:) → None.
+    """
+    url = url.strip()
+    if base is not None:
+        url = urljoin(base, url)
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    if scheme not in _DEFAULT_PORTS or not parts.hostname:
+        return None
+
+    netloc = parts.hostname.lower()
+    try:
+        port = parts.port
+    except ValueError:
+        return None
+    if port and port != _DEFAULT_PORTS[scheme]:
+        netloc = f"{netloc}:{port}"
+
+    path = parts.path or "/"
+    if "/." in path and not path.startswith("//"):
+        # urljoin убирает сегменты "." и ".." из пути
+        path = urlsplit(urljoin("http://host/", path)).path
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, netloc, path, query, ""))
+
+
+def _origin(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+class CrawlResult:
+    def __init__(self):
+        self.pages: List[UiPage] = []
+        self.errors: Dict[str, str] = {}
+        self.blocked: List[str] = []  # запрещены robots.txt
+        self.skipped: List[str] = []  # не HTML или редирект на другой origin
+        self.elapsed: float = 0.0
+
+    def stats(self) -> dict:
+        return {
+            "pages": len(self.pages),
+            "errors": self.errors,
+            "blocked_by_robots": self.blocked,
+            "skipped": self.skipped,
+            "elapsed_seconds": round(self.elapsed, 3),
+        }
+
+
+class SiteCrawler:
+    """
+    Обход сайта от стартового URL по ссылкам того же origin.
+
+    Пул из concurrency воркеров разбирает общую очередь: страница обрабатывается,
+    как только скачана, без ожидания остальных страниц своего уровня. Лимит
+    страниц резервируется при постановке в очередь, лишних запросов нет.
+    Все запросы идут через общий пул соединений.
+    """
+
+    def __init__(
+            self,
+            parse_page: PageParser,
+            max_depth: int,
+            max_pages: int,
+            concurrency: int,
+            user_agent: str,
+    ):
+        self._parse_page = parse_page
+        self._max_depth = max_depth
+        self._max_pages = max_pages
+        self._concurrency = max(1, concurrency)
+        self._user_agent = user_agent
+
+    async def crawl(self, start_url: str) -> CrawlResult:
+        start = normalize_url(start_url)
+        if start is None:
+            raise ValueError(f"Unsupported URL for crawling: {start_url}")
+
+        started_at = time.perf_counter()
+        client = get_http_client()
+        headers = {"User-Agent": self._user_agent}
+        origin = _origin(start)
+        robots = await self._load_robots(client, origin, headers)
+
+        result = CrawlResult()
+        # url → (глубина, порядок обнаружения): по ним страницы сортируются в ответе
+        seen: Dict[str, Tuple[int, int]] = {start: (0, 0)}
+        pages: Dict[str, UiPage] = {}
+        queue: asyncio.Queue = asyncio.Queue()
+        queue.put_nowait((start, 0))
+
+        async def worker():
+            while True:
+                url, depth = await queue.get()
+                try:
+                    try:
+                        links = await self._visit(client, headers, robots, origin, url, pages, result)
+                    except Exception as e:
+                        # Одна битая страница (InvalidURL, сбой robots.txt) не должна останавливать воркер:
+                        # иначе queue.join() не дождётся оставшихся URL
+                        logger.warning("Failed to crawl %s: %s", url, e)
+                        result.errors[url] = f"{type(e).__name__}: {e}"
+                        links = []
+                    if depth < self._max_depth:
+                        for link in links:
+                            if len(seen) >= self._max_pages:
+                                break
+                            if link not in seen and _origin(link) == origin:
+                                seen[link] = (depth + 1, len(seen))
+                                queue.put_nowait((link, depth + 1))
+                    done = len(pages) + len(result.errors) + len(result.blocked) + len(result.skipped)
+                    report_progress(min(done / len(seen), 1.0), f"Crawled {done}/{len(seen)} pages")
+                finally:
+                    queue.task_done()
+
+        workers = [asyncio.create_task(worker()) for _ in range(self._concurrency)]
+        try:
+            await queue.join()
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+        result.pages = [pages[url] for url in sorted(pages, key=seen.__getitem__)]
+        result.elapsed = time.perf_counter() - started_at
+        logger.info(
+            "%s: %s pages, %s errors, %s blocked in %.2fs",
+            origin, len(result.pages), len(result.errors), len(result.blocked), result.elapsed,
+        )
+        return result
+
+    async def _visit(
+            self,
+            client: httpx.AsyncClient,
+            headers: dict,
+            robots: Optional[RobotFileParser],
+            origin: str,
+            url: str,
+            pages: Dict[str, UiPage],
+            result: CrawlResult,
+    ) -> List[str]:
+        if robots is not None and not robots.can_fetch(self._user_agent, url):
+            result.blocked.append(url)
+            return []
+
+        try:
+            with stage_timer("html_fetch"):
+                response = await client.get(url, headers=headers)
+            response.raise_for_status()
+        except httpx.HTTPStatusError as e:
+            result.errors[url] = f"HTTP {e.response.status_code}"
+            return []
+        except httpx.HTTPError as e:
+            result.errors[url] = f"{type(e).__name__}: {e}"
+            return []
+
+        final_url = normalize_url(str(response.url)) or url
+        content_type = response.headers.get("content-type", "text/html").split(";")[0].strip().lower()
+        if _origin(final_url) != origin or content_type not in _HTML_TYPES:
+            result.skipped.append(url)
+            return []
+
+        try:
+            page, hrefs = await self._parse_page(response.text, url)
+        except Exception as e:
+            result.errors[url] = f"Failed to parse HTML: {e}"
+            return []
+        pages[url] = page
+
+        links = []
+        for href in hrefs:
+            link = normalize_url(href, base=final_url)
+            if link is not None:
+                links.append(link)
+        return links
+
+    async def _load_robots(
+            self,
+            client: httpx.AsyncClient,
+            origin: str,
+            headers: dict,
+    ) -> Optional[RobotFileParser]:
+        """
+        robots.txt origin: 401/403 — обход запрещён целиком, нет файла
+        или ошибка сети — ограничений нет (как в urllib.robotparser).
+        """
+        robots = RobotFileParser(f"{origin}/robots.txt")
+        try:
+            response = await client.get(f"{origin}/robots.txt", headers=headers)
+        except httpx.HTTPError as e:
+            logger.warning("robots.txt unavailable for %s: %s", origin, e)
+            return None
+
+        if response.status_code in (401, 403):
+            robots.disallow_all = True
+        elif response.status_code >= 400:
+            return None
+        else:
+            robots.parse(response.text.splitlines())
+        return robots
@@ -0,0 +1,127 @@
+import string
+from collections import defaultdict
+from typing import Dict, List, Sequence, Set
+
+from app.models import TestCase
+
+_MAX_HASH = (1 << 64) - 1
+
+# Пунктуация заменяется пробелами, дальше str.split() — заметно быстрее regex \w+
+_PUNCTUATION = str.maketrans({c: " " for c in string.punctuation})
+
+# Корзины LSH крупнее этого размера связываются цепочкой, а не всеми парами:
+# иначе сотня одинаковых кейсов даёт квадратичное число кандидатов
+_MAX_BUCKET_PAIRS = 64
+
+
+def case_shingles(case: TestCase) -> Set[int]:
+    """
+    Хэши словесных триграмм по заголовку, описанию и шагам кейса.
+    Встроенный hash() стабилен в пределах процесса — сигнатуры сравниваются
+    только внутри одного вызова, поэтому криптостойкий хэш не нужен.
+    """
+    text = "\n".join((case.title, case.description, *case.steps))
+    tokens = text.lower().translate(_PUNCTUATION).split()
+    if len(tokens) < 3:
+        return {hash(tuple(tokens))} if tokens else set()
+    return set(map(hash, zip(tokens, tokens[1:], tokens[2:])))
+
+
+def minhash_signature(shingles: Set[int], num_bins: int) -> List[int]:
+    """
+    One-permutation MinHash: одна хэш-функция, младшие биты хэша выбирают
+    одну из num_bins корзин, в каждой берётся минимум. Пустые корзины
+    заполняются из следующей непустой (densification), чтобы сигнатуры
+    оставались сравнимыми. num_bins — степень двойки.
+    """
+    mask = num_bins - 1
+    bins = [_MAX_HASH] * num_bins
+    for h in shingles:
+        h &= _MAX_HASH
+        i = h & mask
+        if h < bins[i]:
+            bins[i] = h
+
+    if not shingles:
+        return bins
+
+    for i in range(num_bins):
+        if bins[i] == _MAX_HASH:
+            j = (i + 1) & mask
+            offset = 1
+            while bins[j] == _MAX_HASH:
+                j = (j + 1) & mask
+                offset += 1
+            # Смещение отличает заимствованное значение от родного
+            bins[i] = bins[j] + offset * 0x9E3779B97F4A7C15 & _MAX_HASH
+    return bins
+
+
+class DuplicateCandidate:
+    def __init__(self, left: int, right: int, similarity: float):
+        self.left = left
+        self.right = right
+        self.similarity = similarity
+
+
+class MinHashDeduplicator:
+    """
+    Поиск почти-дубликатов тест-кейсов: шинглы → MinHash сигнатуры → LSH
+    по полосам (bands) → проверка кандидатов точным коэффициентом Жаккара.
+    """
+
+    def __init__(self, num_bins: int = 64, bands: int = 16):
+        if num_bins & (num_bins - 1):
+            raise ValueError(f"num_bins must be a power of two, got {num_bins}")
+        if num_bins % bands != 0:
+            raise ValueError(f"num_bins ({num_bins}) must be divisible by bands ({bands})")
+        self._num_bins = num_bins
+        self._bands = bands
+        self._rows = num_bins // bands
+
+    def find_duplicates(self, cases: Sequence[TestCase], threshold: float) -> List[DuplicateCandidate]:
+        """
+        Возвращает пары кейсов (индексы в cases) с похожестью >= threshold,
+        отсортированные по убыванию похожести.
+        """
+        shingle_sets = [case_shingles(case) for case in cases]
+        signatures = [minhash_signature(s, self._num_bins) for s in shingle_sets]
+
+        # Сигнатуры транспонируются, ключ корзины полосы — хэш кортежа её столбцов
+        # (коллизии безопасны: кандидаты проверяются точным Жаккаром).
+        # Полосы без совпадающих ключей пропускаются без обхода в Python
+        active = [i for i, shingles in enumerate(shingle_sets) if shingles]
+        columns = list(zip(*(signatures[i] for i in active)))
+        groups: List[List[int]] = []
+        for band in range(self._bands) if active else ():
+            start = band * self._rows
+            keys = list(map(hash, zip(*columns[start:start + self._rows])))
+            last = dict(zip(keys, active))
+            if len(last) == len(keys):
+                continue
+            first = dict(zip(reversed(keys), reversed(active)))
+            shared = {key for key, index in last.items() if first[key] != index}
+            buckets: Dict[int, List[int]] = defaultdict(list)
+            for index, key in zip(active, keys):
+                if key in shared:
+                    buckets[key].append(index)
+            groups.extend(buckets.values())
+
+        candidates: Set[tuple[int, int]] = set()
+        for members in groups:
+            if len(members) > _MAX_BUCKET_PAIRS:
+                candidates.update(zip(members, members[1:]))
+                continue
+            for i, left in enumerate(members):
+                for right in members[i + 1:]:
+                    candidates.add((left, right))
+
+        results = []
+        for left, right in candidates:
+            a, b = shingle_sets[left], shingle_sets[right]
+            similarity = len(a & b) / len(a | b)
+            if similarity >= threshold:
+                results.append(DuplicateCandidate(left, right, round(similarity, 4)))
+
+        results.sort(key=lambda c: (-c.similarity, c.left, c.right))
+        return results
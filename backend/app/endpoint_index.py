@@ -0,0 +1,142 @@
+import re
+from typing import Dict, Iterable, List, Set
+
+from app.models import CoverageMatrix, EndpointCoverage, TestCase
+
+HTTP_METHODS = ("GET", "POST", "PUT", "PATCH", "DELETE")
+
+_STATUS_RE = re.compile(r"(?<![\w.])([1-5])(\d\d|xx)(?![\w.])", re.IGNORECASE)
+
+
+def endpoint_key(endpoint: dict) -> str:
+    return f"{endpoint['method'].upper()} {endpoint['path']}"
+
+
+def _path_pattern(path: str) -> str:
+    # {vm_id} в шаблоне совпадает и с реальным значением, и с самим плейсхолдером
+    parts = re.split(r"(\{[^}]*\})", path)
+    return "".join("[^/\\s?#\"'`]+" if p.startswith("{") else re.escape(p) for p in parts if p)
+
+
+def _specificity(path: str) -> tuple:
+    segments = [s for s in path.split("/") if s]
+    literal = sum(1 for s in segments if not s.startswith("{"))
+    return literal, len(segments)
+
+
+class EndpointIndex:
+    """
+    Индекс путей спецификации: все шаблоны компилируются в одно регулярное
+    выражение, и текст кейса сканируется за один проход. Находит упоминания
+    "METHOD /path" (метод необязателен) и коды ответов.
+    """
+
+    def __init__(self, endpoints: Iterable[dict]):
+        self._methods_by_path: Dict[str, Set[str]] = {}
+        self.response_codes: Dict[str, List[str]] = {}
+        for endpoint in endpoints:
+            method = endpoint["method"].upper()
+            path = endpoint["path"]
+            self._methods_by_path.setdefault(path, set()).add(method)
+            self.response_codes[endpoint_key(endpoint)] = [
+                str(code) for code in endpoint.get("response_codes", [])
+            ]
+
+        # Альтернативы regex проверяются по порядку: литеральные сегменты
+        # раньше плейсхолдеров (/vms/search раньше /vms/{vm_id})
+        self._paths = sorted(self._methods_by_path, key=_specificity, reverse=True)
+        alternatives = "|".join(
+            f"(?P<p{i}>{_path_pattern(path)})" for i, path in enumerate(self._paths)
+        )
+        self._pattern = re.compile(
+            r"(?:\b(?P<method>" + "|".join(HTTP_METHODS) + r")\s+)?"
+            r"(?:https?://[^\s/]+|(?<![\w/{}-]))"
+            r"(?:" + alternatives + r")(?![\w/{}-])",
+            re.IGNORECASE,
+        ) if self._paths else None
+
+    @property
+    def keys(self) -> List[str]:
+        return list(self.response_codes)
+
+    def match_text(self, text: str) -> Set[str]:
+        """
+        Ключи "METHOD /path" эндпоинтов, упомянутых в тексте. Путь без метода
+        относится ко всем методам этого пути; метод, которого у пути нет в
+        спецификации (DELETE /vms при описанных GET и POST), не совпадает ни с чем.
+        """
+        if self._pattern is None:
+            return set()
+
+        keys = set()
+        for m in self._pattern.finditer(text):
+            path = self._paths[int(m.lastgroup[1:])]
+            methods = self._methods_by_path[path]
+            method = (m.group("method") or "").upper()
+            if not method:
+                keys.update(f"{mtd} {path}" for mtd in methods)
+            elif method in methods:
+                keys.add(f"{method} {path}")
+        return keys
+
+    def match_case(self, case: TestCase) -> Set[str]:
+        return self.match_text("\n".join([case.title, case.description, *case.steps, case.expected_result]))
+
+    def match_status_codes(self, case: TestCase) -> Set[str]:
+        """
+        Коды ответов (200, 404, 4xx), упомянутые в шагах и ожидаемом результате.
+        """
+        text = "\n".join([case.title, *case.steps, case.expected_result])
+        return {f"{m.group(1)}{m.group(2).upper()}" for m in _STATUS_RE.finditer(text)}
+
+
+def _code_covered(declared: str, mentioned: Set[str], explicit: Set[str]) -> bool:
+    if declared in mentioned:
+        return True
+    if declared.upper().endswith("XX"):
+        return any(code[0] == declared[0] for code in mentioned)
+    if declared == "default":
+        # default — любой упомянутый код, не описанный в спецификации явно
+        return bool(mentioned - explicit)
+    return False
+
+
+def build_coverage_matrix(index: EndpointIndex, cases: List[TestCase]) -> CoverageMatrix:
+    """
+    Матрица эндпоинт × кейс: какие эндпоинты и коды ответов спецификации
+    упоминаются в кейсах. Детерминирована и не требует LLM.
+    """
+    coverage = {
+        key: EndpointCoverage(
+            method=key.split(" ", 1)[0],
+            path=key.split(" ", 1)[1],
+            responses={code: [] for code in codes},
+        )
+        for key, codes in index.response_codes.items()
+    }
+    unmatched = []
+
+    for case in cases:
+        ref = case.id or case.title
+        keys = index.match_case(case)
+        if not keys:
+            unmatched.append(ref)
+            continue
+        mentioned = index.match_status_codes(case)
+        for key in sorted(keys):
+            entry = coverage[key]
+            entry.cases.append(ref)
+            explicit = set(entry.responses)
+            for code, refs in entry.responses.items():
+                if _code_covered(code, mentioned, explicit):
+                    refs.append(ref)
+
+    endpoints = list(coverage.values())
+    return CoverageMatrix(
+        endpoints=endpoints,
+        covered_endpoints=sum(1 for e in endpoints if e.cases),
+        total_endpoints=len(endpoints),
+        covered_responses=sum(1 for e in endpoints for refs in e.responses.values() if refs),
+        total_responses=sum(len(e.responses) for e in endpoints),
+        unmatched_cases=unmatched,
+    )
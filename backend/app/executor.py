@@ -0,0 +1,91 @@
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class CpuExecutor:
+    """
+    Пул процессов для CPU-bound шагов: разбор HTML, YAML/JSON спецификаций
+    и больших ответов LLM. Пока такой шаг идёт в event loop, стоят все
+    остальные запросы (в т.ч. стриминг чата), поэтому большие входы уходят
+    в отдельный процесс. Маленькие выполняются на месте: передача между
+    процессами дороже самого разбора.
+
+    Функция и аргументы передаются через pickle: функция должна быть
+    объявлена на уровне модуля.
+    """
+
+    def __init__(self, workers: int, min_bytes: int, start_method: str):
+        self._workers = workers
+        self._min_bytes = min_bytes
+        self._start_method = start_method
+        self._pool: ProcessPoolExecutor | None = None
+
+        self.offloaded = 0
+        self.inline = 0
+        self.restarts = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._workers > 0
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn по умолчанию: fork процесса с потоками (БД задач, кэш LLM) небезопасен
+            self._pool = ProcessPoolExecutor(
+                max_workers=self._workers,
+                mp_context=multiprocessing.get_context(self._start_method),
+            )
+            logger.info("Started process pool: %s workers (%s)", self._workers, self._start_method)
+        return self._pool
+
+    async def run(self, func: Callable[..., Any], *args: Any, size: int) -> Any:
+        """
+        Выполняет func(*args) в пуле процессов, если size (байты входа) не меньше
+        CPU_EXECUTOR_MIN_BYTES, иначе — прямо здесь. Исключения func пробрасываются.
+        """
+        if not self.enabled or size < self._min_bytes:
+            self.inline += 1
+            return func(*args)
+
+        loop = asyncio.get_running_loop()
+        try:
+            result = await loop.run_in_executor(self._get_pool(), func, *args)
+        except BrokenProcessPool:
+            # Воркер упал (OOM, kill) — пересоздаём пул, текущий вызов выполняем на месте
+            logger.warning("Process pool is broken, restarting")
+            self._pool = None
+            self.restarts += 1
+            self.inline += 1
+            return func(*args)
+
+        self.offloaded += 1
+        return result
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def stats(self) -> dict:
+        return {
+            "workers": self._workers,
+            "min_bytes": self._min_bytes,
+            "offloaded": self.offloaded,
+            "inline": self.inline,
+            "restarts": self.restarts,
+        }
+
+
+cpu_executor = CpuExecutor(
+    workers=settings.cpu_executor_workers,
+    min_bytes=settings.cpu_executor_min_bytes,
+    start_method=settings.cpu_executor_start_method,
+)
@@ -0,0 +1,34 @@
+import httpx
+
+from app.config import settings
+
+_client: httpx.AsyncClient | None = None
+
+
+def _create_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        timeout=settings.http_timeout,
+        follow_redirects=True,
+        limits=httpx.Limits(
+            max_connections=settings.http_max_connections,
+            max_keepalive_connections=settings.http_max_keepalive_connections,
+        ),
+    )
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Общий httpx.AsyncClient для внешних запросов (Swagger, HTML страницы).
+    Клиент живёт всё время работы приложения — не закрывайте его после запроса.
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _create_client()
+    return _client
+
+
+async def close_http_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
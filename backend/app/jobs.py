@@ -0,0 +1,319 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Optional
+
+from app.config import settings
+from app.log import span, trace_id_var
+from app.models import Job
+
+logger = logging.getLogger(__name__)
+
+JobHandler = Callable[[dict], Awaitable[dict]]
+
+# Задача, в контексте которой сейчас выполняется код (для report_progress)
+_current_job: ContextVar[Optional[Job]] = ContextVar("current_job", default=None)
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class JobManager:
+    """
+    Фоновые задачи генерации: ограниченная очередь, пул воркеров и
+    хранение состояния в SQLite, чтобы задачи переживали рестарт.
+    """
+
+    def __init__(self, db_path: str, workers: int, max_queue: int):
+        self._db_path = db_path
+        self._workers_count = max(1, workers)
+        self._max_queue = max_queue
+        self._handlers: dict[str, JobHandler] = {}
+
+        # Незавершённые задачи держим в памяти, завершённые читаем из БД
+        self._active: dict[str, Job] = {}
+        self._payloads: dict[str, dict] = {}
+        self._tasks: dict[str, asyncio.Task] = {}
+        self._queue: asyncio.Queue | None = None
+        # Места в очереди, занятые задачами, которые ещё сохраняются в БД
+        self._reserved = 0
+        # Отменённые задачи, чьи id ещё лежат в очереди: места они не занимают
+        self._cancelled_queued: set[str] = set()
+        self._workers: list[asyncio.Task] = []
+        self._stopping = False
+
+        # Один поток на все операции с БД — записи применяются строго по порядку
+        self._db: sqlite3.Connection | None = None
+        self._db_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="jobs-db")
+        self._pending_saves: set[asyncio.Task] = set()
+
+    def register(self, kind: str, handler: JobHandler) -> None:
+        self._handlers[kind] = handler
+
+    async def start(self) -> None:
+        self._stopping = False
+        self._queue = asyncio.Queue()
+        self._cancelled_queued = set()
+        await self._run_db(self._connect)
+
+        # Восстанавливаем задачи, не завершившиеся до рестарта
+        for job, payload in await self._run_db(self._load_unfinished):
+            if job.status == "running":
+                job.message = "Re-queued after restart"
+            job.status = "queued"
+            job.progress = 0.0
+            job.updated_at = time.time()
+            self._active[job.id] = job
+            self._payloads[job.id] = payload
+            self._queue.put_nowait(job.id)
+            self._schedule_save(job)
+            logger.info("Re-queued job %s (%s)", job.id, job.kind)
+
+        self._workers = [
+            asyncio.create_task(self._worker(i)) for i in range(self._workers_count)
+        ]
+        logger.info("Started %s workers (max queue %s)", self._workers_count, self._max_queue)
+
+    async def stop(self) -> None:
+        self._stopping = True
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        if self._pending_saves:
+            await asyncio.gather(*self._pending_saves, return_exceptions=True)
+        await self._run_db(self._close)
+
+    def queue_depth(self) -> int:
+        if self._queue is None:
+            return 0
+        return self._queue.qsize() - len(self._cancelled_queued) + self._reserved
+
+    async def submit(self, kind: str, payload: dict) -> Job:
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        if self._queue is None:
+            raise RuntimeError("Job manager is not started")
+        # Место резервируется до записи в БД: иначе параллельные submit проходят проверку вместе
+        if self.queue_depth() >= self._max_queue:
+            raise QueueFullError(f"Job queue is full ({self._max_queue} jobs), try again later")
+        self._reserved += 1
+
+        now = time.time()
+        job = Job(id=uuid.uuid4().hex, kind=kind, created_at=now, updated_at=now)
+        try:
+            self._active[job.id] = job
+            self._payloads[job.id] = payload
+            await self._run_db(self._save_sync, job.model_copy(), payload)
+        except BaseException:
+            self._active.pop(job.id, None)
+            self._payloads.pop(job.id, None)
+            raise
+        else:
+            self._queue.put_nowait(job.id)
+        finally:
+            self._reserved -= 1
+
+        logger.info("Submitted job %s (%s), queue depth %s", job.id, kind, self.queue_depth())
+        return job
+
+    async def get(self, job_id: str) -> Job | None:
+        job = self._active.get(job_id)
+        if job is not None:
+            return job
+        return await self._run_db(self._load, job_id)
+
+    async def cancel(self, job_id: str) -> Job | None:
+        job = self._active.get(job_id)
+        if job is None:
+            # Уже завершена (или не существует) — отдаём как есть
+            return await self.get(job_id)
+
+        if job.status == "queued":
+            self._finish(job, "cancelled", message="Cancelled before start")
+            self._cancelled_queued.add(job_id)
+        elif job.status == "running":
+            task = self._tasks.get(job_id)
+            if task is not None:
+                task.cancel()
+        return job
+
+    def update_progress(self, job: Job, progress: float, message: str | None = None) -> None:
+        job.progress = max(0.0, min(1.0, progress))
+        if message is not None:
+            job.message = message
+        job.updated_at = time.time()
+        self._schedule_save(job)
+
+    async def _worker(self, index: int) -> None:
+        while True:
+            job_id = await self._queue.get()
+            self._cancelled_queued.discard(job_id)
+            job = self._active.get(job_id)
+            # Задачу могли отменить, пока она стояла в очереди
+            if job is None or job.status != "queued":
+                continue
+
+            job.status = "running"
+            job.updated_at = time.time()
+            self._schedule_save(job)
+            logger.info("Worker %s started job %s (%s)", index, job.id, job.kind)
+
+            task = asyncio.create_task(self._run(job, self._payloads[job_id]))
+            self._tasks[job_id] = task
+            try:
+                result = await task
+            except asyncio.CancelledError:
+                if self._stopping:
+                    # Остановка сервиса: задача останется running и будет перезапущена
+                    raise
+                self._finish(job, "cancelled", message="Cancelled by user")
+            except Exception as e:
+                logger.exception("Job %s failed: %s", job.id, e)
+                self._finish(job, "failed", error=str(e))
+            else:
+                self._finish(job, "succeeded", result=result)
+            finally:
+                self._tasks.pop(job_id, None)
+
+    async def _run(self, job: Job, payload: dict) -> dict:
+        _current_job.set(job)
+        # Логи и span'ы фоновой задачи помечаются её id
+        trace_id_var.set(job.id)
+        with span(f"job:{job.kind}", "job"):
+            return await self._handlers[job.kind](payload)
+
+    def _finish(
+            self,
+            job: Job,
+            status: str,
+            *,
+            result: dict | None = None,
+            error: str | None = None,
+            message: str | None = None,
+    ) -> None:
+        job.status = status
+        job.result = result
+        job.error = error
+        if message is not None:
+            job.message = message
+        if status == "succeeded":
+            job.progress = 1.0
+        job.updated_at = time.time()
+        self._payloads.pop(job.id, None)
+        logger.info("Job %s finished: %s", job.id, status)
+        # Из памяти убираем только после записи в БД, чтобы GET не увидел старое состояние
+        self._schedule_save(job, forget=True)
+
+    def _schedule_save(self, job: Job, forget: bool = False) -> None:
+        snapshot = job.model_copy()
+
+        async def save() -> None:
+            try:
+                await self._run_db(self._save_sync, snapshot, None)
+            except Exception as e:
+                logger.warning("Failed to persist job %s: %s", snapshot.id, e)
+            if forget and self._active.get(snapshot.id) is job:
+                del self._active[snapshot.id]
+
+        task = asyncio.create_task(save())
+        self._pending_saves.add(task)
+        task.add_done_callback(self._pending_saves.discard)
+
+    async def _run_db(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._db_executor, func, *args)
+
+    def _connect(self) -> None:
+        if self._db is not None:
+            return
+        directory = os.path.dirname(self._db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(self._db_path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, kind TEXT NOT NULL, status TEXT NOT NULL, "
+            "progress REAL NOT NULL, message TEXT, payload TEXT, result TEXT, error TEXT, "
+            "created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._db.commit()
+
+    def _close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def _save_sync(self, job: Job, payload: dict | None) -> None:
+        self._db.execute(
+            "INSERT INTO jobs (id, kind, status, progress, message, payload, result, error, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET status = excluded.status, progress = excluded.progress, "
+            "message = excluded.message, result = excluded.result, error = excluded.error, "
+            "updated_at = excluded.updated_at",
+            (
+                job.id,
+                job.kind,
+                job.status,
+                job.progress,
+                job.message,
+                json.dumps(payload, ensure_ascii=False) if payload is not None else None,
+                json.dumps(job.result, ensure_ascii=False) if job.result is not None else None,
+                job.error,
+                job.created_at,
+                job.updated_at,
+            ),
+        )
+        self._db.commit()
+
+    def _row_to_job(self, row: tuple) -> Job:
+        job_id, kind, status, progress, message, result, error, created_at, updated_at = row
+        return Job(
+            id=job_id,
+            kind=kind,
+            status=status,
+            progress=progress,
+            message=message,
+            result=json.loads(result) if result else None,
+            error=error,
+            created_at=created_at,
+            updated_at=updated_at,
+        )
+
+    def _load(self, job_id: str) -> Job | None:
+        row = self._db.execute(
+            "SELECT id, kind, status, progress, message, result, error, created_at, updated_at "
+            "FROM jobs WHERE id = ?",
+            (job_id,),
+        ).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def _load_unfinished(self) -> list[tuple[Job, dict]]:
+        rows = self._db.execute(
+            "SELECT id, kind, status, progress, message, result, error, created_at, updated_at, payload "
+            "FROM jobs WHERE status IN ('queued', 'running') ORDER BY created_at"
+        ).fetchall()
+        return [(self._row_to_job(row[:-1]), json.loads(row[-1] or "{}")) for row in rows]
+
+
+job_manager = JobManager(
+    db_path=settings.jobs_db_path,
+    workers=settings.jobs_workers,
+    max_queue=settings.jobs_max_queue,
+)
+
+
+def report_progress(progress: float, message: str | None = None) -> None:
+    """
+    Обновляет прогресс текущей фоновой задачи (0.0–1.0). Вне задачи ничего не делает.
+    """
+    job = _current_job.get()
+    if job is not None:
+        job_manager.update_progress(job, progress, message)
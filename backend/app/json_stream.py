@@ -0,0 +1,253 @@
+import json
+import logging
+import re
+from typing import Any, AsyncIterator, List, Optional
+
+from app.executor import cpu_executor
+from app.metrics import stage_timer
+
+logger = logging.getLogger(__name__)
+
+
+class JsonArrayStreamParser:
+    """
+    Инкрементальный парсер JSON-ответа LLM.
+
+    Принимает фрагменты текста по мере стриминга и отдаёт элементы целевого
+    массива (например, "cases" или "issues") сразу, как только очередной
+    элемент закрылся. Текст вне JSON (markdown-обёртка ```json, пояснения)
+    пропускается. Если ответ обрезан по max_tokens, finish() восстанавливает
+    документ из валидного префикса: незакрытый элемент отбрасывается,
+    открытые скобки закрываются.
+    """
+
+    def __init__(self, array_key: str = "cases"):
+        self._array_key = array_key
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._string_chars: List[str] = []
+        self._last_key: Optional[str] = None
+        self._expecting_value = False
+        self._target_depth: Optional[int] = None
+        self._capturing = False
+        self._parts: List[str] = []
+        self._done = False
+
+        # Весь JSON-документ (от первой скобки) для finish()
+        self._doc_parts: List[str] = []
+        self._doc_length = 0
+        # Последняя позиция, где документ можно обрезать и закрыть скобками
+        self._safe_cut: Optional[int] = None
+        self._safe_stack: List[str] = []
+        # Идёт число или true/false/null: целым оно становится на , } или ]
+        self._scalar_pending = False
+
+        # Строковые поля верхнего уровня (например, "name" сьюта)
+        self.fields: dict[str, str] = {}
+        self.items_count = 0
+        self.truncated = False
+
+    @property
+    def done(self) -> bool:
+        return self._done
+
+    def feed(self, chunk: str) -> List[Any]:
+        """
+        Обрабатывает очередной фрагмент и возвращает закрывшиеся элементы массива.
+        """
+        completed = []
+        start = 0 if self._capturing else None
+        doc_start = 0 if self._stack else None
+
+        for i, c in enumerate(chunk):
+            if self._done:
+                break
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                    if not self._capturing:
+                        self._string_chars.append(c)
+                elif c == "\\":
+                    self._escape = True
+                    if not self._capturing:
+                        self._string_chars.append(c)
+                elif c == '"':
+                    self._in_string = False
+                    if not self._capturing:
+                        self._on_string_end(doc_start, i)
+                elif not self._capturing:
+                    self._string_chars.append(c)
+                continue
+
+            # До начала JSON пропускаем всё, кроме открывающей скобки
+            if not self._stack:
+                if c not in "{[":
+                    continue
+                doc_start = i
+
+            if c == '"':
+                self._in_string = True
+                self._string_chars = []
+            elif c == ":":
+                self._expecting_value = True
+            elif c == ",":
+                if self._scalar_pending and not self._capturing:
+                    # Обрезать можно перед запятой: значение до неё целое
+                    self._mark_safe_cut(doc_start, i - 1)
+                self._scalar_pending = False
+                self._expecting_value = False
+            elif c in "{[":
+                if self._is_target_array_start(c):
+                    self._stack.append(c)
+                    self._target_depth = len(self._stack)
+                    self._expecting_value = False
+                    self._mark_safe_cut(doc_start, i)
+                    continue
+                if self._target_depth is not None and len(self._stack) == self._target_depth and not self._capturing:
+                    self._capturing = True
+                    self._parts = []
+                    start = i
+                self._stack.append(c)
+                self._expecting_value = False
+                if not self._capturing:
+                    self._mark_safe_cut(doc_start, i)
+            elif c in "}]":
+                self._scalar_pending = False
+                if self._stack:
+                    self._stack.pop()
+                if self._capturing and len(self._stack) == self._target_depth:
+                    self._parts.append(chunk[start:i + 1])
+                    item = self._parse_item("".join(self._parts))
+                    if item is not None:
+                        completed.append(item)
+                    self._capturing = False
+                    self._parts = []
+                    start = None
+                elif self._target_depth is not None and len(self._stack) < self._target_depth:
+                    self._target_depth = None
+                if not self._capturing:
+                    self._mark_safe_cut(doc_start, i)
+                if not self._stack:
+                    self._done = True
+                    self._append_doc(chunk[doc_start:i + 1])
+                    doc_start = None
+            elif not c.isspace():
+                self._scalar_pending = True
+
+        if self._capturing and start is not None:
+            self._parts.append(chunk[start:])
+        if doc_start is not None:
+            self._append_doc(chunk[doc_start:])
+
+        return completed
+
+    def finish(self) -> Any:
+        """
+        Завершает разбор и возвращает весь документ.
+        Обрезанный ответ восстанавливается до последнего целого значения.
+        """
+        text = "".join(self._doc_parts)
+        if not text:
+            raise ValueError("No JSON object or array found in LLM response")
+
+        if self._done:
+            return json.loads(text)
+
+        self.truncated = True
+        if self._in_string and self._expecting_value and self._stack == ["{"]:
+            # Обрезано внутри строкового поля верхнего уровня ("summary"): сохраняем начало строки
+            return json.loads(_close_string(text) + "}")
+
+        if self._safe_cut is None:
+            raise ValueError("LLM response is truncated before the first complete JSON value")
+
+        closing = "".join("}" if bracket == "{" else "]" for bracket in reversed(self._safe_stack))
+        return json.loads(text[:self._safe_cut] + closing)
+
+    def _append_doc(self, text: str) -> None:
+        self._doc_parts.append(text)
+        self._doc_length += len(text)
+
+    def _mark_safe_cut(self, doc_start: Optional[int], i: int) -> None:
+        # Позиция сразу после текущего символа в координатах документа
+        self._safe_cut = self._doc_length + (i - (doc_start or 0)) + 1
+        self._safe_stack = list(self._stack)
+
+    def _is_target_array_start(self, c: str) -> bool:
+        if c != "[" or self._target_depth is not None or self._capturing:
+            return False
+        # Массив на верхнем уровне либо значение ключа array_key в корневом объекте
+        if not self._stack:
+            return True
+        return self._stack == ["{"] and self._expecting_value and self._last_key == self._array_key
+
+    def _on_string_end(self, doc_start: Optional[int], i: int) -> None:
+        is_value = self._expecting_value or (bool(self._stack) and self._stack[-1] == "[")
+        if is_value:
+            self._mark_safe_cut(doc_start, i)
+
+        if self._stack != ["{"]:
+            return
+
+        raw = "".join(self._string_chars)
+        try:
+            value = json.loads(f'"{raw}"')
+        except json.JSONDecodeError:
+            value = raw
+        if self._expecting_value:
+            if self._last_key is not None:
+                self.fields[self._last_key] = value
+            self._expecting_value = False
+        else:
+            self._last_key = value
+
+    def _parse_item(self, text: str) -> Any:
+        try:
+            item = json.loads(text)
+        except json.JSONDecodeError as e:
+            logger.warning("Skipping malformed array element: %s", e)
+            return None
+        self.items_count += 1
+        return item
+
+
+def _close_string(text: str) -> str:
+    # Незаконченная escape-последовательность (\ или \u12) в конце отбрасывается
+    match = re.search(r"(\\+)(u[0-9a-fA-F]{0,3})?$", text)
+    if match and len(match.group(1)) % 2 == 1:
+        text = text[:match.start()] + match.group(1)[:-1]
+    return text + '"'
+
+
+def parse_llm_json(content: str, array_key: str = "cases") -> Any:
+    """
+    Разбирает полный ответ LLM: пропускает markdown и текст вокруг JSON,
+    при обрезке по max_tokens возвращает валидный префикс.
+    """
+    parser = JsonArrayStreamParser(array_key=array_key)
+    parser.feed(content)
+    result = parser.finish()
+    if parser.truncated:
+        logger.warning("Response was truncated, recovered %s '%s' items", parser.items_count, array_key)
+    return result
+
+
+async def parse_llm_json_async(content: str, array_key: str = "cases") -> Any:
+    """
+    parse_llm_json вне event loop: посимвольный разбор ответа на десятки
+    тысяч токенов занимает заметное время.
+    """
+    with stage_timer("json_parse"):
+        return await cpu_executor.run(parse_llm_json, content, array_key, size=len(content))
+
+
+async def iter_json_array(chunks: AsyncIterator[str], array_key: str = "cases") -> AsyncIterator[Any]:
+    """
+    Отдаёт элементы массива array_key по мере прихода фрагментов ответа.
+    """
+    parser = JsonArrayStreamParser(array_key=array_key)
+    async for chunk in chunks:
+        for item in parser.feed(chunk):
+            yield item
@@ -0,0 +1,155 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Optional
+
+from app.config import settings
+
+# Флаг обхода кэша для текущего запроса (выставляется middleware по заголовку)
+cache_bypass: ContextVar[bool] = ContextVar("llm_cache_bypass", default=False)
+
+
+def make_cache_key(payload: dict) -> str:
+    """
+    Content-addressed ключ: sha256 от (model, messages, temperature, max_tokens).
+    """
+    key_data = {
+        "model": payload.get("model"),
+        "messages": payload.get("messages"),
+        "temperature": payload.get("temperature"),
+        "max_tokens": payload.get("max_tokens"),
+    }
+    raw = json.dumps(key_data, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """
+    Двухуровневый кэш ответов LLM: LRU в памяти + SQLite на диске с TTL.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: int, path: Optional[str] = None):
+        self._max_entries = max_entries
+        self._ttl = ttl_seconds
+        self._path = path
+        self._memory: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self._db: sqlite3.Connection | None = None
+        self._db_lock = threading.Lock()
+        self._writes_since_purge = 0
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.writes = 0
+
+    def _connect(self) -> sqlite3.Connection | None:
+        if not self._path:
+            return None
+        if self._db is None:
+            directory = os.path.dirname(self._path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(self._path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._db.commit()
+        return self._db
+
+    def _disk_get(self, key: str) -> tuple[float, dict] | None:
+        with self._db_lock:
+            db = self._connect()
+            if db is None:
+                return None
+            row = db.execute(
+                "SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, created_at = row
+            if time.time() - created_at > self._ttl:
+                db.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                db.commit()
+                return None
+        return created_at, json.loads(value)
+
+    def _disk_set(self, key: str, created_at: float, value: dict) -> None:
+        with self._db_lock:
+            db = self._connect()
+            if db is None:
+                return
+            db.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, created_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), created_at),
+            )
+            self._writes_since_purge += 1
+            # Периодически вычищаем протухшие записи
+            if self._writes_since_purge >= 100:
+                db.execute("DELETE FROM llm_cache WHERE created_at < ?", (time.time() - self._ttl,))
+                self._writes_since_purge = 0
+            db.commit()
+
+    def _memory_set(self, key: str, created_at: float, value: dict) -> None:
+        self._memory[key] = (created_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self._max_entries:
+            self._memory.popitem(last=False)
+
+    async def get(self, key: str) -> dict | None:
+        entry = self._memory.get(key)
+        if entry is not None:
+            created_at, value = entry
+            if time.time() - created_at <= self._ttl:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return value
+            del self._memory[key]
+
+        entry = await asyncio.to_thread(self._disk_get, key)
+        if entry is not None:
+            created_at, value = entry
+            self._memory_set(key, created_at, value)
+            self.disk_hits += 1
+            return value
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, value: dict) -> None:
+        created_at = time.time()
+        self._memory_set(key, created_at, value)
+        self.writes += 1
+        await asyncio.to_thread(self._disk_set, key, created_at, value)
+
+    def close(self) -> None:
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def stats(self) -> dict:
+        hits = self.memory_hits + self.disk_hits
+        total = hits + self.misses
+        return {
+            "enabled": settings.llm_cache_enabled,
+            "memory_entries": len(self._memory),
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "hit_ratio": round(hits / total, 4) if total else 0.0,
+        }
+
+
+llm_cache = LLMCache(
+    max_entries=settings.llm_cache_max_entries,
+    ttl_seconds=settings.llm_cache_ttl_seconds,
+    path=settings.llm_cache_path or None,
+)
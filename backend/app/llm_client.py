@@ -1,14 +1,189 @@
+import json
+import logging
+from typing import AsyncIterator
+
 import httpx
 
 from app.config import settings
+from app.llm_cache import llm_cache, cache_bypass, make_cache_key
+from app.llm_gateway import llm_gateway
+from app.llm_hedging import llm_hedging
+from app.metrics import LLM_TOKENS_TOTAL, stage_timer
+
+logger = logging.getLogger(__name__)
+
+_client: httpx.AsyncClient | None = None
+
 
+def _create_client() -> httpx.AsyncClient:
+    http2 = settings.llm_http2
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            logger.warning("Package 'h2' is not installed, falling back to HTTP/1.1")
+            http2 = False
 
-def get_llm_client() -> httpx.Client:
-    return httpx.Client(
+    return httpx.AsyncClient(
         base_url=settings.cloudru_api_url,
         headers={
             "Authorization": f"Bearer {settings.cloudru_api_token}",
             "Content-Type": "application/json",
         },
-        timeout=120.0,
+        timeout=settings.llm_timeout,
+        limits=httpx.Limits(
+            max_connections=settings.llm_max_connections,
+            max_keepalive_connections=settings.llm_max_keepalive_connections,
+            keepalive_expiry=settings.llm_keepalive_expiry,
+        ),
+        http2=http2,
     )
+
+
+async def init_llm_client() -> None:
+    """
+    Создаёт общий пул соединений к LLM при старте приложения.
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _create_client()
+
+
+async def close_llm_client() -> None:
+    """
+    Закрывает пул соединений при остановке приложения.
+    """
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def get_llm_client() -> httpx.AsyncClient:
+    """
+    Возвращает общий httpx.AsyncClient с keep-alive пулом.
+    Клиент живёт всё время работы приложения — не закрывайте его после запроса.
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _create_client()
+    return _client
+
+
+async def chat_completion(payload: dict, use_cache: bool = True) -> dict:
+    """
+    Выполняет POST /chat/completions через общий клиент и возвращает JSON ответа.
+    Запрос идёт через app.llm_gateway (лимит параллельности, повторы при 429/503),
+    короткие вызовы при LLM_HEDGE_ENABLED хеджируются (см. app.llm_hedging).
+    Успешные ответы кэшируются по содержимому запроса (см. app.llm_cache).
+    """
+    cache_key = None
+    if use_cache and settings.llm_cache_enabled and not payload.get("stream"):
+        cache_key = make_cache_key(payload)
+        if not cache_bypass.get():
+            cached = await llm_cache.get(cache_key)
+            if cached is not None:
+                logger.debug("Cache hit: %s", cache_key[:12])
+                return cached
+
+    client = get_llm_client()
+
+    async def send_plain(timeout: float) -> httpx.Response:
+        return await client.post("/chat/completions", json=payload, timeout=timeout)
+
+    async def send_streamed(timeout: float) -> httpx.Response:
+        # Для хеджирования: ответ возвращается при получении заголовков, тело дочитывает HedgingPolicy
+        request = client.build_request("POST", "/chat/completions", json=payload, timeout=timeout)
+        return await client.send(request, stream=True)
+
+    # Копия хеджированного запроса идёт внутри того же слота лимита шлюза
+    send = llm_hedging.wrap(send_streamed) if llm_hedging.eligible(payload) else send_plain
+
+    with stage_timer("llm_call"):
+        async with llm_gateway.request(send, timeout=settings.llm_timeout) as resp:
+            if resp.status_code != 200:
+                logger.warning("LLM API error: %s", resp.status_code)
+                raise Exception(f"LLM API error: {resp.status_code} - {resp.text}")
+
+            try:
+                data = resp.json()
+            except json.JSONDecodeError as e:
+                logger.warning("Response text (first 500 chars): %s", resp.text[:500])
+                raise Exception(f"LLM returned invalid JSON: {e}")
+
+    _count_tokens(payload, data)
+
+    if cache_key:
+        await llm_cache.set(cache_key, data)
+
+    return data
+
+
+def _count_tokens(payload: dict, data: dict) -> None:
+    usage = data.get("usage") or {}
+    model = str(data.get("model") or payload.get("model") or "unknown")
+    for kind in ("prompt", "completion"):
+        tokens = usage.get(f"{kind}_tokens")
+        if isinstance(tokens, (int, float)):
+            LLM_TOKENS_TOTAL.inc(model, kind, amount=tokens)
+
+
+async def _stream_events(payload: dict) -> AsyncIterator[tuple[str, dict | None]]:
+    """
+    Выполняет POST /chat/completions со stream=true и отдаёт строки SSE
+    "data: ..." провайдера вместе с разобранным JSON фрагмента (None для
+    [DONE] и нечитаемых строк). Токены из usage учитываются по пути.
+    """
+    client = get_llm_client()
+
+    async def send(timeout: float) -> httpx.Response:
+        request = client.build_request(
+            "POST", "/chat/completions", json={**payload, "stream": True}, timeout=timeout
+        )
+        return await client.send(request, stream=True)
+
+    # Повторы возможны только до первого фрагмента ответа
+    async with llm_gateway.request(send, timeout=settings.llm_stream_timeout) as response:
+        if response.status_code != 200:
+            error_text = await response.aread()
+            logger.warning("LLM API error: %s", response.status_code)
+            raise Exception(f"LLM API error: {response.status_code} - {error_text.decode()}")
+
+        async for line in response.aiter_lines():
+            if not line.startswith("data: "):
+                continue
+            data = line[len("data: "):].strip()
+            if data == "[DONE]":
+                yield line, None
+                break
+            try:
+                chunk = json.loads(data)
+            except json.JSONDecodeError:
+                chunk = None
+            if isinstance(chunk, dict) and chunk.get("usage"):
+                # Приходит в последнем фрагменте, если провайдер его отдаёт
+                _count_tokens(payload, chunk)
+            yield line, chunk if isinstance(chunk, dict) else None
+
+
+async def stream_chat_lines(payload: dict) -> AsyncIterator[str]:
+    """
+    Строки SSE "data: ..." ответа провайдера без изменений, включая
+    завершающую "data: [DONE]" — для проксирования потока клиенту.
+    """
+    async for line, _ in _stream_events(payload):
+        yield line
+
+
+async def stream_chat_completion(payload: dict) -> AsyncIterator[str]:
+    """
+    Выполняет POST /chat/completions со stream=true и отдаёт фрагменты
+    текста ответа (choices[0].delta.content) по мере их прихода.
+    """
+    async for _, chunk in _stream_events(payload):
+        choices = (chunk or {}).get("choices") or []
+        if not choices:
+            continue
+        content = (choices[0].get("delta") or {}).get("content")
+        if content:
+            yield content
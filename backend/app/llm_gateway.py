@@ -0,0 +1,259 @@
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from typing import AsyncIterator, Awaitable, Callable, Deque, Optional
+
+import httpx
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Провайдер перегружен: повторяем запрос и уменьшаем лимит
+RETRYABLE_STATUSES = frozenset({429, 502, 503, 504})
+
+# (timeout попытки) → ответ; для стриминга ответ открыт с stream=True
+Send = Callable[[float], Awaitable[httpx.Response]]
+
+
+class LLMDeadlineExceeded(Exception):
+    pass
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Retry-After в секундах: число секунд или HTTP-дата.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class AimdLimiter:
+    """
+    Адаптивный лимит одновременных запросов (AIMD, как окно TCP).
+
+    Успешный ответ увеличивает лимит на 1/limit — примерно +1 за «окно»
+    запросов, перегрузка (429/503, таймаут) умножает его на decrease_factor.
+    Ответы на запросы, отправленные до последнего уменьшения, лимит второй
+    раз не уменьшают: одна волна 429 — одно уменьшение. Запросы сверх лимита
+    ждут в очереди FIFO.
+    """
+
+    def __init__(self, initial: int, minimum: int, maximum: int, decrease_factor: float):
+        self._min = max(1, minimum)
+        self._max = max(self._min, maximum)
+        self._limit = float(min(max(initial, self._min), self._max))
+        self._decrease_factor = decrease_factor
+        self._in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._last_decrease = 0.0
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self, timeout: float) -> None:
+        if not self._waiters and self._in_flight < self.limit:
+            self._in_flight += 1
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout)
+        except BaseException:
+            if waiter.done() and not waiter.cancelled():
+                # Слот уже выдан, но дождаться его не успели — возвращаем
+                self.release(success=None, started_at=time.monotonic())
+            else:
+                waiter.cancel()
+                self._waiters.remove(waiter)
+            raise
+
+    def release(self, success: Optional[bool], started_at: float) -> None:
+        """
+        success: True — ответ получен, False — перегрузка, None — без сигнала.
+        """
+        self._in_flight -= 1
+        if success:
+            self._limit = min(self._max, self._limit + 1 / self._limit)
+        elif success is False and started_at >= self._last_decrease:
+            self._limit = max(self._min, self._limit * self._decrease_factor)
+            self._last_decrease = time.monotonic()
+        self._wake()
+
+    def _wake(self) -> None:
+        while self._waiters and self._in_flight < self.limit:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self._in_flight += 1
+                waiter.set_result(None)
+
+
+class LLMGateway:
+    """
+    Шлюз между агентами и HTTP клиентом LLM.
+
+    - адаптивный лимит одновременных запросов (AimdLimiter);
+    - 429/502/503/504 и сетевые ошибки повторяются с экспоненциальной
+      задержкой и full jitter, Retry-After соблюдается и приостанавливает
+      отправку новых запросов для всех;
+    - все попытки и ожидание в очереди укладываются в дедлайн запроса.
+
+    После исчерпания попыток возвращается последний ответ (или пробрасывается
+    последняя сетевая ошибка) — обработка ошибок у вызывающего не меняется.
+    """
+
+    def __init__(
+            self,
+            limiter: AimdLimiter,
+            max_attempts: int,
+            base_delay: float,
+            max_delay: float,
+            deadline: float,
+    ):
+        self._limiter = limiter
+        self._max_attempts = max(1, max_attempts)
+        self._base_delay = base_delay
+        self._max_delay = max_delay
+        self._deadline = deadline
+        self._paused_until = 0.0
+
+        self.requests = 0
+        self.retries = 0
+        self.throttled = 0
+        self.deadline_exceeded = 0
+
+    @asynccontextmanager
+    async def request(self, send: Send, timeout: float) -> AsyncIterator[httpx.Response]:
+        """
+        Выполняет send с повторами и держит слот лимита, пока открыт контекст
+        (для стриминга — до конца чтения ответа). timeout — на одну попытку.
+        """
+        self.requests += 1
+        deadline = time.monotonic() + self._deadline
+        attempt = 0
+        while True:
+            attempt += 1
+            await self._wait_pause(deadline)
+            await self._acquire(deadline)
+            started_at = time.monotonic()
+            success: Optional[bool] = None
+            response: Optional[httpx.Response] = None
+            try:
+                try:
+                    response = await send(min(timeout, max(deadline - started_at, 0.001)))
+                except (httpx.TimeoutException, httpx.NetworkError) as e:
+                    success = False
+                    delay = self._backoff(attempt)
+                    if not self._can_retry(attempt, delay, deadline):
+                        raise
+                    logger.warning("%s, retry %s in %.1fs", type(e).__name__, attempt, delay)
+                else:
+                    if response.status_code not in RETRYABLE_STATUSES:
+                        # 4xx — ошибка запроса, о нагрузке ничего не говорит
+                        success = True if response.is_success else None
+                        yield response
+                        return
+
+                    success = False
+                    retry_after = parse_retry_after(response.headers.get("retry-after"))
+                    if response.status_code == 429:
+                        self.throttled += 1
+                    if retry_after is not None:
+                        # Общая пауза ограничена: огромный Retry-After не должен останавливать сервис
+                        pause = min(retry_after, self._max_delay)
+                        self._paused_until = max(self._paused_until, time.monotonic() + pause)
+                    delay = max(retry_after or 0.0, self._backoff(attempt))
+                    if not self._can_retry(attempt, delay, deadline):
+                        yield response
+                        return
+                    logger.warning(
+                        "HTTP %s, retry %s in %.1fs (limit %s)",
+                        response.status_code, attempt, delay, self._limiter.limit,
+                    )
+            finally:
+                if response is not None:
+                    await response.aclose()
+                self._limiter.release(success, started_at)
+
+            self.retries += 1
+            await asyncio.sleep(delay)
+
+    async def _acquire(self, deadline: float) -> None:
+        try:
+            await self._limiter.acquire(deadline - time.monotonic())
+        except asyncio.TimeoutError:
+            self.deadline_exceeded += 1
+            raise LLMDeadlineExceeded(
+                f"LLM request deadline ({self._deadline:.0f}s) exceeded while queued "
+                f"(limit {self._limiter.limit}, queued {self._limiter.queued})"
+            )
+
+    async def _wait_pause(self, deadline: float) -> None:
+        # Retry-After от провайдера действует на все запросы
+        pause = self._paused_until - time.monotonic()
+        if pause <= 0:
+            return
+        if time.monotonic() + pause >= deadline:
+            self.deadline_exceeded += 1
+            raise LLMDeadlineExceeded(f"LLM provider asked to retry after {pause:.0f}s, past the request deadline")
+        await asyncio.sleep(pause)
+
+    def _backoff(self, attempt: int) -> float:
+        # Full jitter: равномерно от 0 до экспоненты, чтобы повторы не шли волной
+        return random.uniform(0, min(self._max_delay, self._base_delay * 2 ** (attempt - 1)))
+
+    def _can_retry(self, attempt: int, delay: float, deadline: float) -> bool:
+        if attempt >= self._max_attempts:
+            return False
+        if time.monotonic() + delay >= deadline:
+            self.deadline_exceeded += 1
+            return False
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "limit": self._limiter.limit,
+            "in_flight": self._limiter.in_flight,
+            "queued": self._limiter.queued,
+            "requests": self.requests,
+            "retries": self.retries,
+            "throttled": self.throttled,
+            "deadline_exceeded": self.deadline_exceeded,
+        }
+
+
+llm_gateway = LLMGateway(
+    limiter=AimdLimiter(
+        initial=settings.llm_concurrency_initial,
+        minimum=settings.llm_concurrency_min,
+        maximum=settings.llm_concurrency_max,
+        decrease_factor=settings.llm_concurrency_decrease_factor,
+    ),
+    max_attempts=settings.llm_retry_max_attempts,
+    base_delay=settings.llm_retry_base_delay,
+    max_delay=settings.llm_retry_max_delay,
+    deadline=settings.llm_request_deadline,
+)
@@ -0,0 +1,156 @@
+import asyncio
+import time
+from collections import deque
+from typing import Deque
+
+import httpx
+
+from app.config import settings
+from app.llm_gateway import Send
+
+
+class HedgingPolicy:
+    """
+    Хеджирование коротких запросов к LLM.
+
+    Задержка — перцентиль недавних времён до заголовков ответа (TTFB): send
+    открывает ответ с stream=True, тело дочитывается уже здесь. Если к этому
+    моменту ни одна попытка не получила заголовков, отправляется копия запроса;
+    берётся ответ, прочитанный первым, второй запрос отменяется.
+
+    Копия не занимает второй слот AimdLimiter: шлюз видит один запрос.
+    Дополнительную нагрузку ограничивает только budget — доля хеджированных
+    вызовов среди последних window коротких, поэтому при общей деградации
+    провайдера копии не удваивают число запросов.
+    """
+
+    def __init__(
+            self,
+            enabled: bool,
+            max_tokens: int,
+            percentile: float,
+            initial_delay: float,
+            min_delay: float,
+            budget: float,
+            window: int,
+            min_samples: int,
+    ):
+        self.enabled = enabled
+        self._max_tokens = max_tokens
+        self._percentile = percentile
+        self._initial_delay = initial_delay
+        self._min_delay = min_delay
+        self._budget = budget
+        self._min_samples = min_samples
+        self._latencies: Deque[float] = deque(maxlen=window)
+        self._decisions: Deque[bool] = deque(maxlen=window)
+
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0  # копия ответила раньше исходного запроса
+        self.budget_denied = 0
+        self.cancelled = 0
+
+    def eligible(self, payload: dict) -> bool:
+        max_tokens = payload.get("max_tokens")
+        return self.enabled and max_tokens is not None and max_tokens <= self._max_tokens
+
+    def delay(self) -> float:
+        if len(self._latencies) < self._min_samples:
+            return self._initial_delay
+        ordered = sorted(self._latencies)
+        index = min(len(ordered) - 1, int(len(ordered) * self._percentile / 100))
+        return max(self._min_delay, ordered[index])
+
+    def wrap(self, send: Send) -> Send:
+        """
+        send должен возвращать ответ, открытый с stream=True; обёртка отдаёт его с прочитанным телом.
+        """
+        async def hedged_send(timeout: float) -> httpx.Response:
+            return await self._send(send, timeout)
+
+        return hedged_send
+
+    def _allow_hedge(self) -> bool:
+        return sum(self._decisions) < self._budget * len(self._decisions) + 1
+
+    async def _send(self, send: Send, timeout: float) -> httpx.Response:
+        self.calls += 1
+        delay = self.delay()
+        started_at = time.monotonic()
+        headers_at: list[float] = []
+        primary = asyncio.create_task(self._attempt(send, timeout, headers_at))
+        tasks = [primary]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            # Заголовки уже пришли — провайдер отвечает, копия не нужна
+            if not done and not headers_at:
+                if self._allow_hedge():
+                    self.hedged += 1
+                    self._decisions.append(True)
+                    remaining = max(timeout - (time.monotonic() - started_at), 0.001)
+                    tasks.append(asyncio.create_task(self._attempt(send, remaining, headers_at)))
+                else:
+                    self.budget_denied += 1
+                    self._decisions.append(False)
+            else:
+                self._decisions.append(False)
+
+            winner = await self._first_response(tasks)
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+                    self.cancelled += 1
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        if winner is not primary:
+            self.hedge_wins += 1
+        # Время до первых заголовков; если первой ответила копия — нижняя оценка TTFB исходного
+        if headers_at:
+            self._latencies.append(min(headers_at) - started_at)
+        return winner.result()
+
+    async def _attempt(self, send: Send, timeout: float, headers_at: list) -> httpx.Response:
+        response = await send(timeout)
+        headers_at.append(time.monotonic())
+        try:
+            await response.aread()
+        except BaseException:
+            await response.aclose()
+            raise
+        return response
+
+    async def _first_response(self, tasks: list) -> asyncio.Task:
+        # Первый успешно завершившийся запрос; ошибка — только если упали все
+        pending = set(tasks)
+        while True:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task
+            if not pending:
+                return done.pop()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "delay_seconds": round(self.delay(), 3),
+            "calls": self.calls,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "budget_denied": self.budget_denied,
+            "cancelled": self.cancelled,
+        }
+
+
+llm_hedging = HedgingPolicy(
+    enabled=settings.llm_hedge_enabled,
+    max_tokens=settings.llm_hedge_max_tokens,
+    percentile=settings.llm_hedge_percentile,
+    initial_delay=settings.llm_hedge_initial_delay,
+    min_delay=settings.llm_hedge_min_delay,
+    budget=settings.llm_hedge_budget,
+    window=settings.llm_hedge_window,
+    min_samples=settings.llm_hedge_min_samples,
+)
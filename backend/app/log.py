@@ -0,0 +1,177 @@
+import asyncio
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from typing import List, Optional
+
+from app.config import settings
+
+# Trace id текущего запроса или фоновой задачи: попадает в каждую запись лога и span
+trace_id_var: ContextVar[str] = ContextVar("trace_id", default="-")
+
+_formatter = logging.Formatter()
+_listeners: List[QueueListener] = []
+_trace_logger = logging.getLogger("app.trace")
+
+
+def new_trace_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+class _ContextQueueHandler(QueueHandler):
+    """
+    Отправляет запись в очередь, не форматируя её: форматирование и запись
+    в stdout/файл выполняет фоновый поток QueueListener. В потоке вызывающего
+    остаются только подстановка аргументов и трейсбек (его нельзя передать позже).
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.trace_id = trace_id_var.get()
+        if record.args:
+            record.msg = record.getMessage()
+            record.args = None
+        if record.exc_info:
+            record.exc_text = _formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Одна запись — одна строка JSON: ts, level, logger, trace_id, msg [, exc].
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(record.created)) + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "trace_id": getattr(record, "trace_id", "-"),
+            "msg": record.getMessage(),
+        }
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _TraceFileHandler(logging.Handler):
+    """
+    Пишет события Chrome Trace Event Format по одному на строку. Файл — JSON-массив
+    без закрывающей скобки, который chrome://tracing и Perfetto открывают как есть.
+    """
+
+    def __init__(self, path: str):
+        super().__init__()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+        if self._file.tell() == 0:
+            self._file.write("[\n")
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self._file.write(json.dumps(record.msg, ensure_ascii=False, default=str) + ",\n")
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+        super().close()
+
+
+def setup_logging() -> None:
+    """
+    Логгер "app" (и все app.*): уровень из LOG_LEVEL, записи уходят в очередь,
+    в stdout их пишет фоновый поток. При TRACE_PATH span'ы этапов пишутся в файл.
+    """
+    if _listeners:
+        return
+
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(JsonFormatter())
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    _listeners.append(QueueListener(log_queue, stream))
+
+    logger = logging.getLogger("app")
+    logger.setLevel(settings.log_level.upper())
+    logger.addHandler(_ContextQueueHandler(log_queue))
+    logger.propagate = False
+
+    _trace_logger.propagate = False
+    _trace_logger.setLevel(logging.INFO)
+    if settings.trace_path:
+        trace_queue: queue.SimpleQueue = queue.SimpleQueue()
+        _trace_logger.addHandler(_ContextQueueHandler(trace_queue))
+        _listeners.append(QueueListener(trace_queue, _TraceFileHandler(settings.trace_path)))
+    else:
+        _trace_logger.disabled = True
+
+    for listener in _listeners:
+        listener.start()
+
+
+def shutdown_logging() -> None:
+    """
+    Дописывает очереди и закрывает файлы (при остановке приложения).
+    """
+    while _listeners:
+        listener = _listeners.pop()
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+
+
+def _lane() -> int:
+    # Дорожка в просмотрщике — asyncio-задача: параллельные этапы не накладываются
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None
+    return id(task) & 0xFFFFFFFF if task is not None else threading.get_ident() & 0xFFFFFFFF
+
+
+def record_span(name: str, category: str, started_at: float, duration: float, args: Optional[dict] = None) -> None:
+    """
+    Complete event ("ph": "X"): started_at — time.time() начала, duration — секунды.
+    """
+    if _trace_logger.disabled or not _trace_logger.handlers:
+        return
+    _trace_logger.info({
+        "name": name,
+        "cat": category,
+        "ph": "X",
+        "ts": int(started_at * 1_000_000),
+        "dur": int(duration * 1_000_000),
+        "pid": os.getpid(),
+        "tid": _lane(),
+        "args": {"trace_id": trace_id_var.get(), **(args or {})},
+    })
+
+
+class span:
+    """
+    with span("pipeline:e2e", "pipeline"): ... — span в файле трассировки (без TRACE_PATH ничего не пишет).
+    """
+    __slots__ = ("_name", "_category", "_args", "_started_at", "_perf")
+
+    def __init__(self, name: str, category: str = "stage", **args):
+        self._name = name
+        self._category = category
+        self._args = args
+
+    def __enter__(self):
+        self._started_at = time.time()
+        self._perf = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self._args["error"] = exc_type.__name__
+        record_span(self._name, self._category, self._started_at, time.perf_counter() - self._perf, self._args)
+        return False
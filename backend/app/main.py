@@ -1,16 +1,156 @@
-from fastapi import FastAPI
+import logging
+import re
+import time
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
 
 from app.config import settings
+from app.log import new_trace_id, setup_logging, shutdown_logging, span, trace_id_var
+from app.llm_cache import llm_cache, cache_bypass
+from app.llm_client import init_llm_client, close_llm_client
+from app.http_client import close_http_client
+from app.spec_store import spec_store
+from app.executor import cpu_executor
+from app.singleflight import single_flight
+from app.llm_gateway import llm_gateway
+from app.llm_hedging import llm_hedging
+from app.metrics import (
+    REQUESTS_IN_FLIGHT,
+    REQUESTS_TOTAL,
+    REQUEST_SECONDS,
+    CallbackGauge,
+    registry,
+)
+from app.jobs import job_manager
 from app.routers import generation, validation, optimization, requirements
-from app.routers import chat
+from app.routers import chat, jobs
+
+setup_logging()
+logger = logging.getLogger(__name__)
+
+# X-Request-ID клиента используется как trace id, если он безопасен для логов
+_REQUEST_ID_RE = re.compile(r"^[\w.-]{1,64}$")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await init_llm_client()
+    await job_manager.start()
+    yield
+    await job_manager.stop()
+    await close_llm_client()
+    await close_http_client()
+    llm_cache.close()
+    cpu_executor.shutdown()
+    shutdown_logging()
+
+
+app = FastAPI(title="TestOps Copilot API", version="0.1.0", lifespan=lifespan)
+
+
+@app.middleware("http")
+async def llm_cache_bypass_middleware(request: Request, call_next):
+    """
+    Cache-Control: no-cache или X-LLM-Cache: bypass — не читать ответы LLM из кэша.
+    """
+    bypass = (
+        "no-cache" in request.headers.get("cache-control", "").lower()
+        or request.headers.get("x-llm-cache", "").lower() == "bypass"
+    )
+    token = cache_bypass.set(bypass)
+    try:
+        return await call_next(request)
+    finally:
+        cache_bypass.reset(token)
+
+
+# Метка router — первый сегмент пути известных роутеров, иначе "other" (ограниченная кардинальность)
+_ROUTERS = frozenset({"generation", "validation", "optimization", "requirements", "chat", "jobs", "health", "metrics"})
+
+
+def _router_label(path: str) -> str:
+    segment = path.split("/", 2)[1] if path.count("/") else ""
+    return segment if segment in _ROUTERS else "other"
+
+
+@app.middleware("http")
+async def metrics_middleware(request: Request, call_next):
+    """
+    Время до заголовков ответа (у SSE и ZIP — до начала потока) и число запросов в обработке.
+    """
+    router = _router_label(request.url.path)
+    REQUESTS_IN_FLIGHT.inc(router)
+    started_at = time.perf_counter()
+    status = "500"
+    try:
+        response = await call_next(request)
+        status = str(response.status_code)
+        return response
+    finally:
+        REQUEST_SECONDS.observe(router, request.method, value=time.perf_counter() - started_at)
+        REQUESTS_TOTAL.inc(router, status)
+        REQUESTS_IN_FLIGHT.dec(router)
+
+
+def _ratio(hits: int, total: int) -> float:
+    return hits / total if total else 0.0
+
+
+def _cache_hit_ratios() -> dict:
+    llm = llm_cache.stats()
+    spec = spec_store.stats()
+    spec_lookups = spec["fresh_hits"] + spec["not_modified"] + spec["downloads"]
+    return {
+        ("llm_response",): llm["hit_ratio"],
+        ("spec_download",): _ratio(spec["fresh_hits"] + spec["not_modified"], spec_lookups),
+        ("spec_parse",): _ratio(spec["parse_hits"], spec["parse_hits"] + spec["parses"]),
+    }
+
+
+def _llm_gateway_state() -> dict:
+    stats = llm_gateway.stats()
+    return {(key,): stats[key] for key in ("limit", "in_flight", "queued")}
+
+
+registry.register(CallbackGauge(
+    "testops_cache_hit_ratio", "Cache hit ratio since start", ("cache",), _cache_hit_ratios,
+))
+registry.register(CallbackGauge(
+    "testops_llm_gateway", "LLM gateway concurrency limit, requests in flight and queued", ("state",),
+    _llm_gateway_state,
+))
+registry.register(CallbackGauge(
+    "testops_jobs_queue_depth", "Background jobs waiting in queue", (),
+    lambda: {(): job_manager.queue_depth()},
+))
+
+
+@app.middleware("http")
+async def trace_middleware(request: Request, call_next):
+    """
+    Trace id запроса (X-Request-ID или новый) — во всех логах и span'ах агентов,
+    возвращается в заголовке X-Trace-Id. Снаружи остальных middleware.
+    """
+    request_id = request.headers.get("x-request-id", "")
+    trace_id = request_id if _REQUEST_ID_RE.match(request_id) else new_trace_id()
+    token = trace_id_var.set(trace_id)
+    try:
+        with span(f"{request.method} {request.url.path}", "http"):
+            response = await call_next(request)
+        response.headers["X-Trace-Id"] = trace_id
+        return response
+    finally:
+        trace_id_var.reset(token)
 
-app = FastAPI(title="TestOps Copilot API", version="0.1.0")
 
 app.include_router(generation.router)
 app.include_router(validation.router)
 app.include_router(optimization.router)
 app.include_router(requirements.router)
 app.include_router(chat.router)
+app.include_router(jobs.router)
 
 
 @app.get("/health")
@@ -19,4 +159,19 @@ async def health_check():
         "status": "ok",
         "env": settings.app_env,
         "cloudru_api_url": settings.cloudru_api_url,
+        "llm_cache": llm_cache.stats(),
+        "spec_store": spec_store.stats(),
+        "cpu_executor": cpu_executor.stats(),
+        "single_flight": single_flight.stats(),
+        "llm_gateway": llm_gateway.stats(),
+        "llm_hedging": llm_hedging.stats(),
+        "jobs_queue_depth": job_manager.queue_depth(),
     }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """
+    Метрики в текстовом формате Prometheus.
+    """
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
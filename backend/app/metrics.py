@@ -0,0 +1,183 @@
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+from app.log import record_span
+
+# Границы бакетов в секундах: от разбора небольших входов до генерации на 50k токенов
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+    def samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def samples(self) -> Iterable[str]:
+        for labels, value in list(self._values.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+
+
+class CallbackGauge(_Metric):
+    """
+    Значения считаются при чтении /metrics: labels → value (статистика кэшей, шлюза LLM).
+    """
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str], collect: Callable[[], Dict[Labels, float]]):
+        super().__init__(name, help_text, labelnames)
+        self._collect = collect
+
+    def samples(self) -> Iterable[str]:
+        for labels, value in self._collect().items():
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+            self,
+            name: str,
+            help_text: str,
+            labelnames: Sequence[str] = (),
+            buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, help_text, labelnames)
+        self._buckets = tuple(buckets)
+        # labels → [счётчики по бакетам (не кумулятивные) + последний для +Inf, sum]
+        self._series: Dict[Labels, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, *labels: str, value: float) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = ([0] * (len(self._buckets) + 1), [0.0])
+        series[0][bisect_left(self._buckets, value)] += 1
+        series[1][0] += value
+
+    def samples(self) -> Iterable[str]:
+        for labels, (counts, total) in list(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self._buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total[0])}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}"
+
+
+class Registry:
+    """
+    Метрики процесса в текстовом формате Prometheus.
+
+    Запись — обычные операции со словарём в потоке event loop, без блокировок.
+    Каждый воркер uvicorn отдаёт свои значения; Prometheus суммирует их по instance.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Duplicate metric: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.header())
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+class _StageTimer:
+    __slots__ = ("_stage", "_started_at", "_perf")
+
+    def __init__(self, stage: str):
+        self._stage = stage
+
+    def __enter__(self):
+        self._started_at = time.time()
+        self._perf = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self._perf
+        outcome = "error" if exc_type else "ok"
+        STAGE_SECONDS.observe(self._stage, outcome, value=duration)
+        record_span(self._stage, "stage", self._started_at, duration, {"outcome": outcome})
+        return False
+
+
+def stage_timer(stage: str) -> _StageTimer:
+    """
+    with stage_timer("spec_parse"): ... — время этапа в testops_stage_seconds
+    и span в файле трассировки.
+    """
+    return _StageTimer(stage)
+
+
+registry = Registry()
+
+REQUEST_SECONDS: Histogram = registry.register(Histogram(
+    "testops_http_request_seconds", "HTTP request latency until response headers", ("router", "method"),
+))
+REQUESTS_TOTAL: Counter = registry.register(Counter(
+    "testops_http_requests_total", "HTTP requests by status code", ("router", "status"),
+))
+REQUESTS_IN_FLIGHT: Gauge = registry.register(Gauge(
+    "testops_http_requests_in_flight", "HTTP requests being processed", ("router",),
+))
+STAGE_SECONDS: Histogram = registry.register(Histogram(
+    "testops_stage_seconds", "Pipeline stage latency", ("stage", "outcome"),
+))
+LLM_TOKENS_TOTAL: Counter = registry.register(Counter(
+    "testops_llm_tokens_total", "LLM tokens from the response usage field", ("model", "kind"),
+))
@@ -1,4 +1,4 @@
-from typing import List, Literal, Optional
+from typing import Dict, List, Literal, Optional
 from pydantic import BaseModel
 
 
@@ -43,11 +43,39 @@ class AutomatedTest(BaseModel):
     code: str
 
 
+class DuplicatePair(BaseModel):
+    test1: str
+    test2: str
+    similarity: float  # Коэффициент Жаккара по шинглам (0.0–1.0)
+    source: Literal["minhash", "llm"] = "minhash"
+    reason: Optional[str] = None
+
+
+class EndpointCoverage(BaseModel):
+    method: str
+    path: str
+    cases: List[str] = []  # ID (или заголовки) кейсов, упоминающих эндпоинт
+    responses: Dict[str, List[str]] = {}  # код ответа из спецификации → кейсы, которые его проверяют
+
+
+class CoverageMatrix(BaseModel):
+    endpoints: List[EndpointCoverage]
+    covered_endpoints: int
+    total_endpoints: int
+    covered_responses: int
+    total_responses: int
+    unmatched_cases: List[str] = []  # кейсы, не упоминающие ни одного эндпоинта
+
+
 class CoverageReport(BaseModel):
     covered_features: List[str]
     missing_features: List[str]
     duplicates: List[str]
     summary: str
+    duplicate_pairs: List[DuplicatePair] = []
+    coverage_matrix: Optional[CoverageMatrix] = None
+    # Секунды по этапам пайплайна (/generation/ui/full)
+    stage_timings: Optional[Dict[str, float]] = None
 
 
 class ValidationIssue(BaseModel):
@@ -64,3 +92,15 @@ class ValidationReport(BaseModel):
     failed: int
     issues: List[ValidationIssue]
     summary: str
+
+
+class Job(BaseModel):
+    id: str
+    kind: str
+    status: Literal["queued", "running", "succeeded", "failed", "cancelled"] = "queued"
+    progress: float = 0.0
+    message: Optional[str] = None
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    created_at: float
+    updated_at: float
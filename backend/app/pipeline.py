@@ -0,0 +1,85 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Sequence
+
+from app.jobs import report_progress
+from app.log import span
+
+
+class Stage:
+    def __init__(self, name: str, func: Callable[..., Awaitable[Any]], deps: Sequence[str]):
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+
+
+class StageGraph:
+    """
+    Небольшой DAG этапов пайплайна.
+
+    Этап получает результаты своих зависимостей позиционными аргументами
+    в порядке deps и стартует, как только они готовы, поэтому независимые
+    этапы идут параллельно, а общее время — это критический путь графа.
+    Зависимости объявляются раньше этапа, так что циклов быть не может.
+    Если этап падает, остальные отменяются, а исключение пробрасывается.
+    Прогресс фоновой задачи — доля завершённых этапов.
+    """
+
+    def __init__(self):
+        self._stages: Dict[str, Stage] = {}
+        # Время выполнения самого этапа, без ожидания зависимостей
+        self.timings: Dict[str, float] = {}
+
+    def add(self, name: str, func: Callable[..., Awaitable[Any]], deps: Sequence[str] = ()) -> None:
+        if name in self._stages:
+            raise ValueError(f"Duplicate stage: {name}")
+        unknown = [dep for dep in deps if dep not in self._stages]
+        if unknown:
+            raise ValueError(f"Stage '{name}' depends on undeclared stages: {unknown}")
+        self._stages[name] = Stage(name, func, deps)
+
+    async def run(self) -> Dict[str, Any]:
+        """
+        Выполняет все этапы и возвращает их результаты по имени.
+        """
+        tasks: Dict[str, asyncio.Task] = {}
+        for stage in self._stages.values():
+            tasks[stage.name] = asyncio.create_task(self._run_stage(stage, tasks))
+
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+        return {name: task.result() for name, task in tasks.items()}
+
+    async def _run_stage(self, stage: Stage, tasks: Dict[str, asyncio.Task]) -> Any:
+        args = [await tasks[dep] for dep in stage.deps]
+        started_at = time.perf_counter()
+        try:
+            with span(f"pipeline:{stage.name}", "pipeline"):
+                result = await stage.func(*args)
+        finally:
+            self.timings[stage.name] = time.perf_counter() - started_at
+        report_progress(len(self.timings) / len(self._stages), f"Stage '{stage.name}' done")
+        return result
+
+    def critical_path(self) -> List[str]:
+        """
+        Самая долгая цепочка этапов по измеренным временам.
+        """
+        finish: Dict[str, float] = {}
+        previous: Dict[str, str | None] = {}
+        for stage in self._stages.values():
+            slowest = max(stage.deps, key=finish.__getitem__, default=None)
+            previous[stage.name] = slowest
+            finish[stage.name] = (finish[slowest] if slowest else 0.0) + self.timings.get(stage.name, 0.0)
+
+        path: List[str] = []
+        name = max(finish, key=finish.__getitem__, default=None)
+        while name is not None:
+            path.append(name)
+            name = previous[name]
+        return path[::-1]
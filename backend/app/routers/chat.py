@@ -3,9 +3,10 @@ from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional
 import json
-import httpx
-from app.llm_client import get_llm_client
-from app.config import settings
+import logging
+from app.llm_client import chat_completion as llm_chat_completion, stream_chat_lines
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
@@ -28,8 +29,8 @@ class ChatResponse(BaseModel):
 @router.post("/completions")
 async def chat_completion(request: ChatRequest):
     try:
-        print(f"[Chat] Received {len(request.messages)} messages")
-        print(f"[Chat] Stream={request.stream}")
+        logger.info("Received %s messages", len(request.messages))
+        logger.debug("Stream=%s", request.stream)
 
         system_message = {
             "role": "system",
@@ -53,62 +54,27 @@ Remember the conversation history and maintain context across messages."""
             for msg in request.messages
         ]
 
-        print(f"[Chat] Sending {len(llm_messages)} messages to LLM")
+        logger.debug("Sending %s messages to LLM", len(llm_messages))
 
         # Streaming режим
         if request.stream is True:
-            print(f"[Chat] STREAMING MODE ENABLED")
+            logger.debug("Streaming mode")
 
             async def generate():
+                # Через общий шлюз LLM: лимит параллельности, повторы при 429/503 и учёт токенов.
+                # Строки "data: ..." провайдера пересылаются клиенту без изменений
                 try:
-                    base_url = settings.cloudru_api_url
-                    token = settings.cloudru_api_token
-
-                    print(f"[Chat] Creating AsyncClient to {base_url}")
-
-                    async with httpx.AsyncClient(timeout=300.0) as client:
-                        print(f"[Chat] AsyncClient created, making request...")
-
-                        async with client.stream(
-                                'POST',
-                                f"{base_url}/chat/completions",
-                                json={
-                                    "model": "openai/gpt-oss-120b",
-                                    "messages": llm_messages,
-                                    "temperature": 0.8,
-                                    "max_tokens": 1500,
-                                    "stream": True
-                                },
-                                headers={
-                                    "Authorization": f"Bearer {token}",
-                                    "Content-Type": "application/json"
-                                }
-                        ) as response:
-                            print(f"[Chat] Response status: {response.status_code}")
-
-                            if response.status_code != 200:
-                                error_text = await response.aread()
-                                raise Exception(f"LLM API error: {response.status_code} - {error_text.decode()}")
-
-                            print(f"[Chat] Starting to stream...")
-                            count = 0
-                            async for line in response.aiter_lines():
-                                count += 1
-                                print(f"[Chat] Line {count}: {line[:50]}")
-
-                                if line.strip():
-                                    if line.startswith("data: "):
-                                        yield f"{line}\n\n"
-                                    if "data: [DONE]" in line:
-                                        print(f"[Chat] Stream finished")
-                                        break
-
-                            print(f"[Chat] Total lines: {count}")
+                    async for line in stream_chat_lines({
+                        "model": "openai/gpt-oss-120b",
+                        "messages": llm_messages,
+                        "temperature": 0.8,
+                        "max_tokens": 1500,
+                    }):
+                        yield f"{line}\n\n"
+                    logger.debug("Stream finished")
 
                 except Exception as e:
-                    import traceback
-                    print(f"[Chat] STREAM ERROR: {str(e)}")
-                    traceback.print_exc()
+                    logger.exception("Stream failed: %s", e)
                     error_data = {"error": str(e), "type": "stream_error"}
                     yield f"data: {json.dumps(error_data)}\n\n"
 
@@ -119,30 +85,19 @@ Remember the conversation history and maintain context across messages."""
             )
 
         # Обычный режим
-        print(f"[Chat] NORMAL MODE")
-        with get_llm_client() as client:
-            resp = client.post(
-                "/chat/completions",
-                json={
-                    "model": "openai/gpt-oss-120b",
-                    "messages": llm_messages,
-                    "temperature": 0.8,
-                    "max_tokens": 1500,
-                }
-            )
-
-        if resp.status_code != 200:
-            print(f"[Chat] LLM API error: {resp.status_code}")
-            raise Exception(f"LLM API error: {resp.status_code} - {resp.text}")
-
-        data = resp.json()
+        logger.debug("Normal mode")
+        data = await llm_chat_completion({
+            "model": "openai/gpt-oss-120b",
+            "messages": llm_messages,
+            "temperature": 0.8,
+            "max_tokens": 1500,
+        }, use_cache=False)
         assistant_message = data["choices"][0]["message"]["content"]
 
-        print(f"[Chat] Response length: {len(assistant_message)} characters")
+        logger.debug("Response length: %s characters", len(assistant_message))
 
         return ChatResponse(message=assistant_message, role="assistant")
 
     except Exception as e:
-        import traceback
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"Chat failed: {str(e)}")
\ No newline at end of file
+        logger.exception("Chat failed: %s", e)
+        raise HTTPException(status_code=500, detail=f"Chat failed: {str(e)}")
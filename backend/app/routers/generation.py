@@ -1,15 +1,23 @@
-from typing import Optional
+from typing import AsyncIterator, Dict, Literal, Optional
+import json
+import logging
+import re
 import httpx
-import traceback
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, HttpUrl
 
 from app.agents.coordinator import CoordinatorAgent
 from app.agents.requirements_agent import RequirementsAgent
 from app.agents.html_agent import HtmlAnalysisAgent
 from app.agents.allure_code_generator import AllureCodeGenerator
-from app.models import CoverageReport, TestSuite
+from app.models import CoverageReport, TestSuite, TestCase, UiModel
 from app.agents.automation_agent import AutomationAgent
+from app.jobs import report_progress
+from app.singleflight import make_flight_key, single_flight
+from app.spec_store import spec_store
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/generation", tags=["generation"])
 
@@ -20,120 +28,234 @@ class UiSourcePayload(BaseModel):
     url: Optional[HttpUrl] = None
     html: Optional[str] = None
     requirements_text: Optional[str] = None
+    stream: Optional[bool] = False  # SSE: отдавать тест-кейсы по мере генерации
+
+
+class UiCrawlPayload(BaseModel):
+    url: HttpUrl  # Стартовая страница обхода
+    max_depth: Optional[int] = None  # По умолчанию CRAWL_MAX_DEPTH
+    max_pages: Optional[int] = None  # По умолчанию CRAWL_MAX_PAGES
+
+
+class AllureArchivePayload(BaseModel):
+    test_suite: TestSuite  # Готовый сьют (например, из /api/vms)
+    shard_by: Literal["none", "feature", "tag"] = "feature"  # Модуль на фичу / на первый тег
+    owner: str = "qa_team"
 
 
 class ApiSpecPayload(BaseModel):
     swagger_url: Optional[str] = None  # URL на swagger.json/yaml
     swagger_text: Optional[str] = None  # Или текст спецификации
     requirements_text: Optional[str] = None  # Дополнительные требования
+    stream: Optional[bool] = False  # SSE: отдавать тест-кейсы по мере генерации
 
 
-@router.post("/ui/full", response_model=CoverageReport)
-async def generate_full_ui_flow(payload: UiSourcePayload):
-    import traceback
-    try:
-        print(f"[DEBUG] Starting full_ui_flow")
-        print(f"[DEBUG] url={payload.url}, html_len={len(payload.html or '')}, req_text={payload.requirements_text}")
+class ApiSpecDiffPayload(BaseModel):
+    swagger_url: Optional[str] = None  # Новая версия спецификации: URL
+    swagger_text: Optional[str] = None  # или текст
+    requirements_text: Optional[str] = None
+    previous_suite: TestSuite  # Сьют, сгенерированный по прошлой версии
+    previous_fingerprint: Optional[Dict[str, str]] = None  # spec_fingerprint прошлой версии
+    previous_swagger_url: Optional[str] = None  # Или сама прошлая спецификация
+    previous_swagger_text: Optional[str] = None
 
-        report = await coordinator.full_ui_flow(
-            url=str(payload.url) if payload.url else None,
-            html=payload.html,
-            requirements_text=payload.requirements_text,
-        )
 
-        print(f"[DEBUG] Success!")
-        return report
+# Дефолтная спецификация Cloud.ru VMs API для генерации Allure кода
+DEFAULT_VMS_API_SPEC = """
+# Cloud.ru Evolution Compute API v3
 
-    except Exception as exc:
-        print(f"[ERROR] Exception in /ui/full: {exc}")
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=str(exc))
+## Base Information
+- Base URL: https://compute.api.cloud.ru
+- Authentication: Bearer token (userPlaneApiToken in Authorization header)
+- Content-Type: application/json
+- ID Format: All resource IDs must be in UUIDv4 format
 
+## API Sections
 
-@router.post("/allure-code/ui", response_model=dict)
-async def generate_ui_allure_code(payload: UiSourcePayload):
+### 1. Virtual Machines (VMs)
+- GET /vms - Get list of all virtual machines
+- POST /vms - Create new virtual machine (requires: name, flavor_id, image_id)
+- GET /vms/{vm_id} - Get specific VM details by ID
+- PATCH /vms/{vm_id} - Update VM configuration (name, flavor, etc.)
+- DELETE /vms/{vm_id} - Delete virtual machine
+- POST /vms/{vm_id}/start - Start stopped VM
+- POST /vms/{vm_id}/stop - Stop running VM
+- POST /vms/{vm_id}/reboot - Reboot running VM
+
+### 2. Disks
+- GET /disks - Get list of all disks
+- POST /disks - Create new disk (requires: name, size, availability_zone)
+- GET /disks/{disk_id} - Get specific disk details by ID
+- PATCH /disks/{disk_id} - Update disk configuration (name, size)
+- DELETE /disks/{disk_id} - Delete disk (only if not attached to VM)
+- POST /disks/{disk_id}/attach - Attach disk to VM (requires: vm_id in body)
+- POST /disks/{disk_id}/detach - Detach disk from VM
+
+### 3. Flavors (Instance Configurations)
+- GET /flavors - Get list of available instance configurations
+- GET /flavors/{flavor_id} - Get specific flavor details (CPU, RAM, disk, network specs)
+
+## Common Response Codes
+- 200 OK - Successful GET/PATCH/action
+- 201 Created - Successful POST (resource created)
+- 204 No Content - Successful DELETE
+- 400 Bad Request - Invalid request data or parameters
+- 401 Unauthorized - Missing or invalid authentication token
+- 404 Not Found - Resource with specified ID does not exist
+- 409 Conflict - Operation not allowed in current state (e.g., delete attached disk)
+- 500 Internal Server Error - Server-side error
+"""
+
+
+async def _coalesced(name: str, payload: BaseModel, run):
     """
-    Генерирует ручные тест-кейсы в формате Allure TestOps as Code для UI.
+    Одинаковые запросы, пришедшие одновременно, ждут одну генерацию (см. app.singleflight).
+    """
+    return await single_flight.run(make_flight_key(name, payload), lambda: run(payload))
 
-    Входные данные:
-    - url: URL сайта (например https://cloud.ru/calculator)
-    - html: HTML страницы (опционально)
-    - requirements_text: Дополнительные требования
 
-    Выход:
-    - Python код в формате Allure TestOps as Code (минимум 15 тест-кейсов)
+def _sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _allure_code_event_stream(
+        suite_name: str,
+        cases: AsyncIterator[TestCase],
+        source: str,
+) -> StreamingResponse:
     """
-    import traceback
-    try:
-        print("[DEBUG] ===== Starting UI Allure TestOps as Code generation =====")
-        print(f"[DEBUG] url={payload.url}, html_len={len(payload.html or '')}")
-
-        # 1. Парсим HTML
-        html_agent = HtmlAnalysisAgent()
-        ui_model = await html_agent.analyze(
-            url=str(payload.url) if payload.url else None,
-            html=payload.html
-        )
-        print(f"[DEBUG] UI model parsed: {len(ui_model.pages)} pages")
+    SSE-поток Allure кода: header (импорты и класс), затем test_case на каждый
+    готовый кейс с отрендеренным методом, в конце done или error.
+    """
+    allure_generator = AllureCodeGenerator()
+
+    async def generate():
+        count = 0
+        try:
+            yield _sse_event("header", {
+                "suite_name": suite_name,
+                "format": "Allure TestOps as Code",
+                "source": source,
+                "code": allure_generator.generate_header(suite_name),
+            })
+
+            async for case in cases:
+                count += 1
+                yield _sse_event("test_case", {
+                    "index": count,
+                    "test_case": case.model_dump(),
+                    "code": allure_generator.generate_test_method_code(case),
+                })
+
+            logger.debug("Streamed %s Allure test methods", count)
+            yield _sse_event("done", {"test_count": count, "suite_name": suite_name})
+
+        except Exception as e:
+            logger.exception("Allure code stream failed: %s", e)
+            yield _sse_event("error", {"error": str(e), "type": "stream_error", "test_count": count})
+
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+async def run_full_ui_flow(payload: UiSourcePayload) -> CoverageReport:
+    """
+    Полный UI-пайплайн: требования/HTML → тест-кейсы → e2e → анализ покрытия.
+    """
+    logger.debug("Starting full_ui_flow")
+    logger.debug("url=%s, html_len=%s, req_text=%s", payload.url, len(payload.html or ''), payload.requirements_text)
 
-        # 2. Генерируем тест-кейсы
-        requirements_agent = RequirementsAgent()
-        test_suite = await requirements_agent.generate_from_ui_model(ui_model)
-        print(f"[DEBUG] Generated {len(test_suite.cases)} test cases")
+    report = await coordinator.full_ui_flow(
+        url=str(payload.url) if payload.url else None,
+        html=payload.html,
+        requirements_text=payload.requirements_text,
+    )
 
-        # 3. Генерируем Allure TestOps as Code
-        allure_generator = AllureCodeGenerator()
-        allure_code = allure_generator.generate_allure_code(test_suite)
-        print(f"[DEBUG] Allure code generated: {len(allure_code)} characters")
+    logger.debug("Success!")
+    return report
 
-        return {
-            "allure_code": allure_code,
-            "test_count": len(test_suite.cases),
-            "suite_name": test_suite.name,
-            "format": "Allure TestOps as Code",
-            "url": str(payload.url) if payload.url else "from HTML"
-        }
 
-    except Exception as e:
-        print(f"[ERROR] Failed to generate UI Allure code: {e}")
-        traceback.print_exc()
-        raise HTTPException(
-            status_code=500,
-            detail=f"Failed to generate Allure code: {str(e)}"
-        )
+async def _analyze_ui(payload: UiSourcePayload) -> UiModel:
+    html_agent = HtmlAnalysisAgent()
+    ui_model = await html_agent.analyze(
+        url=str(payload.url) if payload.url else None,
+        html=payload.html
+    )
+    logger.debug("UI model parsed: %s pages", len(ui_model.pages))
+    return ui_model
 
 
-@router.post("/api/vms", response_model=dict)
-async def generate_api_vm_test_cases(payload: ApiSpecPayload):
+async def run_ui_crawl(payload: UiCrawlPayload) -> dict:
     """
-    Генерирует ручные тест-кейсы для REST API на основе OpenAPI/Swagger спецификации.
+    Обход сайта от URL: UiModel со страницей на каждый найденный URL того же origin.
+    """
+    result = await HtmlAnalysisAgent().crawl(
+        str(payload.url),
+        max_depth=payload.max_depth,
+        max_pages=payload.max_pages,
+    )
+    if not result.pages:
+        raise ValueError(f"No pages crawled from {payload.url}: {result.errors or 'blocked by robots.txt'}")
 
-    Пользователь может передать:
-    - swagger_url: URL на swagger.json/yaml (например https://compute.api.cloud.ru/swagger.json)
-    - swagger_text: Текст OpenAPI спецификации целиком
-    - requirements_text: Дополнительные требования (необязательно)
+    return {
+        "ui_model": UiModel(pages=result.pages).model_dump(mode="json"),
+        **result.stats(),
+    }
 
-    Если ничего не передано - используется дефолтная спецификация Cloud.ru VMs API.
 
-    Генерирует минимум 15 тест-кейсов с покрытием CRUD, auth, errors.
+async def run_ui_allure_code(payload: UiSourcePayload) -> dict:
     """
-
-    try:
-        print("[DEBUG] ===== Starting API test case generation =====")
-        print(f"[DEBUG] swagger_url={payload.swagger_url}")
-        print(f"[DEBUG] swagger_text length={len(payload.swagger_text or '')}")
-        print(f"[DEBUG] requirements_text={payload.requirements_text}")
-
-        requirements_agent = RequirementsAgent()
-
-        if payload.swagger_url or payload.swagger_text:
-            result = await requirements_agent.generate_from_api_spec(
-                swagger_url=payload.swagger_url,
-                swagger_text=payload.swagger_text,
-                requirements_text=payload.requirements_text
-            )
-        else:
-            api_specification = """
+    HTML/URL → UI тест-кейсы → Allure TestOps as Code.
+    """
+    logger.debug("===== Starting UI Allure TestOps as Code generation =====")
+    logger.debug("url=%s, html_len=%s", payload.url, len(payload.html or ''))
+
+    # 1. Парсим HTML
+    ui_model = await _analyze_ui(payload)
+    report_progress(0.2, "UI model parsed")
+
+    # 2. Генерируем тест-кейсы
+    requirements_agent = RequirementsAgent()
+    test_suite = await requirements_agent.generate_from_ui_model(ui_model)
+    logger.debug("Generated %s test cases", len(test_suite.cases))
+    report_progress(0.9, f"Generated {len(test_suite.cases)} test cases")
+
+    # 3. Генерируем Allure TestOps as Code
+    allure_generator = AllureCodeGenerator()
+    allure_code = allure_generator.generate_allure_code(test_suite)
+    logger.debug("Allure code generated: %s characters", len(allure_code))
+
+    return {
+        "allure_code": allure_code,
+        "test_count": len(test_suite.cases),
+        "suite_name": test_suite.name,
+        "format": "Allure TestOps as Code",
+        "url": str(payload.url) if payload.url else "from HTML"
+    }
+
+
+async def run_api_test_cases(payload: ApiSpecPayload) -> dict:
+    """
+    OpenAPI/Swagger спецификация (или дефолтная Cloud.ru VMs API) → API тест-кейсы.
+    """
+    logger.debug("===== Starting API test case generation =====")
+    logger.debug("swagger_url=%s", payload.swagger_url)
+    logger.debug("swagger_text length=%s", len(payload.swagger_text or ''))
+    logger.debug("requirements_text=%s", payload.requirements_text)
+
+    requirements_agent = RequirementsAgent()
+
+    if payload.swagger_url or payload.swagger_text:
+        result = await requirements_agent.generate_from_api_spec(
+            swagger_url=payload.swagger_url,
+            swagger_text=payload.swagger_text,
+            requirements_text=payload.requirements_text
+        )
+    else:
+        api_specification = """
 # Cloud.ru Evolution Compute API v3
 
 ## Base Information
@@ -193,125 +315,331 @@ POST /disks/{disk_id}/attach
   "vm_id": "770e8400-e29b-41d4-a716-446655440000"
 }
 """
-            result = await requirements_agent.generate_api_test_cases(
-                api_specification,
-                requirements_text=payload.requirements_text
+        result = await requirements_agent.generate_api_test_cases(
+            api_specification,
+            requirements_text=payload.requirements_text
+        )
+
+    logger.debug("Result: %s test cases generated", len(result.cases))
+
+    response = {
+        "test_suite": result.dict(),
+        "test_count": len(result.cases),
+        "source": payload.swagger_url if payload.swagger_url else (
+            "inline spec" if payload.swagger_text else "default Cloud.ru VMs API")
+    }
+
+    # Отпечаток спецификации для последующей инкрементальной перегенерации (/api/spec-diff)
+    if payload.swagger_url or payload.swagger_text:
+        spec = await requirements_agent.load_api_spec(
+            swagger_url=payload.swagger_url,
+            swagger_text=payload.swagger_text,
+        )
+        response["spec_fingerprint"] = spec["fingerprint"]
+
+    return response
+
+
+async def run_api_spec_diff(payload: ApiSpecDiffPayload) -> dict:
+    """
+    Новая версия спецификации + прошлый сьют → сьют, где перегенерированы
+    только кейсы добавленных и изменённых эндпоинтов.
+    """
+    if not (payload.swagger_url or payload.swagger_text):
+        raise ValueError("Either swagger_url or swagger_text must be provided")
+
+    requirements_agent = RequirementsAgent()
+
+    previous_fingerprint = payload.previous_fingerprint
+    if previous_fingerprint is None:
+        if not (payload.previous_swagger_url or payload.previous_swagger_text):
+            raise ValueError(
+                "Either previous_fingerprint or previous_swagger_url/previous_swagger_text must be provided"
             )
+        previous_spec = await requirements_agent.load_api_spec(
+            swagger_url=payload.previous_swagger_url,
+            swagger_text=payload.previous_swagger_text,
+        )
+        previous_fingerprint = previous_spec["fingerprint"]
+
+    report_progress(0.05, "Comparing specifications")
+    suite, diff, fingerprint = await requirements_agent.regenerate_from_api_spec_diff(
+        previous_suite=payload.previous_suite,
+        previous_fingerprint=previous_fingerprint,
+        swagger_url=payload.swagger_url,
+        swagger_text=payload.swagger_text,
+        requirements_text=payload.requirements_text,
+    )
+
+    previous_ids = {case.id for case in payload.previous_suite.cases}
+    carried_over = sum(1 for case in suite.cases if case.id in previous_ids)
+
+    return {
+        "test_suite": suite.dict(),
+        "test_count": len(suite.cases),
+        "carried_over": carried_over,
+        "generated": len(suite.cases) - carried_over,
+        "diff": diff.to_dict(),
+        "spec_fingerprint": fingerprint,
+        "source": _api_source(payload),
+    }
+
+
+def _api_source(payload: ApiSpecPayload) -> str:
+    return payload.swagger_url if payload.swagger_url else (
+        "inline spec" if payload.swagger_text else "default Cloud.ru VMs API"
+    )
+
+
+async def run_api_allure_code(payload: ApiSpecPayload) -> dict:
+    """
+    OpenAPI/Swagger спецификация → API тест-кейсы → Allure TestOps as Code.
+    """
+    logger.debug("===== Starting API Allure TestOps as Code generation =====")
+    logger.debug("swagger_url=%s", payload.swagger_url)
+    logger.debug("swagger_text length=%s", len(payload.swagger_text or ''))
+
+    requirements_agent = RequirementsAgent()
+
+    # Генерируем тест-кейсы из спецификации
+    if payload.swagger_url or payload.swagger_text:
+        test_suite = await requirements_agent.generate_from_api_spec(
+            swagger_url=payload.swagger_url,
+            swagger_text=payload.swagger_text,
+            requirements_text=payload.requirements_text
+        )
+    else:
+        # Дефолтная спецификация Cloud.ru VMs API
+        test_suite = await requirements_agent.generate_api_test_cases(
+            DEFAULT_VMS_API_SPEC,
+            requirements_text=payload.requirements_text
+        )
 
-        print(f"[DEBUG] Result: {len(result.cases)} test cases generated")
+    logger.debug("Generated %s test cases", len(test_suite.cases))
+    report_progress(0.9, f"Generated {len(test_suite.cases)} test cases")
 
-        return {
-            "test_suite": result.dict(),
-            "test_count": len(result.cases),
-            "source": payload.swagger_url if payload.swagger_url else (
-                "inline spec" if payload.swagger_text else "default Cloud.ru VMs API")
-        }
+    # Генерируем Allure TestOps as Code
+    allure_generator = AllureCodeGenerator()
+    allure_code = allure_generator.generate_allure_code(test_suite)
+    logger.debug("Allure code generated: %s characters", len(allure_code))
+
+    return {
+        "allure_code": allure_code,
+        "test_count": len(test_suite.cases),
+        "suite_name": test_suite.name,
+        "format": "Allure TestOps as Code",
+        "source": _api_source(payload)
+    }
+
+
+async def run_api_automation(payload: ApiSpecPayload) -> dict:
+    """
+    Скачивает Swagger по swagger_url и генерирует pytest тест для каждого эндпоинта.
+    """
+    if not payload.swagger_url:
+        raise ValueError("swagger_url is required")
+
+    swagger_url = payload.swagger_url
+    logger.debug("Downloading Swagger from: %s", swagger_url)
+
+    swagger_data = (await spec_store.fetch(swagger_url)).spec
+
+    schemes = swagger_data.get('schemes', ['https'])
+    host = swagger_data.get('host', '')
+    base_path = swagger_data.get('basePath', '')
+    base_url = f"{schemes[0]}://{host}{base_path}"
+
+    logger.debug("Parsed base_url: %s", base_url)
+    logger.debug("Found %s endpoints", len(swagger_data.get('paths', {})))
+    report_progress(0.1, "Swagger downloaded")
+
+    agent = AutomationAgent()
+    pytest_code = await agent.generate_from_swagger(swagger_data, base_url)
+
+    return {
+        "pytest_code": pytest_code,
+        "test_count": len(swagger_data.get('paths', {})),
+        "base_url": base_url,
+        "swagger_url": swagger_url
+    }
+
+
+@router.post("/ui/full", response_model=CoverageReport)
+async def generate_full_ui_flow(payload: UiSourcePayload):
+    try:
+        return await _coalesced("ui_full", payload, run_full_ui_flow)
 
+    except Exception as exc:
+        logger.exception("Exception in /ui/full: %s", exc)
+        raise HTTPException(status_code=500, detail=str(exc))
+
+
+@router.post("/ui/crawl", response_model=dict)
+async def crawl_ui(payload: UiCrawlPayload):
+    """
+    Обходит приложение от стартового URL и строит UiModel из всех страниц.
+
+    Входные данные:
+    - url: стартовая страница
+    - max_depth: глубина переходов по ссылкам (0 — только стартовая страница)
+    - max_pages: максимум страниц
+
+    Переходит только по ссылкам того же origin, соблюдает robots.txt.
+    """
+    try:
+        return await run_ui_crawl(payload)
+
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        import traceback
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"Failed to generate API test cases: {str(e)}")
+        logger.exception("Failed to crawl: %s", e)
+        raise HTTPException(status_code=500, detail=f"Failed to crawl: {str(e)}")
 
 
-@router.post("/allure-code/api", response_model=dict)
-async def generate_api_allure_code(payload: ApiSpecPayload):
+@router.post("/allure-code/ui", response_model=dict)
+async def generate_ui_allure_code(payload: UiSourcePayload):
     """
-    Генерирует ручные тест-кейсы в формате Allure TestOps as Code для API.
+    Генерирует ручные тест-кейсы в формате Allure TestOps as Code для UI.
 
     Входные данные:
-    - swagger_url: URL на swagger.json/yaml
-    - swagger_text: Текст OpenAPI спецификации
+    - url: URL сайта (например https://cloud.ru/calculator)
+    - html: HTML страницы (опционально)
     - requirements_text: Дополнительные требования
+    - stream: отдавать тест-кейсы через SSE по мере генерации
 
     Выход:
     - Python код в формате Allure TestOps as Code (минимум 15 тест-кейсов)
     """
-    import traceback
     try:
-        print("[DEBUG] ===== Starting API Allure TestOps as Code generation =====")
-        print(f"[DEBUG] swagger_url={payload.swagger_url}")
-        print(f"[DEBUG] swagger_text length={len(payload.swagger_text or '')}")
-
-        requirements_agent = RequirementsAgent()
-
-        # Генерируем тест-кейсы из спецификации
-        if payload.swagger_url or payload.swagger_text:
-            test_suite = await requirements_agent.generate_from_api_spec(
-                swagger_url=payload.swagger_url,
-                swagger_text=payload.swagger_text,
-                requirements_text=payload.requirements_text
+        if payload.stream:
+            ui_model = await _analyze_ui(payload)
+            return _allure_code_event_stream(
+                suite_name=f"Test Suite for {ui_model.pages[0].name}",
+                cases=RequirementsAgent().stream_from_ui_model(ui_model),
+                source=str(payload.url) if payload.url else "from HTML",
             )
-        else:
-            # Дефолтная спецификация Cloud.ru VMs API
-            api_specification = """
-# Cloud.ru Evolution Compute API v3
 
-## Base Information
-- Base URL: https://compute.api.cloud.ru
-- Authentication: Bearer token (userPlaneApiToken in Authorization header)
-- Content-Type: application/json
-- ID Format: All resource IDs must be in UUIDv4 format
+        return await _coalesced("allure_code_ui", payload, run_ui_allure_code)
 
-## API Sections
+    except Exception as e:
+        logger.exception("Failed to generate UI Allure code: %s", e)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to generate Allure code: {str(e)}"
+        )
 
-### 1. Virtual Machines (VMs)
-- GET /vms - Get list of all virtual machines
-- POST /vms - Create new virtual machine (requires: name, flavor_id, image_id)
-- GET /vms/{vm_id} - Get specific VM details by ID
-- PATCH /vms/{vm_id} - Update VM configuration (name, flavor, etc.)
-- DELETE /vms/{vm_id} - Delete virtual machine
-- POST /vms/{vm_id}/start - Start stopped VM
-- POST /vms/{vm_id}/stop - Stop running VM
-- POST /vms/{vm_id}/reboot - Reboot running VM
 
-### 2. Disks
-- GET /disks - Get list of all disks
-- POST /disks - Create new disk (requires: name, size, availability_zone)
-- GET /disks/{disk_id} - Get specific disk details by ID
-- PATCH /disks/{disk_id} - Update disk configuration (name, size)
-- DELETE /disks/{disk_id} - Delete disk (only if not attached to VM)
-- POST /disks/{disk_id}/attach - Attach disk to VM (requires: vm_id in body)
-- POST /disks/{disk_id}/detach - Detach disk from VM
+@router.post("/api/vms", response_model=dict)
+async def generate_api_vm_test_cases(payload: ApiSpecPayload):
+    """
+    Генерирует ручные тест-кейсы для REST API на основе OpenAPI/Swagger спецификации.
 
-### 3. Flavors (Instance Configurations)
-- GET /flavors - Get list of available instance configurations
-- GET /flavors/{flavor_id} - Get specific flavor details (CPU, RAM, disk, network specs)
+    Пользователь может передать:
+    - swagger_url: URL на swagger.json/yaml (например https://compute.api.cloud.ru/swagger.json)
+    - swagger_text: Текст OpenAPI спецификации целиком
+    - requirements_text: Дополнительные требования (необязательно)
 
-## Common Response Codes
-- 200 OK - Successful GET/PATCH/action
-- 201 Created - Successful POST (resource created)
-- 204 No Content - Successful DELETE
-- 400 Bad Request - Invalid request data or parameters
-- 401 Unauthorized - Missing or invalid authentication token
-- 404 Not Found - Resource with specified ID does not exist
-- 409 Conflict - Operation not allowed in current state (e.g., delete attached disk)
-- 500 Internal Server Error - Server-side error
-"""
-            test_suite = await requirements_agent.generate_api_test_cases(
-                api_specification,
-                requirements_text=payload.requirements_text
-            )
+    Если ничего не передано - используется дефолтная спецификация Cloud.ru VMs API.
 
-        print(f"[DEBUG] Generated {len(test_suite.cases)} test cases")
+    Генерирует минимум 15 тест-кейсов с покрытием CRUD, auth, errors.
+    """
 
-        # Генерируем Allure TestOps as Code
-        allure_generator = AllureCodeGenerator()
-        allure_code = allure_generator.generate_allure_code(test_suite)
-        print(f"[DEBUG] Allure code generated: {len(allure_code)} characters")
+    try:
+        return await _coalesced("api_test_cases", payload, run_api_test_cases)
 
-        return {
-            "allure_code": allure_code,
-            "test_count": len(test_suite.cases),
-            "suite_name": test_suite.name,
-            "format": "Allure TestOps as Code",
-            "source": payload.swagger_url if payload.swagger_url else (
-                "inline spec" if payload.swagger_text else "default Cloud.ru VMs API"
+    except Exception as e:
+        logger.exception("Failed to generate API test cases: %s", e)
+        raise HTTPException(status_code=500, detail=f"Failed to generate API test cases: {str(e)}")
+
+
+@router.post("/api/spec-diff", response_model=dict)
+async def regenerate_api_test_cases_from_diff(payload: ApiSpecDiffPayload):
+    """
+    Инкрементально обновляет API тест-кейсы под новую версию спецификации.
+
+    Входные данные:
+    - swagger_url / swagger_text: новая версия спецификации
+    - previous_suite: сьют, сгенерированный по прошлой версии
+    - previous_fingerprint: spec_fingerprint из прошлого ответа /api/vms или /api/spec-diff
+      (либо previous_swagger_url / previous_swagger_text — сама прошлая спецификация)
+
+    Эндпоинты сравниваются по (method, path), параметрам, телу запроса и кодам ответов.
+    В LLM уходят только добавленные и изменённые эндпоинты, кейсы остальных переносятся.
+    """
+
+    try:
+        return await _coalesced("api_spec_diff", payload, run_api_spec_diff)
+
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.exception("Failed to regenerate API test cases: %s", e)
+        raise HTTPException(status_code=500, detail=f"Failed to regenerate API test cases: {str(e)}")
+
+
+@router.post("/allure-code/zip")
+async def download_allure_code_archive(payload: AllureArchivePayload):
+    """
+    ZIP-архив Allure TestOps as Code для готового сьюта, отдаётся потоком.
+
+    shard_by:
+    - feature: модуль на фичу (тег "feature:<имя>", иначе первый тег кейса)
+    - tag: модуль на первый тег кейса
+    - none: один модуль на весь сьют
+
+    Код рендерится и сжимается по тест-методу, архив не собирается в памяти.
+    """
+    suite = payload.test_suite
+    file_name = re.sub(r"[^\w.-]+", "_", suite.name, flags=re.ASCII).strip("_") or "allure_tests"
+    logger.debug("Streaming Allure archive: %s cases, shard_by=%s", len(suite.cases), payload.shard_by)
+
+    return StreamingResponse(
+        AllureCodeGenerator().iter_zip(suite, shard_by=payload.shard_by, owner=payload.owner),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{file_name}.zip"'},
+    )
+
+
+@router.post("/allure-code/api", response_model=dict)
+async def generate_api_allure_code(payload: ApiSpecPayload):
+    """
+    Генерирует ручные тест-кейсы в формате Allure TestOps as Code для API.
+
+    Входные данные:
+    - swagger_url: URL на swagger.json/yaml
+    - swagger_text: Текст OpenAPI спецификации
+    - requirements_text: Дополнительные требования
+    - stream: отдавать тест-кейсы через SSE по мере генерации
+
+    Выход:
+    - Python код в формате Allure TestOps as Code (минимум 15 тест-кейсов)
+    """
+    try:
+        if payload.stream:
+            requirements_agent = RequirementsAgent()
+            if payload.swagger_url or payload.swagger_text:
+                spec = await requirements_agent.load_api_spec(
+                    swagger_url=payload.swagger_url,
+                    swagger_text=payload.swagger_text
+                )
+                return _allure_code_event_stream(
+                    suite_name=f"{spec['title']} API Test Suite",
+                    cases=requirements_agent.stream_from_api_spec(spec, payload.requirements_text),
+                    source=_api_source(payload),
+                )
+            return _allure_code_event_stream(
+                suite_name="Evolution Compute API Test Suite",
+                cases=requirements_agent.stream_api_test_cases(
+                    DEFAULT_VMS_API_SPEC,
+                    requirements_text=payload.requirements_text
+                ),
+                source=_api_source(payload),
             )
-        }
+
+        return await _coalesced("allure_code_api", payload, run_api_allure_code)
 
     except Exception as e:
-        print(f"[ERROR] Failed to generate API Allure code: {e}")
-        traceback.print_exc()
+        logger.exception("Failed to generate API Allure code: %s", e)
         raise HTTPException(
             status_code=500,
             detail=f"Failed to generate Allure code: {str(e)}"
@@ -333,8 +661,7 @@ async def generate_e2e_automation(
             "base_url": base_url
         }
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception("Failed to generate E2E tests: %s", e)
         raise HTTPException(status_code=500, detail=f"Failed to generate E2E tests: {str(e)}")
 
 
@@ -345,41 +672,17 @@ async def generate_api_automation(payload: ApiSpecPayload):
     Парсит реальный Swagger и создаёт тест для КАЖДОГО эндпоинта.
     """
 
-    try:
-        if not payload.swagger_url:
-            raise HTTPException(
-                status_code=400,
-                detail="swagger_url is required"
-            )
-
-        swagger_url = payload.swagger_url
-        print(f"[DEBUG] Downloading Swagger from: {swagger_url}")
-
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            resp = await client.get(swagger_url)
-            resp.raise_for_status()
-            swagger_data = resp.json()
-
-        schemes = swagger_data.get('schemes', ['https'])
-        host = swagger_data.get('host', '')
-        base_path = swagger_data.get('basePath', '')
-        base_url = f"{schemes[0]}://{host}{base_path}"
-
-        print(f"[DEBUG] Parsed base_url: {base_url}")
-        print(f"[DEBUG] Found {len(swagger_data.get('paths', {}))} endpoints")
-
-        agent = AutomationAgent()
-        pytest_code = await agent.generate_from_swagger(swagger_data, base_url)
+    if not payload.swagger_url:
+        raise HTTPException(
+            status_code=400,
+            detail="swagger_url is required"
+        )
 
-        return {
-            "pytest_code": pytest_code,
-            "test_count": len(swagger_data.get('paths', {})),
-            "base_url": base_url,
-            "swagger_url": swagger_url
-        }
+    try:
+        return await _coalesced("api_automation", payload, run_api_automation)
 
     except httpx.HTTPError as e:
         raise HTTPException(status_code=400, detail=f"Failed to fetch Swagger: {str(e)}")
     except Exception as e:
-        traceback.print_exc()
+        logger.exception("Failed to generate API automation: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
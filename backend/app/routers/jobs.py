@@ -0,0 +1,138 @@
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel
+
+from app.jobs import job_manager, QueueFullError
+from app.models import Job
+from app.routers.generation import (
+    UiSourcePayload,
+    UiCrawlPayload,
+    ApiSpecPayload,
+    ApiSpecDiffPayload,
+    run_full_ui_flow,
+    run_ui_allure_code,
+    run_ui_crawl,
+    run_api_test_cases,
+    run_api_spec_diff,
+    run_api_allure_code,
+    run_api_automation,
+)
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+
+class JobSubmitResponse(BaseModel):
+    job_id: str
+    status: str
+
+
+# Обработчики задач: принимают сохранённый payload, возвращают JSON-результат
+
+async def _ui_full_job(payload: dict) -> dict:
+    report = await run_full_ui_flow(UiSourcePayload(**payload))
+    return report.model_dump(mode="json")
+
+
+async def _ui_allure_code_job(payload: dict) -> dict:
+    return await run_ui_allure_code(UiSourcePayload(**payload))
+
+
+async def _ui_crawl_job(payload: dict) -> dict:
+    return await run_ui_crawl(UiCrawlPayload(**payload))
+
+
+async def _api_test_cases_job(payload: dict) -> dict:
+    return await run_api_test_cases(ApiSpecPayload(**payload))
+
+
+async def _api_spec_diff_job(payload: dict) -> dict:
+    return await run_api_spec_diff(ApiSpecDiffPayload(**payload))
+
+
+async def _api_allure_code_job(payload: dict) -> dict:
+    return await run_api_allure_code(ApiSpecPayload(**payload))
+
+
+async def _api_automation_job(payload: dict) -> dict:
+    return await run_api_automation(ApiSpecPayload(**payload))
+
+
+job_manager.register("ui_full", _ui_full_job)
+job_manager.register("allure_code_ui", _ui_allure_code_job)
+job_manager.register("ui_crawl", _ui_crawl_job)
+job_manager.register("api_test_cases", _api_test_cases_job)
+job_manager.register("api_spec_diff", _api_spec_diff_job)
+job_manager.register("allure_code_api", _api_allure_code_job)
+job_manager.register("automation_api", _api_automation_job)
+
+
+async def _submit(kind: str, payload: BaseModel) -> JobSubmitResponse:
+    try:
+        job = await job_manager.submit(kind, payload.model_dump(mode="json", exclude={"stream"}))
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    return JobSubmitResponse(job_id=job.id, status=job.status)
+
+
+@router.post("/generation/ui/full", response_model=JobSubmitResponse, status_code=202)
+async def submit_full_ui_flow(payload: UiSourcePayload):
+    """
+    Ставит в очередь полный UI-пайплайн (аналог /generation/ui/full).
+    Результат — CoverageReport в поле result задачи.
+    """
+    return await _submit("ui_full", payload)
+
+
+@router.post("/generation/allure-code/ui", response_model=JobSubmitResponse, status_code=202)
+async def submit_ui_allure_code(payload: UiSourcePayload):
+    return await _submit("allure_code_ui", payload)
+
+
+@router.post("/generation/ui/crawl", response_model=JobSubmitResponse, status_code=202)
+async def submit_ui_crawl(payload: UiCrawlPayload):
+    return await _submit("ui_crawl", payload)
+
+
+@router.post("/generation/api/vms", response_model=JobSubmitResponse, status_code=202)
+async def submit_api_test_cases(payload: ApiSpecPayload):
+    return await _submit("api_test_cases", payload)
+
+
+@router.post("/generation/api/spec-diff", response_model=JobSubmitResponse, status_code=202)
+async def submit_api_spec_diff(payload: ApiSpecDiffPayload):
+    if not (payload.swagger_url or payload.swagger_text):
+        raise HTTPException(status_code=400, detail="swagger_url or swagger_text is required")
+    return await _submit("api_spec_diff", payload)
+
+
+@router.post("/generation/allure-code/api", response_model=JobSubmitResponse, status_code=202)
+async def submit_api_allure_code(payload: ApiSpecPayload):
+    return await _submit("allure_code_api", payload)
+
+
+@router.post("/generation/automation/api", response_model=JobSubmitResponse, status_code=202)
+async def submit_api_automation(payload: ApiSpecPayload):
+    if not payload.swagger_url:
+        raise HTTPException(status_code=400, detail="swagger_url is required")
+    return await _submit("automation_api", payload)
+
+
+@router.get("/{job_id}", response_model=Job)
+async def get_job(job_id: str):
+    """
+    Статус, прогресс (0.0–1.0) и результат задачи.
+    """
+    job = await job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
+
+
+@router.delete("/{job_id}", response_model=Job)
+async def cancel_job(job_id: str):
+    """
+    Отменяет задачу: из очереди снимается сразу, выполняющаяся прерывается.
+    """
+    job = await job_manager.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
@@ -1,13 +1,24 @@
+import logging
+
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import Optional
 
 from app.models import TestSuite, CoverageReport, TestCase
 from app.agents.coverage_agent import CoverageAgent
+from app.agents.requirements_agent import RequirementsAgent
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/optimization", tags=["optimization"])
 
 
+class ApiCoveragePayload(BaseModel):
+    test_suite: TestSuite
+    swagger_url: Optional[str] = None  # URL на swagger.json/yaml
+    swagger_text: Optional[str] = None  # Или текст спецификации
+
+
 @router.post("/analyze", response_model=CoverageReport)
 async def analyze_suite(test_suite: TestSuite):
     """
@@ -29,9 +40,34 @@ async def analyze_suite(test_suite: TestSuite):
         return report
 
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception("Failed to analyze test suite: %s", e)
         raise HTTPException(
             status_code=500,
             detail=f"Failed to analyze test suite: {str(e)}"
         )
+
+
+@router.post("/api-coverage", response_model=CoverageReport)
+async def analyze_api_coverage(payload: ApiCoveragePayload):
+    """
+    Покрытие API тест-сьюта по OpenAPI спецификации без вызова LLM:
+    - coverage_matrix: эндпоинт × кейс и коды ответов, упомянутые в кейсах
+    - missing_features: эндпоинты и коды ответов без тестов
+    - duplicates: почти-дубликаты (LLM проверяет только пограничные пары)
+    """
+    try:
+        spec = await RequirementsAgent().load_api_spec(
+            swagger_url=payload.swagger_url,
+            swagger_text=payload.swagger_text,
+        )
+        agent = CoverageAgent()
+        return await agent.analyze_api(payload.test_suite, spec["endpoints"])
+
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.exception("Failed to analyze API coverage: %s", e)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to analyze API coverage: {str(e)}"
+        )
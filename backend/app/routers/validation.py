@@ -1,6 +1,10 @@
+from typing import Optional
+
 from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel
 
 from app.agents.validation_agent import ValidationAgent
+from app.agents.validation_rules import ValidationRuleEngine
 from app.models import TestSuite, ValidationReport
 
 router = APIRouter(prefix="/validation", tags=["validation"])
@@ -8,11 +12,42 @@ router = APIRouter(prefix="/validation", tags=["validation"])
 agent = ValidationAgent()
 
 
+class AllureCodePayload(BaseModel):
+    code: str  # Python код в формате Allure TestOps as Code
+
+
 @router.post("/standards", response_model=ValidationReport)
-async def validate_test_suite_standards(suite: TestSuite):
+async def validate_test_suite_standards(
+        suite: TestSuite,
+        semantic: bool = True,
+        batch_size: Optional[int] = None,
+):
+    """
+    Проверяет сьют на соответствие стандартам.
+    Структура проверяется локально; semantic=false — без смысловой проверки через LLM.
+    Сьюты больше batch_size (по умолчанию VALIDATION_BATCH_SIZE) проверяются в LLM
+    параллельными пакетами, частичные отчёты объединяются.
+    """
     try:
-        report = await agent.validate_test_suite(suite)
+        report = await agent.validate_test_suite(suite, semantic=semantic, batch_size=batch_size)
     except Exception as exc:
         raise HTTPException(status_code=502, detail=str(exc))
 
     return report
+
+
+@router.post("/allure-code", response_model=ValidationReport)
+async def validate_allure_code(payload: AllureCodePayload):
+    """
+    Проверяет полноту Allure-декораторов в готовом коде (без LLM).
+    """
+    issues = ValidationRuleEngine().check_allure_code(payload.code)
+    failed = len({issue.test_case_id for issue in issues if issue.severity == "critical"} - {"suite"})
+    total = payload.code.count("def test_")
+    return ValidationReport(
+        total_cases=total,
+        passed=max(0, total - failed),
+        failed=failed,
+        issues=issues,
+        summary=f"Проверено тест-методов: {total}, найдено проблем: {len(issues)}",
+    )
@@ -0,0 +1,98 @@
+import asyncio
+import hashlib
+import json
+import logging
+from typing import Any, Awaitable, Callable, Dict
+
+from pydantic import BaseModel
+
+from app.llm_cache import cache_bypass
+
+logger = logging.getLogger(__name__)
+
+
+def make_flight_key(name: str, payload: BaseModel | dict) -> str:
+    """
+    Ключ запроса: имя операции + sha256 нормализованного payload
+    (ключи отсортированы, пробелы по краям строк убраны). Запрос с обходом
+    кэша LLM (cache_bypass) получает отдельный ключ и не присоединяется
+    к генерации, которая может отдать закэшированные ответы.
+    """
+    if isinstance(payload, BaseModel):
+        payload = payload.model_dump(mode="json")
+    raw = json.dumps(_normalize(payload), sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    if cache_bypass.get():
+        name = f"{name}:no-cache"
+    return f"{name}:{hashlib.sha256(raw.encode('utf-8')).hexdigest()}"
+
+
+def _normalize(value: Any) -> Any:
+    if isinstance(value, str):
+        return value.strip()
+    if isinstance(value, dict):
+        return {key: _normalize(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_normalize(item) for item in value]
+    return value
+
+
+class _Flight:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Склейка одинаковых запросов, выполняющихся одновременно.
+
+    Первый запрос с ключом запускает задачу, остальные ждут её же результат
+    (или исключение). Ожидание идёт через asyncio.shield: отключение одного
+    клиента не отменяет генерацию для остальных. Задача отменяется, только
+    когда ушли все ожидающие. После завершения ключ освобождается —
+    результаты не кэшируются, это делает кэш LLM.
+    """
+
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+
+        self.started = 0
+        self.coalesced = 0
+
+    async def run(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.create_task(func()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+            self.started += 1
+        else:
+            self.coalesced += 1
+            logger.info("Joined in-flight request %s (%s waiting)", key[:48], flight.waiters + 1)
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if flight.waiters == 1 and not flight.task.done():
+                flight.task.cancel()
+                # Пока задача сворачивается, новый запрос с тем же ключом
+                # должен запустить свою, а не получить чужую отмену
+                self._forget(key, flight)
+            raise
+        finally:
+            flight.waiters -= 1
+
+    def _forget(self, key: str, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._flights),
+            "started": self.started,
+            "coalesced": self.coalesced,
+        }
+
+
+single_flight = SingleFlight()
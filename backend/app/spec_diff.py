@@ -0,0 +1,134 @@
+import hashlib
+import json
+from typing import Any, Dict, List
+
+from app.endpoint_index import EndpointIndex, endpoint_key
+from app.models import TestCase
+
+# Методы, по которым строится summary эндпоинтов (_extract_endpoints_summary)
+HTTP_METHODS = ("get", "post", "put", "patch", "delete")
+
+# Документация, а не контракт: правка описаний и примеров не требует перегенерации
+_DOC_FIELDS = frozenset({"summary", "description", "example", "examples", "externalDocs"})
+
+
+def _contract(node: Any, spec: dict, resolving: tuple = ()) -> Any:
+    """
+    Узел спецификации без документационных полей, локальные $ref подставлены
+    (рекурсивная ссылка остаётся строкой).
+    """
+    if isinstance(node, dict):
+        ref = node.get("$ref")
+        if isinstance(ref, str) and ref.startswith("#/"):
+            if ref in resolving:
+                return {"$ref": ref}
+            target: Any = spec
+            for part in ref[2:].split("/"):
+                part = part.replace("~1", "/").replace("~0", "~")
+                target = target.get(part) if isinstance(target, dict) else None
+            if target is None:
+                return {"$ref": ref}
+            return _contract(target, spec, resolving + (ref,))
+        return {key: _contract(value, spec, resolving) for key, value in node.items() if key not in _DOC_FIELDS}
+    if isinstance(node, list):
+        return [_contract(item, spec, resolving) for item in node]
+    return node
+
+
+def _hash(data: Any) -> str:
+    raw = json.dumps(data, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def operation_fingerprint(method: str, path: str, operation: dict, path_item: dict, spec: dict) -> str:
+    """
+    Хэш контракта операции по полной спецификации: все параметры (уровня пути
+    и операции, операция переопределяет по name+in), схема тела запроса
+    и все коды ответов.
+    """
+    parameters = {}
+    for raw in [*(path_item.get("parameters") or []), *(operation.get("parameters") or [])]:
+        parameter = _contract(raw, spec)
+        if isinstance(parameter, dict):
+            parameters[(str(parameter.get("name")), str(parameter.get("in")))] = parameter
+
+    request_body = operation.get("requestBody")
+    data = {
+        "method": method.upper(),
+        "path": path,
+        "parameters": [parameters[key] for key in sorted(parameters)],
+        "request_body": _hash(_contract(request_body, spec)) if request_body is not None else None,
+        "response_codes": sorted(str(code) for code in (operation.get("responses") or {})),
+    }
+    return _hash(data)
+
+
+def spec_fingerprint(spec: dict) -> Dict[str, str]:
+    """
+    Отпечаток спецификации: "METHOD /path" → хэш контракта операции.
+    Его можно сохранить вместо всей спецификации для следующего diff.
+    """
+    fingerprint = {}
+    for path, path_item in (spec.get("paths") or {}).items():
+        if not isinstance(path_item, dict):
+            continue
+        for method, operation in path_item.items():
+            if method.lower() in HTTP_METHODS and isinstance(operation, dict):
+                key = endpoint_key({"method": method, "path": path})
+                fingerprint[key] = operation_fingerprint(method, path, operation, path_item, spec)
+    return fingerprint
+
+
+class SpecDiff:
+    """
+    Разница между двумя версиями спецификации по ключам "METHOD /path".
+    """
+
+    def __init__(self, added: List[str], changed: List[str], removed: List[str], unchanged: List[str]):
+        self.added = added
+        self.changed = changed
+        self.removed = removed
+        self.unchanged = unchanged
+
+    @property
+    def has_changes(self) -> bool:
+        return bool(self.added or self.changed or self.removed)
+
+    def to_dict(self) -> dict:
+        return {
+            "added": self.added,
+            "changed": self.changed,
+            "removed": self.removed,
+            "unchanged_count": len(self.unchanged),
+        }
+
+
+def diff_fingerprints(previous: Dict[str, str], current: Dict[str, str]) -> SpecDiff:
+    added, changed, unchanged = [], [], []
+    for key, fingerprint in current.items():
+        if key not in previous:
+            added.append(key)
+        elif previous[key] != fingerprint:
+            changed.append(key)
+        else:
+            unchanged.append(key)
+    removed = [key for key in previous if key not in current]
+    return SpecDiff(added=added, changed=changed, removed=removed, unchanged=unchanged)
+
+
+def split_cases_by_diff(cases: List[TestCase], diff: SpecDiff) -> tuple[List[TestCase], List[TestCase]]:
+    """
+    Делит кейсы прошлого сьюта на переносимые (затрагивают только неизменённые
+    эндпоинты или ни один не распознан) и устаревшие.
+    """
+    keys = [*diff.unchanged, *diff.changed, *diff.removed]
+    index = EndpointIndex({"method": key.split(" ", 1)[0], "path": key.split(" ", 1)[1]} for key in keys)
+    stale_keys = set(diff.changed) | set(diff.removed)
+
+    carried, stale = [], []
+    for case in cases:
+        if index.match_case(case) & stale_keys:
+            stale.append(case)
+        else:
+            carried.append(case)
+    return carried, stale
@@ -0,0 +1,174 @@
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Optional
+
+import yaml
+
+from app.config import settings
+from app.executor import cpu_executor
+from app.http_client import get_http_client
+from app.metrics import stage_timer
+
+logger = logging.getLogger(__name__)
+
+# C-реализация загрузчика (libyaml), если PyYAML собран с ней
+_YamlLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+class SpecEntry:
+    """
+    Разобранная спецификация: исходный хэш, dict и (лениво) summary и отпечаток эндпоинтов.
+    """
+
+    def __init__(self, content_hash: str, spec: dict, size: int):
+        self.content_hash = content_hash
+        self.spec = spec
+        self.size = size
+        # Заполняются агентом при первом обращении (_extract_endpoints_summary, spec_fingerprint)
+        self.endpoints: Optional[list] = None
+        self.fingerprint: Optional[dict] = None
+
+
+class _UrlMeta:
+    def __init__(self, content_hash: str, etag: Optional[str], last_modified: Optional[str]):
+        self.content_hash = content_hash
+        self.etag = etag
+        self.last_modified = last_modified
+        self.checked_at = time.time()
+
+
+def parse_spec_text(content: str) -> dict:
+    """
+    Парсит OpenAPI спецификацию: сначала как JSON, затем как YAML.
+    """
+    try:
+        spec_dict = json.loads(content)
+        logger.debug("Parsed as JSON")
+    except json.JSONDecodeError:
+        try:
+            spec_dict = yaml.load(content, Loader=_YamlLoader)
+            logger.debug("Parsed as YAML")
+        except yaml.YAMLError as e:
+            raise ValueError(f"Invalid OpenAPI spec format: {e}")
+
+    if not isinstance(spec_dict, dict):
+        raise ValueError(f"Invalid OpenAPI spec format: expected object, got {type(spec_dict).__name__}")
+    return spec_dict
+
+
+class SpecStore:
+    """
+    Кэш OpenAPI спецификаций.
+
+    По URL хранит ETag/Last-Modified и ревалидирует условным GET (304 — без
+    скачивания). По хэшу содержимого хранит разобранный dict, поэтому
+    одинаковая спецификация не парсится повторно. Вытеснение — LRU по
+    суммарному размеру исходных текстов.
+    """
+
+    def __init__(self, max_bytes: int, revalidate_seconds: int):
+        self._max_bytes = max_bytes
+        self._revalidate_seconds = revalidate_seconds
+        self._entries: OrderedDict[str, SpecEntry] = OrderedDict()
+        self._urls: dict[str, _UrlMeta] = {}
+        self._total_bytes = 0
+
+        self.fresh_hits = 0
+        self.not_modified = 0
+        self.downloads = 0
+        self.parse_hits = 0
+        self.parses = 0
+
+    async def fetch(self, url: str) -> SpecEntry:
+        """
+        Возвращает спецификацию по URL, по возможности без скачивания и парсинга.
+        """
+        meta = self._urls.get(url)
+        entry = self._entries.get(meta.content_hash) if meta else None
+
+        if entry is not None:
+            # Недавно проверяли — не ходим в сеть вообще
+            if time.time() - meta.checked_at < self._revalidate_seconds:
+                self._entries.move_to_end(entry.content_hash)
+                self.fresh_hits += 1
+                return entry
+
+        headers = {}
+        if entry is not None:
+            if meta.etag:
+                headers["If-None-Match"] = meta.etag
+            if meta.last_modified:
+                headers["If-Modified-Since"] = meta.last_modified
+
+        client = get_http_client()
+        response = await client.get(url, headers=headers)
+
+        if response.status_code == 304 and entry is not None:
+            meta.checked_at = time.time()
+            self._entries.move_to_end(entry.content_hash)
+            self.not_modified += 1
+            logger.info("Not modified: %s", url)
+            return entry
+
+        response.raise_for_status()
+        self.downloads += 1
+        content = response.text
+        logger.info("Fetched %s bytes from %s", len(content), url)
+
+        entry = await self.load_text(content)
+        self._urls[url] = _UrlMeta(
+            content_hash=entry.content_hash,
+            etag=response.headers.get("etag"),
+            last_modified=response.headers.get("last-modified"),
+        )
+        return entry
+
+    async def load_text(self, content: str) -> SpecEntry:
+        """
+        Возвращает разобранную спецификацию по тексту (повторный текст не парсится).
+        """
+        content_hash = hashlib.sha256(content.encode("utf-8")).hexdigest()
+        entry = self._entries.get(content_hash)
+        if entry is not None:
+            self._entries.move_to_end(content_hash)
+            self.parse_hits += 1
+            return entry
+
+        # Большие спецификации разбираются в пуле процессов, dict возвращается через pickle
+        with stage_timer("spec_parse"):
+            spec_dict = await cpu_executor.run(parse_spec_text, content, size=len(content))
+        self.parses += 1
+
+        entry = SpecEntry(content_hash=content_hash, spec=spec_dict, size=len(content))
+        self._entries[content_hash] = entry
+        self._total_bytes += entry.size
+        self._evict()
+        return entry
+
+    def _evict(self) -> None:
+        # Последнюю добавленную запись не вытесняем, даже если она больше бюджета
+        while self._total_bytes > self._max_bytes and len(self._entries) > 1:
+            content_hash, entry = self._entries.popitem(last=False)
+            self._total_bytes -= entry.size
+            for url in [u for u, m in self._urls.items() if m.content_hash == content_hash]:
+                del self._urls[url]
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._total_bytes,
+            "fresh_hits": self.fresh_hits,
+            "not_modified": self.not_modified,
+            "downloads": self.downloads,
+            "parse_hits": self.parse_hits,
+            "parses": self.parses,
+        }
+
+
+spec_store = SpecStore(
+    max_bytes=settings.spec_store_max_bytes,
+    revalidate_seconds=settings.spec_store_revalidate_seconds,
+)
@@ -0,0 +1,123 @@
+import re
+from typing import Dict, List, Tuple
+
+from app.models import UiElement, UiPage
+
+# Литерал XPath: '...', "..." или concat(...) из них
+_LITERAL = r"""(?:concat\((?:'[^']*'|"[^"]*"|[\s,])*\)|'[^']*'|"[^"]*")"""
+# Текст меняется вместе с контентом (названия товаров, пункты меню) — в форме
+# локатора он не учитывается. Значения id/name/placeholder задаёт разработчик:
+# в них заменяются только числа (item-1, item-2 → item-N)
+_TEXT_PREDICATE_RE = re.compile(
+    r"normalize-space\(\)=" + _LITERAL + r"|starts-with\(normalize-space\(\), " + _LITERAL + r"\)"
+)
+_NUMBER_RE = re.compile(r"\d+")
+
+# Порядок отбора в бюджет: сначала то, с чем пользователь взаимодействует в сценариях
+_ROLE_PRIORITY = {
+    "primary_action": 0,
+    "input": 1,
+    "selector": 2,
+    "dropdown": 3,
+    "action": 4,
+    "navigation": 5,
+    "other": 6,
+}
+
+_EXAMPLE_MAX_CHARS = 40
+
+
+def estimate_tokens(text: str) -> int:
+    # Грубая оценка: ~4 символа на токен
+    return len(text) // 4 + 1
+
+
+def locator_shape(locator: str) -> str:
+    """
+    Форма локатора: текст в предикатах и числа заменены, например
+    //a[normalize-space()='Раздел 3'] → //a[normalize-space()=…], (//a)[12] → (//a)[N].
+    """
+    shape = _TEXT_PREDICATE_RE.sub("normalize-space()=…", locator)
+    return _NUMBER_RE.sub("N", shape)
+
+
+def _is_noise(element: UiElement) -> bool:
+    # Без подписи, текста, id и name (имя по умолчанию "a_element") — проверять нечего
+    return element.name.endswith("_element") and element.locator.startswith("(//")
+
+
+def _element_line(element: UiElement) -> str:
+    return f"- {element.type} '{element.name}' (locator: {element.locator}, role: {element.role})"
+
+
+def _group_line(elements: List[UiElement], examples: int) -> str:
+    first = elements[0]
+    names = []
+    for element in elements:
+        name = element.name[:_EXAMPLE_MAX_CHARS]
+        if name not in names:
+            names.append(name)
+        if len(names) == examples:
+            break
+    return (
+        f"- {first.type} ×{len(elements)} (e.g. {', '.join(repr(n) for n in names)}; "
+        f"locator pattern: {locator_shape(first.locator)}, role: {first.role})"
+    )
+
+
+class CompactPage:
+    def __init__(self, lines: List[str], elements: int, patterns: int, omitted: int, dropped: int):
+        self.lines = lines
+        self.elements = elements
+        self.patterns = patterns
+        self.omitted = omitted  # не поместились в бюджет токенов
+        self.dropped = dropped  # шум: элементы без подписи, текста, id и name
+
+
+def compact_page(page: UiPage, token_budget: int, min_group_size: int, examples: int) -> CompactPage:
+    """
+    Сжимает список элементов страницы для промпта: повторяющиеся элементы
+    (тип, роль, форма локатора) от min_group_size штук схлопываются в одну
+    строку с количеством и примерами, шум отбрасывается, строки отбираются
+    по приоритету роли в пределах token_budget и выводятся в порядке первого
+    появления на странице.
+    Размер результата зависит от числа различных паттернов, а не элементов.
+    """
+    groups: Dict[Tuple[str, str, str], List[UiElement]] = {}
+    dropped = 0
+    for element in page.elements:
+        if _is_noise(element):
+            dropped += 1
+            continue
+        key = (element.type, element.role or "other", locator_shape(element.locator))
+        groups.setdefault(key, []).append(element)
+
+    # (приоритет роли, позиция на странице, строка)
+    candidates: List[Tuple[int, int, str]] = []
+    position = 0
+    for (_, role, _), members in groups.items():
+        if len(members) >= min_group_size:
+            entries = [_group_line(members, examples)]
+        else:
+            entries = [_element_line(element) for element in members]
+        for line in entries:
+            candidates.append((_ROLE_PRIORITY.get(role, len(_ROLE_PRIORITY)), position, line))
+            position += 1
+
+    selected = []
+    used = 0
+    for priority, index, line in sorted(candidates):
+        cost = estimate_tokens(line)
+        if used + cost > token_budget:
+            continue
+        used += cost
+        selected.append((index, line))
+
+    lines = [line for _, line in sorted(selected)]
+    return CompactPage(
+        lines=lines,
+        elements=len(page.elements),
+        patterns=len(candidates),
+        omitted=len(candidates) - len(selected),
+        dropped=dropped,
+    )
@@ -0,0 +1,142 @@
+"""
+Бенчмарк разбора HTML в HtmlAnalysisAgent: полное дерево BeautifulSoup на
+html.parser (как было) против быстрого пути (вырезание шума, потоковый сбор
+интерактивных тегов, lxml при наличии).
+
+Запуск из backend/:
+    python -m benchmarks.html_ingest --size-mb 5 --repeat 3
+"""
+import argparse
+import os
+import random
+import time
+
+# Бенчмарк не ходит в LLM, но app.config требует эти переменные
+os.environ.setdefault("CLOUDRU_API_TOKEN", "benchmark")
+os.environ.setdefault("CLOUDRU_API_URL", "http://localhost")
+
+from bs4 import BeautifulSoup  # noqa: E402
+
+from app.agents.html_agent import HTML_PARSER, INTERACTIVE_TAGS, HtmlAnalysisAgent  # noqa: E402
+
+
+def build_page(size_mb: float, seed: int = 0) -> str:
+    """
+    Синтетическая SPA-страница: крупные инлайн-скрипты и стили, SVG-иконки,
+    глубокая вёрстка и формы, как в больших фикстурах.
+    """
+    rnd = random.Random(seed)
+    target = int(size_mb * 1024 * 1024)
+    head = [
+        "<!DOCTYPE html><html><head><title>Dashboard</title>",
+        "<style>" + "".join(f".c{i}{{color:#{i % 999:03d};margin:{i % 7}px}}" for i in range(5000)) + "</style>",
+        "<script>window.__STATE__=" + ",".join(f'{{"id":{i},"v":"<a href=x>{i}</a>"}}' for i in range(8000)) + ";</script>",
+        "</head><body><div id='app'>",
+    ]
+    parts = head
+    size = sum(len(p) for p in parts)
+    i = 0
+    while size < target:
+        i += 1
+        kind = rnd.random()
+        if kind < 0.3:
+            chunk = (
+                f"<svg class='icon' viewBox='0 0 24 24'><path d='M{i} 0L{i} 24"
+                + "L12 12" * 40 + "'/><title>icon</title></svg>"
+            )
+        elif kind < 0.5:
+            chunk = (
+                f"<form class='f{i}'><label>Field {i}</label>"
+                f"<input type='text' name='field_{i}' placeholder='Value {i}'>"
+                f"<select name='opt_{i}'><option>1</option><option>2</option></select>"
+                f"<button type='submit'><span>Сохранить</span> <b>{i}</b></button></form>"
+            )
+        elif kind < 0.6:
+            # Повторяющиеся ссылки: одинаковый текст и класс у разных пунктов
+            chunk = f"<nav><a href='/p/{i}' class='link c{i % 5}'><span><i>Раздел {i % 20}</i></span></a></nav>"
+        elif kind < 0.7:
+            chunk = "<script>(function(){" + f"var x{i}=" + "1+" * 300 + "1;})();</script>"
+        else:
+            chunk = "<div class='row'>" + "".join(
+                f"<div class='c{rnd.randrange(5000)}'><p>Text {i}-{j} lorem ipsum dolor</p></div>"
+                for j in range(10)
+            ) + "</div>"
+        parts.append(chunk)
+        size += len(chunk)
+    parts.append("</div></body></html>")
+    return "".join(parts)
+
+
+def _legacy_locator(tag, text: str) -> str:
+    # Прежний _generate_locator: без проверки уникальности
+    if tag.get("id"):
+        return f"id='{tag['id']}'"
+    if tag.get("name"):
+        return f"//{tag.name}[@name='{tag['name']}']"
+    if text and tag.name in ["button", "a"]:
+        return f"//{tag.name}[contains(text(), '{text[:30]}')]"
+    if tag.get("placeholder"):
+        return f"//{tag.name}[@placeholder='{tag['placeholder']}']"
+    if tag.get("class"):
+        return f"//{tag.name}[@class='{' '.join(tag['class'])}']"
+    return f"//{tag.name}"
+
+
+def legacy_parse(agent: HtmlAnalysisAgent, html: str) -> list:
+    # Прежний путь: полное дерево html.parser и get_text в каждом хелпере
+    soup = BeautifulSoup(html, "html.parser")
+    elements = []
+    for tag in soup.find_all(INTERACTIVE_TAGS):
+        name = agent._get_element_name(tag, tag.get_text(strip=True))
+        locator = _legacy_locator(tag, tag.get_text(strip=True))
+        role = agent._determine_role(tag, tag.get_text(strip=True))
+        if name and locator:
+            elements.append((agent._get_element_type(tag), name, locator, role))
+    return elements
+
+
+def fast_parse(agent: HtmlAnalysisAgent, html: str) -> list:
+    page = agent.parse_page(html, None)
+    return [(e.type, e.name, e.locator, e.role) for e in page.elements]
+
+
+def timed(fn, repeat: int) -> tuple[float, list]:
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=float, nargs="+", default=[1, 3, 8])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    agent = HtmlAnalysisAgent()
+    print(f"parser backend: {HTML_PARSER}")
+    print(
+        f"{'size':>8} {'elements':>9} {'legacy, s':>10} {'fast, s':>9} {'speedup':>8}"
+        f" {'distinct locators (legacy → new)':>34}"
+    )
+    for size_mb in args.size_mb:
+        html = build_page(size_mb)
+        legacy_time, legacy_elements = timed(lambda: legacy_parse(agent, html), args.repeat)
+        fast_time, fast_elements = timed(lambda: fast_parse(agent, html), args.repeat)
+        # Ссылки внутри SVG быстрый путь намеренно пропускает — в фикстуре таких нет.
+        # Локаторы не сравниваются: новые проверяются на уникальность
+        assert [(t, n, r) for t, n, _, r in legacy_elements] == [(t, n, r) for t, n, _, r in fast_elements], \
+            "fast path changed the extracted elements"
+        unique = len(set(loc for _, _, loc, _ in fast_elements))
+        legacy_unique = len(set(loc for _, _, loc, _ in legacy_elements))
+        print(
+            f"{len(html) / 1024 / 1024:>6.1f}MB {len(fast_elements):>9} "
+            f"{legacy_time:>10.3f} {fast_time:>9.3f} {legacy_time / fast_time:>7.1f}x"
+            f" {f'{legacy_unique} → {unique}':>34}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+"""
+Локальная замена OpenAI-совместимого /chat/completions для бенчмарков.
+
+Ответ выбирается по промпту: сьют тест-кейсов в JSON, анализ покрытия,
+вердикты по дубликатам, отчёт валидации, pytest-код или текст чата.
+Задержка до первого токена, скорость генерации (токенов в секунду, в том
+числе для stream=true) и доля ошибок настраиваются. Для /generation/ui/crawl
+и /generation/automation/api здесь же отдаются страницы сайта и swagger.json.
+
+Запуск из backend/:
+    python -m benchmarks.mock_llm --port 9100 --latency 0.5 --tokens-per-second 300 --error-rate 0.05
+
+Приложение: CLOUDRU_API_URL=http://127.0.0.1:9100/v1
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import time
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, StreamingResponse
+
+# ~4 символа на токен, как в оценках RequirementsAgent
+CHARS_PER_TOKEN = 4
+# Токенов в одном SSE-фрагменте
+STREAM_CHUNK_TOKENS = 4
+
+
+class MockLLMConfig:
+    def __init__(
+            self,
+            latency: float = 0.2,
+            jitter: float = 0.2,
+            tokens_per_second: float = 0.0,
+            cases: int = 15,
+            error_rate: float = 0.0,
+            error_status: int = 429,
+            retry_after: float | None = None,
+            pages: int = 5,
+            seed: int = 0,
+    ):
+        self.latency = latency  # секунды до первого токена
+        self.jitter = jitter  # ± доля latency
+        self.tokens_per_second = tokens_per_second  # 0 — ответ целиком сразу после latency
+        self.cases = cases  # тест-кейсов в каждом сгенерированном сьюте
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self.pages = pages  # страниц сайта для обхода
+        self.seed = seed
+
+
+def _prompt(payload: dict) -> str:
+    return "\n".join(str(message.get("content", "")) for message in payload.get("messages", []))
+
+
+def make_suite(prompt: str, count: int) -> dict:
+    # Заголовки зависят от промпта: кейсы разных шардов не схлопываются дедупликацией
+    digest = hashlib.sha1(prompt.encode("utf-8")).hexdigest()[:6]
+    areas = ["login form", "search filter", "pagination", "profile update", "file upload", "checkout"]
+    return {
+        "name": "Mock Test Suite",
+        "cases": [
+            {
+                "title": f"Verify {areas[i % len(areas)]} scenario {digest}-{i}",
+                "description": f"Checks {areas[i % len(areas)]} behaviour, variant {i}",
+                "steps": [
+                    f"Arrange: Open the page for variant {digest}-{i}",
+                    f"Act: Fill the {areas[i % len(areas)]} with value {i}",
+                    f"Assert: Result {i} is displayed",
+                ],
+                "expected_result": f"Result {i} is displayed without errors",
+                "priority": ["CRITICAL", "HIGH", "NORMAL", "LOW"][i % 4],
+                "tags": ["mock", areas[i % len(areas)].replace(" ", "-"), f"feature:area{i % 3}"],
+            }
+            for i in range(count)
+        ],
+    }
+
+
+def _pytest_code(count: int) -> str:
+    tests = "\n\n".join(
+        f"@allure.title(\"Mock test {i}\")\n"
+        f"async def test_mock_{i}(page):\n"
+        f"    with allure.step(\"Open page\"):\n"
+        f"        await page.goto(BASE_URL)\n"
+        f"    assert await page.title()\n"
+        for i in range(count)
+    )
+    return f"import allure\nimport pytest\n\nBASE_URL = \"http://localhost\"\n\n\n{tests}"
+
+
+def canned_content(payload: dict, config: MockLLMConfig) -> str:
+    """
+    Текст ответа в формате, который ждёт агент, приславший этот промпт.
+    """
+    prompt = _prompt(payload)
+    if '"missing_features"' in prompt:
+        return json.dumps({
+            "duplicates": [],
+            "missing_features": [{"feature": "Password reset", "reason": "Not covered by the suite"}],
+            "suggestions": [{"title": "Add negative cases", "description": "Cover invalid input"}],
+        })
+    if '"pair"' in prompt:
+        return json.dumps({"duplicates": [{"pair": 1, "duplicate": False, "reason": "Different data"}]})
+    if '"issues"' in prompt:
+        return json.dumps({
+            "issues": [{
+                "test_case_id": "TC-001",
+                "test_case_title": "Mock case",
+                "severity": "info",
+                "issue": "Expected result could be more specific",
+                "recommendation": "Name the exact message",
+            }],
+            "summary": "Suite is consistent",
+        }, ensure_ascii=False)
+    if "Python code" in prompt:
+        return _pytest_code(config.cases)
+    if '"cases"' in prompt:
+        return json.dumps(make_suite(prompt, config.cases), ensure_ascii=False)
+    return "Use Arrange-Act-Assert steps and keep each test independent. " * 8
+
+
+def _usage(payload: dict, content: str) -> dict:
+    prompt_tokens = len(_prompt(payload)) // CHARS_PER_TOKEN
+    completion_tokens = max(1, len(content) // CHARS_PER_TOKEN)
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+    }
+
+
+def site_page(index: int, pages: int) -> str:
+    links = "".join(f"<a href='/site/{i}'>Page {i}</a>" for i in range(pages) if i != index)
+    return (
+        f"<!DOCTYPE html><html><head><title>Mock page {index}</title></head><body>"
+        f"<nav>{links}</nav>"
+        f"<form id='form-{index}'><label for='q{index}'>Query</label>"
+        f"<input id='q{index}' name='query' placeholder='Search {index}'>"
+        f"<select name='sort'><option>asc</option><option>desc</option></select>"
+        f"<button type='submit'>Find {index}</button></form>"
+        f"</body></html>"
+    )
+
+
+MOCK_SWAGGER = {
+    "swagger": "2.0",
+    "info": {"title": "Mock API", "version": "1.0"},
+    "host": "api.example.test",
+    "basePath": "/v1",
+    "schemes": ["https"],
+    "paths": {
+        f"/items{suffix}": {
+            "get": {"summary": f"Get items{suffix}", "responses": {"200": {"description": "OK"}}},
+            "post": {
+                "summary": f"Create item{suffix}",
+                "parameters": [{"name": "body", "in": "body", "schema": {"type": "object"}}],
+                "responses": {"201": {"description": "Created"}, "400": {"description": "Bad request"}},
+            },
+        }
+        for suffix in ("", "/{id}", "/{id}/tags", "/search")
+    },
+}
+
+
+def create_app(config: MockLLMConfig) -> FastAPI:
+    app = FastAPI(title="Mock LLM")
+    rnd = random.Random(config.seed)
+    stats = {"requests": 0, "streamed": 0, "errors": 0, "completion_tokens": 0}
+
+    async def first_token_delay() -> None:
+        delay = config.latency * (1 + rnd.uniform(-config.jitter, config.jitter))
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def chat_completions(request: Request):
+        payload = await request.json()
+        stats["requests"] += 1
+
+        if config.error_rate and rnd.random() < config.error_rate:
+            stats["errors"] += 1
+            headers = {}
+            if config.retry_after is not None:
+                headers["Retry-After"] = str(config.retry_after)
+            return JSONResponse(
+                {"error": {"message": "Injected error", "type": "mock_error"}},
+                status_code=config.error_status,
+                headers=headers,
+            )
+
+        content = canned_content(payload, config)
+        usage = _usage(payload, content)
+        stats["completion_tokens"] += usage["completion_tokens"]
+        model = payload.get("model", "mock")
+        created = int(time.time())
+
+        if payload.get("stream"):
+            stats["streamed"] += 1
+            chunk_chars = STREAM_CHUNK_TOKENS * CHARS_PER_TOKEN
+            pause = STREAM_CHUNK_TOKENS / config.tokens_per_second if config.tokens_per_second else 0.0
+
+            async def events():
+                await first_token_delay()
+                for start in range(0, len(content), chunk_chars):
+                    chunk = {
+                        "id": "mock", "object": "chat.completion.chunk", "created": created, "model": model,
+                        "choices": [{"index": 0, "delta": {"content": content[start:start + chunk_chars]}}],
+                    }
+                    yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+                    if pause:
+                        await asyncio.sleep(pause)
+                final = {
+                    "id": "mock", "object": "chat.completion.chunk", "created": created, "model": model,
+                    "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}], "usage": usage,
+                }
+                yield f"data: {json.dumps(final)}\n\n"
+                yield "data: [DONE]\n\n"
+
+            return StreamingResponse(events(), media_type="text/event-stream")
+
+        await first_token_delay()
+        if config.tokens_per_second:
+            await asyncio.sleep(usage["completion_tokens"] / config.tokens_per_second)
+        return {
+            "id": "mock",
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": usage,
+        }
+
+    # CLOUDRU_API_URL может указывать и на корень, и на /v1
+    app.add_api_route("/v1/chat/completions", chat_completions, methods=["POST"])
+    app.add_api_route("/chat/completions", chat_completions, methods=["POST"])
+
+    @app.get("/stats")
+    async def get_stats():
+        return stats
+
+    @app.get("/swagger.json")
+    async def swagger():
+        return MOCK_SWAGGER
+
+    @app.get("/robots.txt", response_class=PlainTextResponse)
+    async def robots():
+        return "User-agent: *\nAllow: /\n"
+
+    @app.get("/site/{index}", response_class=HTMLResponse)
+    async def get_site_page(index: int):
+        return site_page(index, config.pages)
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds to first token")
+    parser.add_argument("--jitter", type=float, default=0.2, help="± fraction of latency")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="0 — no generation delay")
+    parser.add_argument("--cases", type=int, default=15, help="test cases per generated suite")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=429)
+    parser.add_argument("--retry-after", type=float, default=None)
+    parser.add_argument("--pages", type=int, default=5, help="pages of the crawlable /site")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    config = MockLLMConfig(
+        latency=args.latency,
+        jitter=args.jitter,
+        tokens_per_second=args.tokens_per_second,
+        cases=args.cases,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        retry_after=args.retry_after,
+        pages=args.pages,
+        seed=args.seed,
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
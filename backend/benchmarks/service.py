@@ -0,0 +1,436 @@
+"""
+Нагрузочный бенчмарк роутеров на локальной замене LLM (benchmarks.mock_llm).
+
+Поднимает mock LLM и приложение (uvicorn) отдельными процессами и для каждого
+сценария и уровня параллельности гоняет закрытый цикл: concurrency клиентов
+шлют запросы, пока не наберётся --requests. Считаются пропускная способность,
+p50/p95/p99 полного ответа и первого байта, ошибки, вызовы LLM на запрос
+и пиковый RSS процесса приложения. Payload каждого запроса уникален, чтобы
+single-flight не склеивал запросы (кэш ответов LLM выключен).
+
+Результаты сохраняются в benchmarks/results/<время>.json; --compare сравнивает
+с прошлым прогоном.
+
+Запуск из backend/:
+    python -m benchmarks.service --concurrency 1 8 32 --requests 64
+    python -m benchmarks.service --scenario chat.completions validation.standards --latency 1 --error-rate 0.1
+    python -m benchmarks.service --compare benchmarks/results/20261017-120000.json
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+
+import httpx
+
+from benchmarks.mock_llm import MOCK_SWAGGER, make_suite, site_page
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(BACKEND_DIR, "benchmarks", "results")
+
+
+class Scenario:
+    """
+    build(seq, mock_url) → аргументы httpx (json, params) для запроса номер seq.
+    """
+
+    def __init__(self, name: str, path: str, build: Callable[[int, str], dict], method: str = "POST"):
+        self.name = name
+        self.path = path
+        self.build = build
+        self.method = method
+
+
+def _spec_text(extra_path: bool = False) -> str:
+    spec = json.loads(json.dumps(MOCK_SWAGGER))
+    if extra_path:
+        spec["paths"]["/orders"] = {"get": {"summary": "List orders", "responses": {"200": {"description": "OK"}}}}
+    return json.dumps(spec)
+
+
+def _suite_json(seq: int, cases: int = 15) -> dict:
+    return make_suite(f"benchmark-{seq}", cases)
+
+
+SPEC_TEXT = _spec_text()
+SPEC_TEXT_V2 = _spec_text(extra_path=True)
+PAGE_HTML = site_page(0, 5)
+
+SCENARIOS: List[Scenario] = [
+    Scenario("generation.ui_full", "/generation/ui/full", lambda seq, mock: {
+        "json": {"html": PAGE_HTML, "requirements_text": f"run {seq}"},
+    }),
+    Scenario("generation.ui_crawl", "/generation/ui/crawl", lambda seq, mock: {
+        "json": {"url": f"{mock}/site/0?run={seq}", "max_depth": 1, "max_pages": 5},
+    }),
+    Scenario("generation.allure_ui", "/generation/allure-code/ui", lambda seq, mock: {
+        "json": {"html": PAGE_HTML, "requirements_text": f"run {seq}"},
+    }),
+    Scenario("generation.allure_ui_stream", "/generation/allure-code/ui", lambda seq, mock: {
+        "json": {"html": PAGE_HTML, "requirements_text": f"run {seq}", "stream": True},
+    }),
+    Scenario("generation.api_vms", "/generation/api/vms", lambda seq, mock: {
+        "json": {"swagger_text": SPEC_TEXT, "requirements_text": f"run {seq}"},
+    }),
+    Scenario("generation.api_spec_diff", "/generation/api/spec-diff", lambda seq, mock: {
+        "json": {
+            "swagger_text": SPEC_TEXT_V2,
+            "previous_swagger_text": SPEC_TEXT,
+            "previous_suite": _suite_json(seq),
+            "requirements_text": f"run {seq}",
+        },
+    }),
+    Scenario("generation.allure_api", "/generation/allure-code/api", lambda seq, mock: {
+        "json": {"swagger_text": SPEC_TEXT, "requirements_text": f"run {seq}"},
+    }),
+    Scenario("generation.allure_api_stream", "/generation/allure-code/api", lambda seq, mock: {
+        "json": {"swagger_text": SPEC_TEXT, "requirements_text": f"run {seq}", "stream": True},
+    }),
+    Scenario("generation.allure_zip", "/generation/allure-code/zip", lambda seq, mock: {
+        "json": {"test_suite": _suite_json(seq, cases=200)},
+    }),
+    Scenario("generation.automation_e2e", "/generation/automation/e2e", lambda seq, mock: {
+        "json": _suite_json(seq), "params": {"base_url": "https://app.example.test"},
+    }),
+    Scenario("generation.automation_api", "/generation/automation/api", lambda seq, mock: {
+        "json": {"swagger_url": f"{mock}/swagger.json", "requirements_text": f"run {seq}"},
+    }),
+    Scenario("validation.standards", "/validation/standards", lambda seq, mock: {
+        "json": _suite_json(seq),
+    }),
+    Scenario("optimization.analyze", "/optimization/analyze", lambda seq, mock: {
+        "json": _suite_json(seq),
+    }),
+    Scenario("chat.completions", "/chat/completions", lambda seq, mock: {
+        "json": {"messages": [{"role": "user", "content": f"How to test pagination? ({seq})"}]},
+    }),
+    Scenario("chat.completions_stream", "/chat/completions", lambda seq, mock: {
+        "json": {"messages": [{"role": "user", "content": f"How to test pagination? ({seq})"}], "stream": True},
+    }),
+]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _rss_mb(pid: int) -> Optional[float]:
+    # Linux: VmRSS из /proc; на других ОС RSS не меряется
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+
+def _percentile(ordered: List[float], percent: float) -> Optional[float]:
+    if not ordered:
+        return None
+    # Nearest rank
+    index = min(len(ordered) - 1, max(0, math.ceil(percent / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, timeout=10,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+class _Process:
+    """
+    Дочерний процесс с логом во временном файле (хвост лога печатается, если он не поднялся).
+    """
+
+    def __init__(self, name: str, args: List[str], env: Dict[str, str], log_dir: str):
+        self.name = name
+        self._log_path = os.path.join(log_dir, f"{name}.log")
+        self._log = open(self._log_path, "w")
+        self.popen = subprocess.Popen(args, cwd=BACKEND_DIR, env=env, stdout=self._log, stderr=subprocess.STDOUT)
+
+    @property
+    def pid(self) -> int:
+        return self.popen.pid
+
+    async def wait_ready(self, url: str, timeout: float = 30.0) -> None:
+        deadline = time.monotonic() + timeout
+        async with httpx.AsyncClient() as client:
+            while time.monotonic() < deadline:
+                if self.popen.poll() is not None:
+                    break
+                try:
+                    if (await client.get(url)).status_code == 200:
+                        return
+                except httpx.HTTPError:
+                    pass
+                await asyncio.sleep(0.2)
+        with open(self._log_path) as log:
+            tail = log.read()[-2000:]
+        raise RuntimeError(f"{self.name} did not start ({url}):\n{tail}")
+
+    def stop(self) -> None:
+        if self.popen.poll() is None:
+            self.popen.terminate()
+            try:
+                self.popen.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.popen.kill()
+        self._log.close()
+
+
+async def _one(client: httpx.AsyncClient, scenario: Scenario, seq: int, mock_url: str) -> dict:
+    started = time.perf_counter()
+    ttfb = None
+    try:
+        async with client.stream(scenario.method, scenario.path, **scenario.build(seq, mock_url)) as response:
+            ttfb = time.perf_counter() - started
+            async for _ in response.aiter_bytes():
+                pass
+            status = response.status_code
+    except httpx.HTTPError:
+        status = 0
+    return {"status": status, "latency": time.perf_counter() - started, "ttfb": ttfb}
+
+
+async def _run_level(
+        client: httpx.AsyncClient,
+        mock: httpx.AsyncClient,
+        scenario: Scenario,
+        concurrency: int,
+        total: int,
+        app_pid: int,
+        mock_url: str,
+        seq: itertools.count,
+) -> dict:
+    results: List[dict] = []
+    issued = itertools.count()
+    peak_rss = [_rss_mb(app_pid)]
+
+    async def worker():
+        while next(issued) < total:
+            results.append(await _one(client, scenario, next(seq), mock_url))
+
+    async def sample_rss():
+        while True:
+            rss = _rss_mb(app_pid)
+            if rss is not None:
+                peak_rss[0] = max(peak_rss[0] or 0.0, rss)
+            await asyncio.sleep(0.05)
+
+    llm_before = (await mock.get("/stats")).json()
+    sampler = asyncio.create_task(sample_rss())
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    finally:
+        sampler.cancel()
+    elapsed = time.perf_counter() - started
+    llm_after = (await mock.get("/stats")).json()
+
+    ok = [r for r in results if 200 <= r["status"] < 300]
+    latencies = sorted(r["latency"] for r in ok)
+    ttfbs = sorted(r["ttfb"] for r in ok if r["ttfb"] is not None)
+
+    def ms(value: Optional[float]) -> Optional[float]:
+        return round(value * 1000, 1) if value is not None else None
+
+    return {
+        "scenario": scenario.name,
+        "concurrency": concurrency,
+        "requests": len(results),
+        "errors": len(results) - len(ok),
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_rps": round(len(ok) / elapsed, 2) if elapsed else None,
+        "latency_ms": {f"p{p}": ms(_percentile(latencies, p)) for p in (50, 95, 99)},
+        "ttfb_ms": {f"p{p}": ms(_percentile(ttfbs, p)) for p in (50, 95, 99)},
+        "llm_calls_per_request": round((llm_after["requests"] - llm_before["requests"]) / len(results), 2)
+        if results else None,
+        "llm_errors": llm_after["errors"] - llm_before["errors"],
+        "peak_rss_mb": round(peak_rss[0], 1) if peak_rss[0] is not None else None,
+    }
+
+
+def _print_row(row: dict) -> None:
+    latency, ttfb = row["latency_ms"], row["ttfb_ms"]
+    print(
+        f"{row['scenario']:<30} {row['concurrency']:>4} {row['requests']:>5} {row['errors']:>4}"
+        f" {row['throughput_rps'] or 0:>8.2f}"
+        f" {latency['p50'] or 0:>9.1f} {latency['p95'] or 0:>9.1f} {latency['p99'] or 0:>9.1f}"
+        f" {ttfb['p50'] or 0:>9.1f} {row['llm_calls_per_request'] or 0:>6.2f}"
+        f" {row['peak_rss_mb'] or 0:>8.1f}"
+    )
+
+
+def _print_header() -> None:
+    print(
+        f"{'scenario':<30} {'conc':>4} {'reqs':>5} {'err':>4} {'rps':>8}"
+        f" {'p50, ms':>9} {'p95, ms':>9} {'p99, ms':>9} {'ttfb p50':>9} {'llm/rq':>6} {'rss, MB':>8}"
+    )
+
+
+def _change(old: Optional[float], new: Optional[float]) -> str:
+    if not old or new is None:
+        return f"{'—':>8}"
+    return f"{(new - old) / old * 100:>+7.1f}%"
+
+
+def compare(previous_path: str, rows: List[dict]) -> None:
+    """
+    Печатает изменение rps, p95 и пикового RSS относительно прошлого прогона.
+    """
+    with open(previous_path, encoding="utf-8") as file:
+        previous = json.load(file)
+    baseline = {(row["scenario"], row["concurrency"]): row for row in previous["results"]}
+
+    print(f"\ncompared with {previous_path} (revision {previous['meta'].get('git_revision')}):")
+    print(f"{'scenario':<30} {'conc':>4} {'rps':>8} {'p95':>8} {'p99':>8} {'rss':>8}")
+    for row in rows:
+        old = baseline.get((row["scenario"], row["concurrency"]))
+        if old is None:
+            continue
+        print(
+            f"{row['scenario']:<30} {row['concurrency']:>4}"
+            f" {_change(old['throughput_rps'], row['throughput_rps'])}"
+            f" {_change(old['latency_ms']['p95'], row['latency_ms']['p95'])}"
+            f" {_change(old['latency_ms']['p99'], row['latency_ms']['p99'])}"
+            f" {_change(old['peak_rss_mb'], row['peak_rss_mb'])}"
+        )
+
+
+async def run(args: argparse.Namespace) -> dict:
+    scenarios = [s for s in SCENARIOS if not args.scenario or s.name in args.scenario]
+    unknown = set(args.scenario or ()) - {s.name for s in SCENARIOS}
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    mock_port, app_port = _free_port(), _free_port()
+    mock_url = f"http://127.0.0.1:{mock_port}"
+    app_url = f"http://127.0.0.1:{app_port}"
+
+    mock_args = [
+        "--port", str(mock_port),
+        "--latency", str(args.latency),
+        "--tokens-per-second", str(args.tokens_per_second),
+        "--cases", str(args.cases),
+        "--error-rate", str(args.error_rate),
+        "--error-status", str(args.error_status),
+    ]
+    if args.retry_after is not None:
+        mock_args += ["--retry-after", str(args.retry_after)]
+
+    with tempfile.TemporaryDirectory(prefix="testops-bench-") as tmp:
+        env = {
+            **os.environ,
+            "CLOUDRU_API_URL": f"{mock_url}/v1",
+            "CLOUDRU_API_TOKEN": "benchmark",
+            "LLM_CACHE_ENABLED": "false",
+            "JOBS_DB_PATH": os.path.join(tmp, "jobs.sqlite3"),
+            "LOG_LEVEL": "WARNING",
+            "TRACE_PATH": "",
+        }
+        mock_process = _Process("mock_llm", [sys.executable, "-m", "benchmarks.mock_llm", *mock_args], env, tmp)
+        app_process = _Process(
+            "app",
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(app_port), "--log-level", "warning"],
+            env,
+            tmp,
+        )
+        rows: List[dict] = []
+        try:
+            await mock_process.wait_ready(f"{mock_url}/stats")
+            await app_process.wait_ready(f"{app_url}/health")
+
+            limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+            async with httpx.AsyncClient(base_url=app_url, timeout=args.timeout, limits=limits) as client, \
+                    httpx.AsyncClient(base_url=mock_url) as mock:
+                seq = itertools.count()
+                _print_header()
+                for scenario in scenarios:
+                    for _ in range(args.warmup):
+                        await _one(client, scenario, next(seq), mock_url)
+                    for concurrency in args.concurrency:
+                        row = await _run_level(
+                            client, mock, scenario, concurrency, args.requests, app_process.pid, mock_url, seq,
+                        )
+                        rows.append(row)
+                        _print_row(row)
+        finally:
+            app_process.stop()
+            mock_process.stop()
+
+    return {
+        "meta": {
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "git_revision": _git_revision(),
+            "label": args.label,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "requests_per_level": args.requests,
+            "mock_llm": {
+                "latency": args.latency,
+                "tokens_per_second": args.tokens_per_second,
+                "cases": args.cases,
+                "error_rate": args.error_rate,
+                "error_status": args.error_status,
+                "retry_after": args.retry_after,
+            },
+        },
+        "results": rows,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", nargs="+", help="default: all (see --list)")
+    parser.add_argument("--list", action="store_true", help="print scenario names and exit")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=64, help="requests per scenario and concurrency level")
+    parser.add_argument("--warmup", type=int, default=1, help="unmeasured requests per scenario")
+    parser.add_argument("--timeout", type=float, default=600.0)
+    parser.add_argument("--latency", type=float, default=0.2, help="mock LLM: seconds to first token")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="mock LLM: 0 — no generation delay")
+    parser.add_argument("--cases", type=int, default=15, help="mock LLM: test cases per suite")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="mock LLM: share of failed calls")
+    parser.add_argument("--error-status", type=int, default=429)
+    parser.add_argument("--retry-after", type=float, default=None)
+    parser.add_argument("--label", default="", help="stored in the result file")
+    parser.add_argument("--output", help=f"result file (default: {os.path.relpath(RESULTS_DIR, BACKEND_DIR)}/<time>.json)")
+    parser.add_argument("--compare", help="previous result file")
+    args = parser.parse_args()
+
+    if args.list:
+        for scenario in SCENARIOS:
+            print(f"{scenario.name:<30} {scenario.method} {scenario.path}")
+        return
+
+    report = asyncio.run(run(args))
+
+    output = args.output or os.path.join(RESULTS_DIR, time.strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as file:
+        json.dump(report, file, ensure_ascii=False, indent=2)
+    print(f"\nsaved to {output}")
+
+    if args.compare:
+        compare(args.compare, report["results"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+import os
+
+# app.config требует токен LLM; тесты в сеть не ходят
+os.environ.setdefault("CLOUDRU_API_TOKEN", "test")
+os.environ.setdefault("LLM_CACHE_ENABLED", "false")
@@ -0,0 +1,58 @@
+import asyncio
+import json
+
+import httpx
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app import llm_client
+from app.metrics import LLM_TOKENS_TOTAL
+from app.routers import chat
+
+PROVIDER_CHUNKS = [
+    {"id": "c1", "object": "chat.completion.chunk", "model": "m", "choices": [{"index": 0, "delta": {"role": "assistant"}}]},
+    {"id": "c1", "object": "chat.completion.chunk", "model": "m", "choices": [{"index": 0, "delta": {"content": "Hi"}}]},
+    {"id": "c1", "object": "chat.completion.chunk", "model": "m",
+     "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+     "usage": {"prompt_tokens": 5, "completion_tokens": 1}},
+]
+PROVIDER_LINES = [f"data: {json.dumps(chunk)}" for chunk in PROVIDER_CHUNKS] + ["data: [DONE]"]
+
+
+def _provider(monkeypatch) -> list:
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(json.loads(request.content))
+        body = ": keep-alive\n\n" + "".join(f"{line}\n\n" for line in PROVIDER_LINES)
+        return httpx.Response(200, text=body, headers={"Content-Type": "text/event-stream"})
+
+    client = httpx.AsyncClient(base_url="http://llm", transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(llm_client, "_client", client)
+    return requests
+
+
+def test_stream_is_forwarded_unchanged(monkeypatch):
+    requests = _provider(monkeypatch)
+    completion_tokens = LLM_TOKENS_TOTAL._values.get(("m", "completion"), 0.0)
+    app = FastAPI()
+    app.include_router(chat.router)
+
+    with TestClient(app) as client:
+        response = client.post("/chat/completions", json={"messages": [{"role": "user", "content": "hello"}], "stream": True})
+
+    events = [line for line in response.text.split("\n\n") if line]
+    # id, model, role и finish_reason провайдера сохраняются, комментарии SSE отбрасываются
+    assert events == PROVIDER_LINES
+    assert requests[0]["stream"] is True
+    # usage из последнего фрагмента учитывается по пути
+    assert LLM_TOKENS_TOTAL._values[("m", "completion")] == completion_tokens + 1
+
+
+def test_stream_chat_completion_yields_text(monkeypatch):
+    _provider(monkeypatch)
+
+    async def collect():
+        return [content async for content in llm_client.stream_chat_completion({"model": "m", "messages": []})]
+
+    assert asyncio.run(collect()) == ["Hi"]
@@ -0,0 +1,60 @@
+import asyncio
+import json
+
+from app.agents import coverage_agent
+from app.agents.coverage_agent import CoverageAgent
+from app import models
+
+WORDS = "login search filter payment export import profile billing report upload".split()
+
+
+def _suite(size: int) -> models.TestSuite:
+    return models.TestSuite(name="Suite", cases=[
+        models.TestCase(
+            title=f"Verify {WORDS[i % 10]} {WORDS[i // 10 % 10]} {WORDS[i // 100 % 10]} case {i}",
+            description=f"Long description of scenario {i} " * 10,
+            steps=[f"Act: step {i}"],
+            expected_result="ok",
+            tags=["ui", WORDS[i % 10]],
+        )
+        for i in range(size)
+    ])
+
+
+def _prompt_for(suite: models.TestSuite, monkeypatch) -> str:
+    prompts = []
+
+    async def fake_chat_completion(payload: dict, use_cache: bool = True) -> dict:
+        prompts.append(payload["messages"][-1]["content"])
+        content = json.dumps({"duplicates": [], "missing_features": [], "suggestions": []})
+        return {"choices": [{"message": {"content": content}}]}
+
+    monkeypatch.setattr(coverage_agent, "chat_completion", fake_chat_completion)
+    asyncio.run(CoverageAgent().analyze(suite))
+    # Последний вызов — анализ пробелов (до него могут быть пакеты пограничных пар)
+    return prompts[-1]
+
+
+def test_small_suite_is_sent_in_full(monkeypatch):
+    prompt = _prompt_for(_suite(10), monkeypatch)
+    assert "Long description of scenario 9" in prompt
+
+
+def test_large_suite_prompt_does_not_grow_with_suite(monkeypatch):
+    medium = _prompt_for(_suite(1000), monkeypatch)
+    large = _prompt_for(_suite(5000), monkeypatch)
+
+    assert "Long description" not in large
+    assert "Tags: ui 5000" in large
+    assert "4800 more test cases omitted" in large
+    assert len(large) < len(medium) * 1.1
+
+
+def test_attached_count_is_number_of_generated_tests():
+    report = models.CoverageReport(
+        covered_features=[], missing_features=[], duplicates=[],
+        summary=f"Test Suite Analysis:\n{coverage_agent.AUTOMATED_TESTS_LINE.format(count=0)}\n",
+    )
+    code = "import pytest\n\n\ndef test_login(page):\n    pass\n\n\nasync def test_search(page):\n    pass\n"
+    CoverageAgent().attach_automated_tests(report, code)
+    assert coverage_agent.AUTOMATED_TESTS_LINE.format(count=2) in report.summary
@@ -0,0 +1,50 @@
+import asyncio
+import re
+
+import httpx
+
+from app import crawler
+from app.crawler import SiteCrawler, normalize_url
+from app.models import UiPage
+
+LINKS = ["/ok-1", "/bad-1", "/bad-2", "/bad-3", "/ok-2"]
+
+
+def _handler(request: httpx.Request) -> httpx.Response:
+    path = request.url.path
+    if path == "/robots.txt":
+        return httpx.Response(404)
+    if path.startswith("/bad"):
+        # Не HTTPError: раньше такое исключение завершало воркер
+        raise httpx.InvalidURL(f"Invalid URL: {request.url}")
+    links = "".join(f"<a href='{link}'>{link}</a>" for link in LINKS) if path == "/" else ""
+    return httpx.Response(200, html=f"<html><title>{path}</title><body>{links}</body></html>")
+
+
+async def _parse_page(html: str, url: str):
+    return UiPage(url=url, name=url), re.findall(r"href='([^']+)'", html)
+
+
+def test_worker_survives_unexpected_errors(monkeypatch):
+    client = httpx.AsyncClient(transport=httpx.MockTransport(_handler))
+    monkeypatch.setattr(crawler, "get_http_client", lambda: client)
+    site_crawler = SiteCrawler(_parse_page, max_depth=1, max_pages=10, concurrency=2, user_agent="test")
+
+    async def scenario():
+        try:
+            return await asyncio.wait_for(site_crawler.crawl("https://example.test/"), timeout=5)
+        finally:
+            await client.aclose()
+
+    result = asyncio.run(scenario())
+    assert [page.url for page in result.pages] == [
+        "https://example.test/", "https://example.test/ok-1", "https://example.test/ok-2",
+    ]
+    assert sorted(result.errors) == [f"https://example.test/bad-{i}" for i in (1, 2, 3)]
+    assert all(error.startswith("InvalidURL") for error in result.errors.values())
+
+
+def test_normalize_url():
+    assert normalize_url("HTTPS://Example.test:443/a/../b?z=1&a=2#frag") == "https://example.test/b?a=2&z=1"
+    assert normalize_url("/c", base="https://example.test/a/") == "https://example.test/c"
+    assert normalize_url("mailto:qa@example.test") is None
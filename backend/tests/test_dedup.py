@@ -0,0 +1,103 @@
+import itertools
+import random
+
+import pytest
+
+from app import models
+from app.dedup import MinHashDeduplicator, case_shingles, minhash_signature
+
+WORDS = (
+    "open login page enter valid email password click submit button verify dashboard shows user name "
+    "search filter results table sort column price ascending descending upload avatar file profile "
+    "settings save changes notification appears cart checkout payment card address delivery order"
+).split()
+
+
+def _case(rnd: random.Random, steps: int = 6) -> models.TestCase:
+    return models.TestCase(
+        title=" ".join(rnd.choices(WORDS, k=6)),
+        description=" ".join(rnd.choices(WORDS, k=10)),
+        steps=[" ".join(rnd.choices(WORDS, k=8)) for _ in range(steps)],
+        expected_result="ok",
+    )
+
+
+def _near_copy(case: models.TestCase) -> models.TestCase:
+    # Одно слово в последнем шаге — меняются три триграммы из ~70
+    steps = [*case.steps[:-1], case.steps[-1] + " twice"]
+    return case.model_copy(update={"steps": steps})
+
+
+def _jaccard(a: models.TestCase, b: models.TestCase) -> float:
+    x, y = case_shingles(a), case_shingles(b)
+    return len(x & y) / len(x | y)
+
+
+def test_recall_on_near_duplicates():
+    rnd = random.Random(7)
+    originals = [_case(rnd) for _ in range(40)]
+    cases = originals + [_near_copy(case) for case in originals]
+    rnd.shuffle(cases)
+
+    threshold = 0.8
+    expected = {
+        (i, j) for i, j in itertools.combinations(range(len(cases)), 2)
+        if _jaccard(cases[i], cases[j]) >= threshold
+    }
+    assert len(expected) == len(originals)
+
+    found = MinHashDeduplicator().find_duplicates(cases, threshold)
+    assert {(c.left, c.right) for c in found} == expected
+    for candidate in found:
+        assert candidate.similarity == round(_jaccard(cases[candidate.left], cases[candidate.right]), 4)
+
+
+def test_results_sorted_by_similarity():
+    rnd = random.Random(1)
+    base = _case(rnd)
+    closer = _near_copy(base)
+    further = _near_copy(closer).model_copy(update={"title": base.title + " again"})
+    found = MinHashDeduplicator().find_duplicates([base, closer, further], 0.5)
+    similarities = [c.similarity for c in found]
+    assert similarities == sorted(similarities, reverse=True)
+    assert (found[0].left, found[0].right) == (0, 1)
+
+
+def test_unrelated_cases_are_not_reported():
+    rnd = random.Random(3)
+    cases = [_case(rnd) for _ in range(50)]
+    assert MinHashDeduplicator().find_duplicates(cases, 0.5) == []
+
+
+def test_large_bucket_is_chained():
+    rnd = random.Random(5)
+    case = _case(rnd)
+    cases = [case] * 100
+    found = MinHashDeduplicator().find_duplicates(cases, 0.9)
+    pairs = {(c.left, c.right) for c in found}
+    # Не все 4950 пар, но каждый кейс связан со следующим
+    assert {(i, i + 1) for i in range(99)} <= pairs
+    assert len(pairs) < 4950
+
+
+def test_empty_cases_are_ignored():
+    empty = models.TestCase(title="", description="", steps=[], expected_result="")
+    assert case_shingles(empty) == set()
+    assert MinHashDeduplicator().find_duplicates([empty, empty], 0.0) == []
+
+
+def test_short_text_has_single_shingle():
+    case = models.TestCase(title="Login", description="works", steps=[], expected_result="")
+    assert len(case_shingles(case)) == 1
+
+
+def test_signature_densification_fills_every_bin():
+    signature = minhash_signature({1, 2, 3}, 64)
+    assert len(signature) == 64
+    assert len(set(signature)) == 64
+
+
+@pytest.mark.parametrize("num_bins, bands", [(48, 16), (64, 10)])
+def test_invalid_parameters(num_bins, bands):
+    with pytest.raises(ValueError):
+        MinHashDeduplicator(num_bins, bands)
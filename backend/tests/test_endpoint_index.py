@@ -0,0 +1,72 @@
+import pytest
+
+from app import models
+from app.endpoint_index import EndpointIndex, build_coverage_matrix
+
+ENDPOINTS = [
+    {"method": "GET", "path": "/vms", "response_codes": ["200", "401"]},
+    {"method": "POST", "path": "/vms", "response_codes": ["201", "4XX"]},
+    {"method": "GET", "path": "/vms/{vm_id}", "response_codes": ["200", "404", "default"]},
+    {"method": "GET", "path": "/vms/search", "response_codes": ["200"]},
+]
+
+
+def _case(title: str, steps=(), expected: str = "", case_id: str = None) -> models.TestCase:
+    return models.TestCase(
+        id=case_id, title=title, description="", steps=list(steps), expected_result=expected,
+    )
+
+
+@pytest.fixture
+def index() -> EndpointIndex:
+    return EndpointIndex(ENDPOINTS)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("GET /vms returns the list", {"GET /vms"}),
+    ("post /vms with a valid body", {"POST /vms"}),
+    ("Call /vms", {"GET /vms", "POST /vms"}),
+    ("GET https://api.example.test/vms?limit=1", {"GET /vms"}),
+    ("GET /vms/42", {"GET /vms/{vm_id}"}),
+    ("GET /vms/{vm_id}", {"GET /vms/{vm_id}"}),
+    ("GET /vms/search", {"GET /vms/search"}),
+    ("GET `/vms/abc-1`", {"GET /vms/{vm_id}"}),
+    # Метода нет у пути — упоминание не относится ни к одному эндпоинту
+    ("DELETE /vms", set()),
+    ("DELETE /vms/42", set()),
+    # Префикс и продолжение другого пути не совпадают
+    ("GET /vms/42/disks", set()),
+    ("GET /api/vms", set()),
+    ("no endpoints here", set()),
+])
+def test_match_text(index, text, expected):
+    assert index.match_text(text) == expected
+
+
+def test_empty_index_matches_nothing():
+    assert EndpointIndex([]).match_text("GET /vms") == set()
+
+
+def test_match_status_codes(index):
+    case = _case("GET /vms/1", steps=["Send request"], expected="Response is 404, then 5xx; version 1.200 ignored")
+    assert index.match_status_codes(case) == {"404", "5XX"}
+
+
+def test_coverage_matrix(index):
+    cases = [
+        _case("List VMs", steps=["GET /vms"], expected="Status 200", case_id="TC-1"),
+        _case("Create VM", steps=["POST /vms with empty body"], expected="Status 422", case_id="TC-2"),
+        _case("Missing VM", steps=["GET /vms/unknown"], expected="Status 503", case_id="TC-3"),
+        _case("Delete VM", steps=["DELETE /vms/1"], expected="Status 204", case_id="TC-4"),
+    ]
+    matrix = build_coverage_matrix(index, cases)
+    by_key = {f"{e.method} {e.path}": e for e in matrix.endpoints}
+
+    assert by_key["GET /vms"].cases == ["TC-1"]
+    assert by_key["GET /vms"].responses == {"200": ["TC-1"], "401": []}
+    assert by_key["POST /vms"].responses == {"201": [], "4XX": ["TC-2"]}
+    assert by_key["GET /vms/{vm_id}"].responses == {"200": [], "404": [], "default": ["TC-3"]}
+    assert by_key["GET /vms/search"].cases == []
+    assert matrix.unmatched_cases == ["TC-4"]
+    assert (matrix.covered_endpoints, matrix.total_endpoints) == (3, 4)
+    assert (matrix.covered_responses, matrix.total_responses) == (3, 8)
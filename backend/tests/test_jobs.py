@@ -0,0 +1,100 @@
+import asyncio
+
+import pytest
+
+from app.jobs import JobManager, QueueFullError
+
+
+async def _busy_manager(tmp_path, max_queue: int) -> tuple[JobManager, asyncio.Event]:
+    release = asyncio.Event()
+    started = asyncio.Event()
+
+    async def handler(payload: dict) -> dict:
+        started.set()
+        await release.wait()
+        return {}
+
+    manager = JobManager(str(tmp_path / "jobs.sqlite3"), workers=1, max_queue=max_queue)
+    manager.register("slow", handler)
+    await manager.start()
+    # Единственный воркер занят: дальше задачи только копятся в очереди
+    await manager.submit("slow", {})
+    await started.wait()
+    return manager, release
+
+
+def test_concurrent_submits_do_not_exceed_max_queue(tmp_path):
+    async def scenario():
+        manager, release = await _busy_manager(tmp_path, max_queue=3)
+        try:
+            results = await asyncio.gather(
+                *(manager.submit("slow", {"n": i}) for i in range(10)), return_exceptions=True,
+            )
+            accepted = [r for r in results if not isinstance(r, Exception)]
+            rejected = [r for r in results if isinstance(r, QueueFullError)]
+            assert len(accepted) == 3
+            assert len(rejected) == 7
+            assert manager.queue_depth() == 3
+        finally:
+            release.set()
+            await manager.stop()
+
+    asyncio.run(scenario())
+
+
+def test_failed_save_releases_reserved_slot(tmp_path):
+    async def scenario():
+        manager, release = await _busy_manager(tmp_path, max_queue=1)
+        save = manager._save_sync
+
+        def failing_save(*args):
+            raise OSError("disk is full")
+
+        try:
+            manager._save_sync = failing_save
+            with pytest.raises(OSError):
+                await manager.submit("slow", {})
+            assert manager.queue_depth() == 0
+
+            manager._save_sync = save
+            job = await manager.submit("slow", {})
+            assert (await manager.get(job.id)).status == "queued"
+        finally:
+            release.set()
+            await manager.stop()
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_queued_jobs_free_their_slots(tmp_path):
+    async def scenario():
+        manager, release = await _busy_manager(tmp_path, max_queue=2)
+        try:
+            queued = [await manager.submit("slow", {"n": i}) for i in range(2)]
+            with pytest.raises(QueueFullError):
+                await manager.submit("slow", {})
+
+            for job in queued:
+                await manager.cancel(job.id)
+            assert manager.queue_depth() == 0
+
+            # Воркер ещё занят, id отменённых задач лежат в очереди — новые всё равно принимаются
+            fresh = [await manager.submit("slow", {"n": i}) for i in range(2)]
+            assert manager.queue_depth() == 2
+            with pytest.raises(QueueFullError):
+                await manager.submit("slow", {})
+
+            release.set()
+            statuses = []
+            for _ in range(50):
+                statuses = [(await manager.get(job.id)).status for job in fresh]
+                if statuses == ["succeeded", "succeeded"]:
+                    break
+                await asyncio.sleep(0.01)
+            assert statuses == ["succeeded", "succeeded"]
+            assert manager.queue_depth() == 0
+        finally:
+            release.set()
+            await manager.stop()
+
+    asyncio.run(scenario())
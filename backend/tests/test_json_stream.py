@@ -0,0 +1,74 @@
+import asyncio
+
+import pytest
+
+from app.json_stream import JsonArrayStreamParser, iter_json_array, parse_llm_json
+
+
+@pytest.mark.parametrize("text, expected", [
+    # Целый документ, в том числе в markdown-обёртке
+    ('{"name": "s", "cases": [{"t": 1}]}', {"name": "s", "cases": [{"t": 1}]}),
+    ('```json\n[{"t": 1}, {"t": 2}]\n```', [{"t": 1}, {"t": 2}]),
+    ('Sure! {"a": 1.5e3, "b": null}', {"a": 1500.0, "b": None}),
+    # Обрезка после скаляров: последнее незавершённое значение отбрасывается
+    ('{"summary": "abc", "total_cases": 12, "x": 3', {"summary": "abc", "total_cases": 12}),
+    ('{"a": true, "b": 1', {"a": True}),
+    ('{"a": false, "b": null, "c": tr', {"a": False, "b": None}),
+    ('{"a": [1, 2, 3', {"a": [1, 2]}),
+    ('[1, null, false,', [1, None, False]),
+    ('{"a": 1, ', {"a": 1}),
+    ('{"a": 1', {}),
+    # Обрезка внутри строки: значение верхнего уровня сохраняется, ключ — нет
+    ('{"summary": "abc', {"summary": "abc"}),
+    ('{"summary": "abc", "tot', {"summary": "abc"}),
+    ('{"summary": "ab\\', {"summary": "ab"}),
+    ('{"summary": "ab\\\\', {"summary": "ab\\"}),
+    ('{"summary": "ab\\u04', {"summary": "ab"}),
+    # Незакрытый элемент массива отбрасывается целиком
+    ('{"cases": [{"t": 1}, {"t": 2, "steps": ["a"', {"cases": [{"t": 1}]}),
+    ('{"name": "s", "cases": [{"t": 1}], "summary": {"n": 5', {"name": "s", "cases": [{"t": 1}], "summary": {}}),
+])
+def test_parse_llm_json_recovers_prefix(text, expected):
+    assert parse_llm_json(text) == expected
+
+
+@pytest.mark.parametrize("text", ["", "no json here", "```json\n"])
+def test_parse_llm_json_without_complete_value_raises(text):
+    with pytest.raises(ValueError):
+        parse_llm_json(text)
+
+
+def test_items_are_emitted_as_soon_as_they_close():
+    parser = JsonArrayStreamParser(array_key="issues")
+    assert parser.feed('{"summary": "ok", "issues": [{"id": 1}, {"id"') == [{"id": 1}]
+    assert parser.feed(': 2}]}') == [{"id": 2}]
+    assert parser.done
+    assert parser.fields == {"summary": "ok"}
+    assert parser.finish() == {"summary": "ok", "issues": [{"id": 1}, {"id": 2}]}
+
+
+def test_nested_array_with_same_key_is_not_the_target():
+    text = '{"meta": {"cases": [1]}, "cases": [{"t": "a"}, {"t": "b"}]}'
+    parser = JsonArrayStreamParser(array_key="cases")
+    assert parser.feed(text) == [{"t": "a"}, {"t": "b"}]
+
+
+def test_iter_json_array_handles_arbitrary_chunk_boundaries():
+    text = '```json\n{"cases": [{"t": "a \\" ] }"}, {"t": "b", "n": 12}, {"t": "c"}]}\n```'
+
+    async def chunks():
+        for i in range(0, len(text), 3):
+            yield text[i:i + 3]
+
+    async def collect():
+        return [item async for item in iter_json_array(chunks())]
+
+    assert asyncio.run(collect()) == [{"t": 'a " ] }'}, {"t": "b", "n": 12}, {"t": "c"}]
+
+
+def test_truncated_stream_recovers_after_scalar_split_across_chunks():
+    parser = JsonArrayStreamParser()
+    for chunk in ['{"total', '_cases": 1', '2, "x', '": 3']:
+        parser.feed(chunk)
+    assert parser.finish() == {"total_cases": 12}
+    assert parser.truncated
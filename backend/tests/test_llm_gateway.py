@@ -0,0 +1,235 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import httpx
+import pytest
+
+from app.llm_gateway import AimdLimiter, LLMDeadlineExceeded, LLMGateway, parse_retry_after
+
+
+def _limiter(initial=4, minimum=1, maximum=8, factor=0.5) -> AimdLimiter:
+    return AimdLimiter(initial=initial, minimum=minimum, maximum=maximum, decrease_factor=factor)
+
+
+def _gateway(limiter=None, max_attempts=3, max_delay=1.0, deadline=5.0) -> LLMGateway:
+    return LLMGateway(
+        limiter=limiter or _limiter(),
+        max_attempts=max_attempts,
+        base_delay=0.001,
+        max_delay=max_delay,
+        deadline=deadline,
+    )
+
+
+class _Provider:
+    """
+    Отдаёт заранее заданные ответы (или исключения) по порядку.
+    """
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.timeouts = []
+        self.sent_at = []
+
+    async def __call__(self, timeout: float) -> httpx.Response:
+        self.timeouts.append(timeout)
+        self.sent_at.append(time.monotonic())
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        status, headers = outcome if isinstance(outcome, tuple) else (outcome, {})
+        return httpx.Response(status, headers=headers, json={})
+
+
+async def _status(gateway: LLMGateway, send, timeout: float = 30.0) -> int:
+    async with gateway.request(send, timeout) as response:
+        return response.status_code
+
+
+@pytest.mark.parametrize("value, expected", [
+    (None, None),
+    ("", None),
+    ("2", 2.0),
+    (" 1.5 ", 1.5),
+    ("-3", 0.0),
+    ("soon", None),
+    ("Wed, 21 Oct 2015 07:28:00 GMT", 0.0),
+])
+def test_parse_retry_after(value, expected):
+    assert parse_retry_after(value) == expected
+
+
+def test_parse_retry_after_http_date():
+    when = datetime.now(timezone.utc) + timedelta(seconds=30)
+    assert 28 <= parse_retry_after(format_datetime(when, usegmt=True)) <= 30
+
+
+def test_additive_increase():
+    limiter = _limiter(initial=4)
+    for _ in range(4):
+        asyncio.run(limiter.acquire(1.0))
+        limiter.release(True, time.monotonic())
+    # +1/limit на каждый ответ: примерно +1 за окно из limit запросов
+    assert limiter.limit == 4
+    asyncio.run(limiter.acquire(1.0))
+    limiter.release(True, time.monotonic())
+    assert limiter.limit == 5
+
+
+def test_increase_is_capped_at_maximum():
+    limiter = _limiter(initial=8, maximum=8)
+    asyncio.run(limiter.acquire(1.0))
+    limiter.release(True, time.monotonic())
+    assert limiter.limit == 8
+
+
+def test_one_decrease_per_wave():
+    limiter = _limiter(initial=8)
+    wave_started = time.monotonic()
+    for _ in range(3):
+        asyncio.run(limiter.acquire(1.0))
+    # Три ответа 429 на запросы, отправленные до уменьшения, — одно уменьшение
+    for _ in range(3):
+        limiter.release(False, wave_started)
+    assert limiter.limit == 4
+
+    # Запрос, отправленный после уменьшения, уменьшает лимит снова
+    asyncio.run(limiter.acquire(1.0))
+    limiter.release(False, time.monotonic())
+    assert limiter.limit == 2
+
+
+def test_decrease_is_floored_at_minimum():
+    limiter = _limiter(initial=2, minimum=2)
+    asyncio.run(limiter.acquire(1.0))
+    limiter.release(False, time.monotonic())
+    assert limiter.limit == 2
+
+
+def test_neutral_release_keeps_limit():
+    limiter = _limiter(initial=4)
+    asyncio.run(limiter.acquire(1.0))
+    limiter.release(None, time.monotonic())
+    assert (limiter.limit, limiter.in_flight) == (4, 0)
+
+
+def test_waiters_are_served_fifo():
+    async def scenario():
+        limiter = _limiter(initial=1)
+        await limiter.acquire(1.0)
+        order = []
+
+        async def waiter(name):
+            await limiter.acquire(1.0)
+            order.append(name)
+
+        tasks = [asyncio.create_task(waiter(name)) for name in "abc"]
+        await asyncio.sleep(0)
+        assert limiter.queued == 3
+        for _ in range(3):
+            limiter.release(None, time.monotonic())
+            await asyncio.sleep(0)
+        await asyncio.gather(*tasks)
+        assert order == ["a", "b", "c"]
+
+    asyncio.run(scenario())
+
+
+def test_acquire_timeout_leaves_queue():
+    async def scenario():
+        limiter = _limiter(initial=1)
+        await limiter.acquire(1.0)
+        with pytest.raises(asyncio.TimeoutError):
+            await limiter.acquire(0.01)
+        assert (limiter.queued, limiter.in_flight) == (0, 1)
+
+    asyncio.run(scenario())
+
+
+def test_retryable_status_is_retried_and_decreases_limit():
+    limiter = _limiter(initial=8)
+    gateway = _gateway(limiter)
+    provider = _Provider(503, 429, 200)
+
+    assert asyncio.run(_status(gateway, provider)) == 200
+    assert len(provider.timeouts) == 3
+    assert gateway.stats()["retries"] == 2
+    assert gateway.stats()["throttled"] == 1
+    assert limiter.limit < 8
+    assert limiter.in_flight == 0
+
+
+def test_client_error_is_not_retried_and_keeps_limit():
+    limiter = _limiter(initial=4)
+    gateway = _gateway(limiter)
+    provider = _Provider(400)
+
+    assert asyncio.run(_status(gateway, provider)) == 400
+    assert len(provider.timeouts) == 1
+    assert limiter.limit == 4
+
+
+def test_last_response_returned_after_attempts():
+    gateway = _gateway(max_attempts=2)
+    assert asyncio.run(_status(gateway, _Provider(503, 503))) == 503
+    assert gateway.stats()["retries"] == 1
+
+
+def test_network_error_is_retried_then_raised():
+    gateway = _gateway(max_attempts=2)
+    provider = _Provider(httpx.ConnectError("refused"), httpx.ReadTimeout("slow"))
+    with pytest.raises(httpx.ReadTimeout):
+        asyncio.run(_status(gateway, provider))
+    assert len(provider.timeouts) == 2
+
+
+def test_retry_after_pauses_every_request():
+    async def scenario():
+        gateway = _gateway()
+        throttled = _Provider((429, {"Retry-After": "0.2"}), 200)
+        other = _Provider(200)
+
+        first = asyncio.create_task(_status(gateway, throttled))
+        await asyncio.sleep(0.05)
+        # Запрос, пришедший во время паузы, тоже ждёт Retry-After
+        second = asyncio.create_task(_status(gateway, other))
+        assert await asyncio.gather(first, second) == [200, 200]
+        return throttled.sent_at, other.sent_at
+
+    throttled_at, other_at = asyncio.run(scenario())
+    assert throttled_at[1] - throttled_at[0] >= 0.19
+    assert other_at[0] - throttled_at[0] >= 0.19
+
+
+def test_retry_after_is_capped_by_max_delay():
+    gateway = _gateway(max_delay=0.05)
+    provider = _Provider((429, {"Retry-After": "3600"}), 200)
+    started_at = time.monotonic()
+    # Пауза для всех ограничена max_delay, но сам запрос ждёт весь Retry-After —
+    # он за дедлайном, поэтому возвращается ответ 429
+    assert asyncio.run(_status(gateway, provider)) == 429
+    assert time.monotonic() - started_at < 1.0
+    assert gateway.stats()["deadline_exceeded"] == 1
+
+
+def test_queue_wait_is_bounded_by_deadline():
+    async def scenario():
+        limiter = _limiter(initial=1)
+        gateway = _gateway(limiter, deadline=0.05)
+        await limiter.acquire(1.0)
+        with pytest.raises(LLMDeadlineExceeded):
+            await _status(gateway, _Provider(200))
+        return gateway.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["deadline_exceeded"] == 1
+    assert stats["queued"] == 0
+
+
+def test_attempt_timeout_never_exceeds_deadline():
+    gateway = _gateway(deadline=2.0)
+    provider = _Provider(200)
+    asyncio.run(_status(gateway, provider, timeout=60.0))
+    assert provider.timeouts[0] <= 2.0
@@ -0,0 +1,75 @@
+import asyncio
+
+import httpx
+
+from app.llm_hedging import HedgingPolicy
+
+
+class _SlowBody(httpx.AsyncByteStream):
+    def __init__(self, delay: float):
+        self._delay = delay
+
+    async def __aiter__(self):
+        await asyncio.sleep(self._delay)
+        yield b'{"ok": true}'
+
+
+def _policy(**overrides) -> HedgingPolicy:
+    options = dict(
+        enabled=True, max_tokens=1000, percentile=95, initial_delay=0.05, min_delay=0.01,
+        budget=1.0, window=100, min_samples=3,
+    )
+    options.update(overrides)
+    return HedgingPolicy(**options)
+
+
+def _run(policy: HedgingPolicy, handler) -> list:
+    async def scenario():
+        client = httpx.AsyncClient(base_url="http://llm", transport=httpx.MockTransport(handler))
+
+        async def send(timeout: float) -> httpx.Response:
+            return await client.send(client.build_request("POST", "/chat/completions"), stream=True)
+
+        try:
+            response = await policy.wrap(send)(1.0)
+            return [response.json()]
+        finally:
+            await client.aclose()
+
+    return asyncio.run(scenario())
+
+
+def test_slow_body_after_fast_headers_is_not_hedged():
+    policy = _policy()
+
+    async def handler(request):
+        # Заголовки сразу, тело — дольше задержки хеджирования
+        return httpx.Response(200, stream=_SlowBody(0.2))
+
+    assert _run(policy, handler) == [{"ok": True}]
+    assert policy.hedged == 0
+    # В выборку попадает TTFB, а не время до конца тела
+    assert policy._latencies[0] < 0.1
+
+
+def test_missing_headers_trigger_hedge_and_copy_wins():
+    policy = _policy()
+    calls = []
+
+    async def handler(request):
+        calls.append(request)
+        if len(calls) == 1:
+            await asyncio.sleep(0.5)
+        return httpx.Response(200, json={"ok": True})
+
+    assert _run(policy, handler) == [{"ok": True}]
+    assert policy.hedged == 1
+    assert policy.hedge_wins == 1
+    assert policy.cancelled == 1
+
+
+def test_delay_is_percentile_of_samples():
+    policy = _policy(min_samples=3, percentile=50)
+    assert policy.delay() == 0.05
+    policy._latencies.extend([0.3, 0.1, 0.2])
+    assert policy.delay() == 0.2
@@ -0,0 +1,86 @@
+import pytest
+
+from app.agents.html_agent import collect_interactive
+from app.agents.locators import LocatorIndex, normalized_text, xpath_literal
+
+
+def _locators(html: str) -> list:
+    collector = collect_interactive(html)
+    return LocatorIndex(collector.elements, collector.id_counts).locators()
+
+
+@pytest.mark.parametrize("value, literal", [
+    ("plain", "'plain'"),
+    ("It's", "\"It's\""),
+    ("say \"hi\"", "'say \"hi\"'"),
+    ("It's \"x\"", "concat('It', \"'\", 's \"x\"')"),
+    ("", "''"),
+])
+def test_xpath_literal(value, literal):
+    assert xpath_literal(value) == literal
+
+
+def test_normalized_text_collapses_whitespace():
+    element = collect_interactive("<button>  Save \n  and\tclose </button>").elements[0]
+    assert normalized_text(element) == "Save and close"
+
+
+def test_unique_id_wins_and_duplicate_id_is_skipped():
+    # id совпадает с id не-интерактивного тега — уникальность считается по документу
+    html = '<div id="q"></div><input id="email" name="e"><input id="q" name="query">'
+    assert _locators(html) == ["id='email'", "//input[@name='query']"]
+
+
+def test_attribute_preference_and_weak_attributes():
+    html = (
+        '<input data-testid="login" name="user" placeholder="User">'
+        '<input type="radio" name="plan" value="basic">'
+        '<input type="radio" name="plan" value="pro">'
+    )
+    assert _locators(html) == [
+        "//input[@data-testid='login']",
+        "//input[@value='basic']",
+        "//input[@value='pro']",
+    ]
+
+
+def test_pair_of_predicates():
+    html = (
+        '<input name="a" placeholder="P1">'
+        '<input name="a" placeholder="P2">'
+        '<input name="b" placeholder="P1">'
+        '<input name="b" placeholder="P2">'
+    )
+    assert _locators(html) == [
+        "//input[@name='a'][@placeholder='P1']",
+        "//input[@name='a'][@placeholder='P2']",
+        "//input[@name='b'][@placeholder='P1']",
+        "//input[@name='b'][@placeholder='P2']",
+    ]
+
+
+def test_class_and_text_predicates():
+    html = (
+        '<button class="btn  primary">Save</button>'
+        '<button class="btn">Save</button>'
+        '<a href="/x">It\'s "quoted"</a>'
+    )
+    assert _locators(html) == [
+        "//button[normalize-space(@class)='btn primary']",
+        "//button[normalize-space(@class)='btn']",
+        "//a[normalize-space()=concat('It', \"'\", 's \"quoted\"')]",
+    ]
+
+
+def test_long_text_uses_prefix_and_falls_back_to_position():
+    # starts-with() по 60 символам совпадает и с кнопкой из ровно 60 символов
+    html = f"<button>{'x' * 70}</button><button>{'x' * 60}</button>"
+    assert _locators(html) == [
+        "(//button)[1]",
+        f"//button[normalize-space()='{'x' * 60}']",
+    ]
+
+
+def test_position_is_counted_per_tag():
+    html = '<a href="/1">Docs</a><button>Go</button><a href="/2">Docs</a>'
+    assert _locators(html) == ["(//a)[1]", "//button[normalize-space()='Go']", "(//a)[2]"]
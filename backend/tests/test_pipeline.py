@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+
+from app.pipeline import StageGraph
+
+
+def _stage(log: list, name: str, result=None, delay: float = 0.0, error: Exception | None = None):
+    async def run(*args):
+        log.append(("start", name, args))
+        await asyncio.sleep(delay)
+        if error is not None:
+            raise error
+        log.append(("end", name))
+        return result if result is not None else name
+
+    return run
+
+
+def test_dependencies_run_first_and_receive_results():
+    log = []
+    graph = StageGraph()
+    graph.add("spec", _stage(log, "spec", result={"paths": 3}, delay=0.01))
+    graph.add("crawl", _stage(log, "crawl", result=["page"], delay=0.02))
+    graph.add("cases", _stage(log, "cases"), deps=["crawl", "spec"])
+
+    results = asyncio.run(graph.run())
+
+    assert results == {"spec": {"paths": 3}, "crawl": ["page"], "cases": "cases"}
+    # Результаты зависимостей приходят в порядке deps, а не завершения
+    assert ("start", "cases", (["page"], {"paths": 3})) in log
+    assert log.index(("start", "cases", (["page"], {"paths": 3}))) > log.index(("end", "crawl"))
+
+
+def test_independent_stages_run_concurrently():
+    log = []
+    graph = StageGraph()
+    graph.add("a", _stage(log, "a", delay=0.01))
+    graph.add("b", _stage(log, "b", delay=0.01))
+    asyncio.run(graph.run())
+    assert [entry[:2] for entry in log[:2]] == [("start", "a"), ("start", "b")]
+
+
+def test_failure_cancels_other_stages_and_propagates():
+    log = []
+    graph = StageGraph()
+    graph.add("slow", _stage(log, "slow", delay=1.0))
+    graph.add("broken", _stage(log, "broken", error=RuntimeError("boom")))
+    graph.add("after", _stage(log, "after"), deps=["broken"])
+
+    async def run():
+        started_at = asyncio.get_running_loop().time()
+        with pytest.raises(RuntimeError, match="boom"):
+            await graph.run()
+        return asyncio.get_running_loop().time() - started_at
+
+    elapsed = asyncio.run(run())
+    assert elapsed < 0.5
+    assert ("end", "slow") not in log
+    assert not any(entry[1] == "after" for entry in log)
+    assert "broken" in graph.timings
+
+
+@pytest.mark.parametrize("deps, message", [
+    (["missing"], "undeclared"),
+    ([], "Duplicate"),
+])
+def test_invalid_graph(deps, message):
+    graph = StageGraph()
+    graph.add("a", _stage([], "a"))
+    with pytest.raises(ValueError, match=message):
+        graph.add("a" if not deps else "b", _stage([], "b"), deps=deps)
+
+
+def test_critical_path():
+    graph = StageGraph()
+    for name, deps in [("a", []), ("b", []), ("c", ["a", "b"]), ("d", ["a"])]:
+        graph.add(name, _stage([], name), deps=deps)
+    graph.timings = {"a": 1.0, "b": 3.0, "c": 1.0, "d": 2.5}
+    assert graph.critical_path() == ["b", "c"]
+
+
+def test_critical_path_of_empty_graph():
+    assert StageGraph().critical_path() == []
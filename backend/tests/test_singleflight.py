@@ -0,0 +1,161 @@
+import asyncio
+
+import pytest
+
+from app.llm_cache import cache_bypass
+from app.singleflight import SingleFlight, make_flight_key
+
+
+class _Work:
+    """
+    Управляемая «генерация»: считает запуски и отмены, завершается по release().
+    """
+
+    def __init__(self, result="suite", cleanup: float = 0.0):
+        self.result = result
+        self.cleanup = cleanup
+        self.calls = 0
+        self.cancelled = 0
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        try:
+            await self.release.wait()
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            # Отмена может сворачиваться не мгновенно (закрытие соединения)
+            await asyncio.sleep(self.cleanup)
+            raise
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_concurrent_calls_share_one_task():
+    async def scenario():
+        flights, work = SingleFlight(), _Work()
+        waiters = [asyncio.create_task(flights.run("k", work)) for _ in range(3)]
+        await _settle()
+        assert flights.stats() == {"in_flight": 1, "started": 1, "coalesced": 2}
+        work.release.set()
+        assert await asyncio.gather(*waiters) == ["suite"] * 3
+        assert work.calls == 1
+        assert flights.stats()["in_flight"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_exception_reaches_every_waiter():
+    async def scenario():
+        flights, work = SingleFlight(), _Work(result=RuntimeError("llm down"))
+        waiters = [asyncio.create_task(flights.run("k", work)) for _ in range(2)]
+        await _settle()
+        work.release.set()
+        results = await asyncio.gather(*waiters, return_exceptions=True)
+        assert [str(r) for r in results] == ["llm down", "llm down"]
+
+    asyncio.run(scenario())
+
+
+def test_key_is_released_after_completion():
+    async def scenario():
+        flights, work = SingleFlight(), _Work()
+        work.release.set()
+        assert await flights.run("k", work) == "suite"
+        assert await flights.run("k", work) == "suite"
+        assert work.calls == 2
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_does_not_cancel_others():
+    async def scenario():
+        flights, work = SingleFlight(), _Work()
+        first = asyncio.create_task(flights.run("k", work))
+        second = asyncio.create_task(flights.run("k", work))
+        await _settle()
+
+        first.cancel()
+        await _settle()
+        assert first.cancelled()
+        assert work.cancelled == 0
+
+        work.release.set()
+        assert await second == "suite"
+
+    asyncio.run(scenario())
+
+
+def test_last_waiter_leaving_cancels_the_task():
+    async def scenario():
+        flights, work = SingleFlight(), _Work()
+        waiters = [asyncio.create_task(flights.run("k", work)) for _ in range(2)]
+        await _settle()
+        for waiter in waiters:
+            waiter.cancel()
+        await _settle()
+        assert all(waiter.cancelled() for waiter in waiters)
+        assert work.cancelled == 1
+        assert flights.stats()["in_flight"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_new_call_during_cancellation_starts_fresh_task():
+    async def scenario():
+        flights, work = SingleFlight(), _Work(cleanup=0.05)
+        abandoned = asyncio.create_task(flights.run("k", work))
+        await _settle()
+        abandoned.cancel()
+        await _settle()
+        assert work.cancelled == 1
+
+        # Отменённая задача ещё сворачивается — новый запрос к ней не присоединяется
+        fresh = asyncio.create_task(flights.run("k", work))
+        await _settle()
+        work.release.set()
+        assert await fresh == "suite"
+        assert work.calls == 2
+
+    asyncio.run(scenario())
+
+
+def test_flight_key_normalizes_payload():
+    assert make_flight_key("gen", {"b": " text ", "a": [" x"]}) == make_flight_key("gen", {"a": ["x"], "b": "text"})
+    assert make_flight_key("gen", {"a": 1}) != make_flight_key("other", {"a": 1})
+
+
+@pytest.mark.parametrize("payload", [{"a": "x"}, {"a": "y"}, {"a": ["x"]}])
+def test_flight_key_distinguishes_payloads(payload):
+    assert make_flight_key("gen", payload) != make_flight_key("gen", {"a": "z"})
+
+
+def _key_with_bypass(bypass: bool) -> str:
+    token = cache_bypass.set(bypass)
+    try:
+        return make_flight_key("gen", {"a": 1})
+    finally:
+        cache_bypass.reset(token)
+
+
+def test_cache_bypass_gets_its_own_flight():
+    assert _key_with_bypass(True) != _key_with_bypass(False)
+    assert _key_with_bypass(True) == _key_with_bypass(True)
+
+    async def scenario():
+        flights, work = SingleFlight(), _Work()
+        normal = asyncio.create_task(flights.run(_key_with_bypass(False), work))
+        bypass = asyncio.create_task(flights.run(_key_with_bypass(True), work))
+        await _settle()
+        # Запрос с Cache-Control: no-cache не получает результат обычной генерации
+        assert work.calls == 2
+        work.release.set()
+        await asyncio.gather(normal, bypass)
+
+    asyncio.run(scenario())
@@ -0,0 +1,75 @@
+import copy
+
+from app.spec_diff import diff_fingerprints, spec_fingerprint
+
+SPEC = {
+    "openapi": "3.0.0",
+    "paths": {
+        "/vms/{vm_id}": {
+            "parameters": [{"name": "vm_id", "in": "path", "required": True, "schema": {"type": "string"}}],
+            "get": {
+                "summary": "Get VM",
+                "parameters": [{"name": f"p{i}", "in": "query", "schema": {"type": "string"}} for i in range(7)],
+                "responses": {code: {"description": code} for code in ("200", "400", "401", "403", "404", "500")},
+            },
+            "put": {
+                "requestBody": {"content": {"application/json": {"schema": {"$ref": "#/components/schemas/Vm"}}}},
+                "responses": {"200": {"description": "OK"}},
+            },
+        },
+    },
+    "components": {"schemas": {"Vm": {"type": "object", "properties": {"name": {"type": "string"}}}}},
+}
+
+
+def _changed(mutate) -> list:
+    new = copy.deepcopy(SPEC)
+    mutate(new)
+    return diff_fingerprints(spec_fingerprint(SPEC), spec_fingerprint(new)).changed
+
+
+def test_keys_cover_every_operation():
+    assert set(spec_fingerprint(SPEC)) == {"GET /vms/{vm_id}", "PUT /vms/{vm_id}"}
+
+
+def test_parameter_beyond_prompt_summary_is_detected():
+    def mutate(spec):
+        spec["paths"]["/vms/{vm_id}"]["get"]["parameters"][6]["required"] = True
+
+    assert _changed(mutate) == ["GET /vms/{vm_id}"]
+
+
+def test_response_code_beyond_prompt_summary_is_detected():
+    def mutate(spec):
+        del spec["paths"]["/vms/{vm_id}"]["get"]["responses"]["500"]
+
+    assert _changed(mutate) == ["GET /vms/{vm_id}"]
+
+
+def test_path_level_parameter_change_affects_all_methods():
+    def mutate(spec):
+        spec["paths"]["/vms/{vm_id}"]["parameters"][0]["schema"] = {"type": "integer"}
+
+    assert sorted(_changed(mutate)) == ["GET /vms/{vm_id}", "PUT /vms/{vm_id}"]
+
+
+def test_request_body_schema_change_through_ref_is_detected():
+    def mutate(spec):
+        spec["components"]["schemas"]["Vm"]["properties"]["cpu"] = {"type": "integer"}
+
+    assert _changed(mutate) == ["PUT /vms/{vm_id}"]
+
+
+def test_documentation_change_is_ignored():
+    def mutate(spec):
+        operation = spec["paths"]["/vms/{vm_id}"]["get"]
+        operation["summary"] = "Fetch a virtual machine"
+        operation["parameters"][0]["description"] = "Filter"
+
+    assert _changed(mutate) == []
+
+
+def test_recursive_ref_does_not_loop():
+    spec = copy.deepcopy(SPEC)
+    spec["components"]["schemas"]["Vm"]["properties"]["parent"] = {"$ref": "#/components/schemas/Vm"}
+    assert "PUT /vms/{vm_id}" in spec_fingerprint(spec)
@@ -0,0 +1,27 @@
+import asyncio
+
+from app import models
+from app.agents import allure_code_generator
+from app.agents.validation_agent import ValidationAgent
+
+
+def test_rules_check_does_not_render_allure_code(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("suite validation must not render Allure code")
+
+    monkeypatch.setattr(allure_code_generator.AllureCodeGenerator, "generate_allure_code", fail)
+    suite = models.TestSuite(name="Suite", cases=[
+        models.TestCase(
+            title="Verify login with valid credentials",
+            description="Login works",
+            steps=["Arrange: open login page", "Act: submit valid credentials", "Assert: dashboard is shown"],
+            expected_result="Dashboard is shown",
+            priority="HIGH",
+        ),
+    ])
+
+    report = asyncio.run(ValidationAgent().validate_test_suite(suite, semantic=False))
+
+    # Кейс без тегов: одно предупреждение от правил, без дубля из проверки кода
+    assert [issue.issue for issue in report.issues] == ["Нет тегов"]
+    assert report.total_cases == 1